@@ -1,30 +1,52 @@
-from aiogram import Router, F
+import asyncio
+import os
+import shutil
+import tempfile
+import zipfile
+
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import CommandStart, Command
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.models import User, Account
-from app.utils.db_utils import UserRepository, AccountRepository, LogRepository
+from app.models import User, Account, AsyncSessionLocal
+from app.utils.db_utils import (
+    UserRepository, AccountRepository, LogRepository, ArchiveRepository, FileIndexRepository, BlobRepository
+)
 from app.utils.keyboards import (
     get_admin_main_keyboard, get_accounts_view_keyboard, 
     get_notification_type_keyboard, get_notification_recipient_keyboard,
     get_account_actions_keyboard, get_confirm_keyboard, get_user_management_keyboard,
-    get_new_user_approval_keyboard
+    get_new_user_approval_keyboard, get_notification_menu_keyboard, get_notification_confirm_keyboard,
+    get_admin_panel_keyboard, get_back_keyboard, get_account_edit_keyboard, get_confirm_add_admin_keyboard,
+    get_account_delete_keyboard, get_confirm_revoke_admin_keyboard
 )
 from app.utils.helpers import (
     get_current_month, format_account_info, format_user_info,
-    get_notification_text
+    get_notification_text, parse_archive_search, format_size, shorten, MESSAGE_TEXT_LIMIT
+)
+from app.utils.storage import (
+    get_account_relative_path, get_account_filename, locate_account_file, detach_blob_file, restore_blob_file
 )
-from config import ADMIN_IDS
-from config import BOT_TOKEN
-from aiogram import Bot
+from app.utils.reconcile import file_reconciler
+from app.utils.admin_tasks import admin_tasks
+from app.utils.admins import admin_roles
+from app.utils.metrics import BROADCAST_MESSAGES, BROADCAST_PENDING, BROADCASTS_RUNNING
+from app.utils.timing import update_timer
+from app.utils.sql_profiler import sql_profiler
+from app.utils.perf import collect_perf
+from app.utils.callbacks import (
+    callback_table, AccountDelete, AccountEdit, AccountLock, AccountSent, AccountStatus, AccountUnlock, ApproveUser,
+    ConfirmAddAdmin, Notify, NotifyRecipient, NumbersDone, NumbersRecipient, NumbersReply, ProxyDone,
+    ProxyReply, RejectUser, RevokeAdmin, UnsentAccount, UnsentUser, UserAccounts, UserAllow, UserDeny, UserInfo
+)
+from config import ADMIN_IDS, USER_QUOTA_MB, USER_QUOTA_FILES
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InputFile
 from aiogram.types import FSInputFile
 from datetime import datetime, timedelta
-from pathlib import Path
 
 admin_router = Router()
 
@@ -47,7 +69,7 @@ class AdminStates(StatesGroup):
 def is_admin(message_or_callback) -> bool:
     """Проверить, является ли пользователь администратором"""
     user_id = message_or_callback.from_user.id
-    return user_id in ADMIN_IDS
+    return user_id in admin_roles
 
 
 @admin_router.message(Command("admin"))
@@ -64,7 +86,205 @@ async def cmd_admin(message: Message, session: AsyncSession):
     )
 
 
-@admin_router.callback_query(F.data == "admin_view_accounts")
+@admin_router.message(Command("search"))
+async def cmd_search_archives(message: Message, command: CommandObject, session: AsyncSession):
+    """Поиск аккаунтов по содержимому архивов"""
+    if not is_admin(message):
+        await message.answer("❌ У вас нет доступа к панели администратора.")
+        return
+
+    params = parse_archive_search(command.args or "")
+    if not any(value is not None for value in params.values()):
+        await message.answer(
+            "🔎 Поиск по содержимому архивов\n\n"
+            "Использование: /search <имя файла> [files>N] [files<N] [size>N]\n\n"
+            "Примеры:\n"
+            "/search cookies.txt\n"
+            "/search files>100\n"
+            "/search wallet.dat size>50  (размер в МБ)"
+        )
+        return
+
+    results = await ArchiveRepository.search(session, **params)
+    if not results:
+        await message.answer("📭 Ничего не найдено")
+        return
+
+    text = f"🔎 Найдено аккаунтов: {len(results)}\n"
+    kb_buttons = []
+    for account, check, members in results:
+        lines = [
+            f"📁 #{account.id} {shorten(get_account_filename(account))} — "
+            f"{check.member_count} файлов, {format_size(check.total_size)}"
+        ]
+        for member in members[:3]:
+            lines.append(f"  • {shorten(member.name)}")
+        if len(members) > 3:
+            lines.append(f"  … и еще {len(members) - 3}")
+        block = "\n" + "\n".join(lines)
+        # Оставить место под строку о непоказанных результатах
+        if len(text) + len(block) > MESSAGE_TEXT_LIMIT - 100:
+            break
+        text += block
+        kb_buttons.append([InlineKeyboardButton(text=f"📁 #{account.id}", callback_data=AccountEdit(account_id=account.id).pack())])
+
+    omitted = len(results) - len(kb_buttons)
+    if omitted:
+        text += f"\n\n… не показано результатов: {omitted}, уточните запрос"
+    await message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_buttons))
+
+
+@admin_router.message(Command("reconcile"))
+async def cmd_reconcile(message: Message):
+    """Сверить файлы на диске с базой данных"""
+    if not is_admin(message):
+        await message.answer("❌ У вас нет доступа к панели администратора.")
+        return
+
+    await message.answer("🔄 Сверяю файлы на диске с базой данных...")
+    try:
+        report = await file_reconciler.run_once()
+    except Exception as e:
+        await message.answer(f"❌ Ошибка при сверке: {str(e)}")
+        return
+
+    lines = [
+        "🗂 Сверка файлов завершена\n",
+        f"⏱ Время: {report.duration:.2f} с",
+        f"📄 Файлов на диске: {report.files}",
+        f"📂 Директорий просканировано: {report.scanned_dirs} (без изменений: {report.skipped_dirs})",
+        f"✏️ Изменений в индексе: {report.changed}, удалено: {report.removed}",
+        f"\n🗑 Файлов без аккаунта: {report.orphan_count}",
+    ]
+    lines.extend(f"  • {path}" for path in report.orphans)
+    lines.append(f"\n⚠️ Аккаунтов без файла: {report.missing_count}")
+    lines.extend(
+        f"  • #{account.id} {get_account_filename(account)} ({account.month})" for account in report.missing
+    )
+    await message.answer("\n".join(lines))
+
+
+@admin_router.message(Command("storage"))
+async def cmd_storage_report(message: Message, session: AsyncSession):
+    """Отчет о пользователях, занимающих больше всего места"""
+    if not is_admin(message):
+        await message.answer("❌ У вас нет доступа к панели администратора.")
+        return
+
+    total_bytes, total_files = await UserRepository.get_storage_totals(session)
+    users = await UserRepository.get_top_storage_users(session)
+
+    quota_bytes = f"{USER_QUOTA_MB} МБ" if USER_QUOTA_MB else "без ограничений"
+    quota_files = str(USER_QUOTA_FILES) if USER_QUOTA_FILES else "без ограничений"
+    lines = [
+        "💾 Использование хранилища\n",
+        f"Всего: {format_size(total_bytes)} ({total_files} файлов)",
+        f"Квота на пользователя: {quota_bytes}, файлов: {quota_files}\n",
+    ]
+    if not users:
+        lines.append("📭 Загруженных файлов нет")
+    for position, user in enumerate(users, 1):
+        lines.append(
+            f"{position}. @{user.username or user.tg_id} — "
+            f"{format_size(user.storage_bytes)} ({user.storage_files} файлов)"
+        )
+    await message.answer("\n".join(lines))
+
+
+@admin_router.message(Command("timings"))
+async def cmd_timings(message: Message):
+    """Перцентили времени обработки по обработчикам"""
+    if not is_admin(message):
+        await message.answer("❌ У вас нет доступа к панели администратора.")
+        return
+
+    rows = update_timer.summary()
+    if not rows:
+        await message.answer("📭 Замеров пока нет")
+        return
+
+    lines = [
+        f"⏱ Время обработки (последние {update_timer.window} замеров на обработчик), мс\n",
+        f"Медленных (> {update_timer.slow_threshold * 1000:.0f} мс): {update_timer.slow} из {update_timer.updates}\n",
+    ]
+    for name, count, p50, p95, p99, db_avg, api_avg in rows[:20]:
+        lines.append(
+            f"{name}: n={count}, p50={p50 * 1000:.0f}, p95={p95 * 1000:.0f}, p99={p99 * 1000:.0f} "
+            f"(БД {db_avg * 1000:.0f}, API {api_avg * 1000:.0f})"
+        )
+    await message.answer("\n".join(lines))
+
+
+@admin_router.message(Command("sqlprofile"))
+async def cmd_sql_profile(message: Message):
+    """Отчет профилировщика SQL-запросов по обработчикам"""
+    if not is_admin(message):
+        await message.answer("❌ У вас нет доступа к панели администратора.")
+        return
+
+    if not sql_profiler.enabled:
+        await message.answer("ℹ️ Профилирование SQL выключено. Запустите бота с SQL_PROFILE=1.")
+        return
+
+    rows = sql_profiler.report()
+    if not rows:
+        await message.answer("📭 Замеров пока нет")
+        return
+
+    lines = ["🗄 SQL-запросы по обработчикам (в среднем / максимум за обновление)\n"]
+    for name, updates, average, maximum, repeated in rows:
+        lines.append(f"{name}: n={updates}, запросов {average:.1f} / {maximum}")
+        for key, flagged in repeated:
+            lines.append(f"  ⚠️ N+1 в {flagged} обн.: {key[:120]}")
+    await message.answer("\n".join(lines))
+
+
+def _ratio(part: int, whole: int) -> str:
+    return f"{part / whole * 100:.0f}%" if whole else "—"
+
+
+@admin_router.message(Command("perf"))
+async def cmd_perf(message: Message):
+    """Сводка состояния бота из счетчиков в памяти"""
+    if not is_admin(message):
+        await message.answer("❌ У вас нет доступа к панели администратора.")
+        return
+
+    perf = collect_perf()
+    hours, rest = divmod(int(perf.uptime), 3600)
+    fsm_total = sum(perf.fsm_states.values())
+    fsm_top = ", ".join(f"{state.split(':')[-1]}={count}" for state, count in perf.fsm_states.most_common(5))
+    uploads = "нет данных сверки"
+    if perf.uploads_size is not None:
+        uploads = f"{format_size(perf.uploads_size)} (сверка {perf.uploads_checked_at:%H:%M} UTC)"
+
+    lines = [
+        "📈 Состояние бота\n",
+        f"Работает: {hours} ч {rest // 60} мин",
+        f"Обновлений: {perf.updates}, {perf.rate:.2f}/с за минуту, медленных {perf.slow}, "
+        f"обрабатывается {perf.in_flight}",
+        f"Время обработки, мс: p50={perf.p50 * 1000:.0f}, p95={perf.p95 * 1000:.0f}, p99={perf.p99 * 1000:.0f}",
+        f"Цикл событий: блокировок {perf.loop_stalls}, макс. задержка {perf.loop_lag_max * 1000:.0f} мс",
+        f"Telegram API: запросов {perf.api_calls}, ошибок {perf.api_errors} ({_ratio(perf.api_errors, perf.api_calls)})",
+        "",
+        f"Фоновые задачи: админ. {perf.admin_tasks}, рассылок {perf.broadcasts}, "
+        f"загрузок в очереди {perf.downloads_pending}, проверок архивов {perf.archive_checks}, "
+        f"всего asyncio {perf.asyncio_tasks}",
+        f"Состояния FSM: {fsm_total}" + (f" ({fsm_top})" if fsm_top else ""),
+        "",
+        f"БД: {format_size(perf.db_size) if perf.db_size is not None else '—'}",
+        f"Загрузки: {uploads}",
+        "",
+        f"Кэш FSM: {_ratio(perf.fsm_hits, perf.fsm_hits + perf.fsm_misses)} попаданий",
+        f"Кэш клавиатур: {_ratio(perf.keyboard_hits, perf.keyboard_hits + perf.keyboard_misses)} попаданий",
+        f"Пропущено правок без изменений: {_ratio(perf.render_skipped, perf.render_edits + perf.render_skipped)}",
+    ]
+    if perf.log_dropped:
+        lines.append(f"⚠️ Отброшено записей лога: {perf.log_dropped}")
+    await message.answer("\n".join(lines))
+
+
+@callback_table.exact("admin_view_accounts")
 async def view_accounts_menu(callback: CallbackQuery, session: AsyncSession):
     """Меню просмотра аккаунтов"""
     if not is_admin(callback):
@@ -84,46 +304,39 @@ async def view_accounts_menu(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "admin_manage_users")
+@callback_table.exact("admin_manage_users")
 async def manage_users_menu(callback: CallbackQuery, session: AsyncSession):
     """Меню управления пользователями"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    users = await UserRepository.get_all_users(session)
-    allowed_count = sum(1 for u in users if u.access)
-    blocked_count = len(users) - allowed_count
+    # Ответить сразу: статистика считается запросом в БД без загрузки всех пользователей
+    await callback.answer()
+    total_count, allowed_count = await UserRepository.count_users_by_access(session)
+    blocked_count = total_count - allowed_count
 
     try:
         await callback.message.edit_text(
             f"👥 Управление пользователями\n\n"
             f"📊 Статистика:\n"
-            f"• Всего пользователей: {len(users)}\n"
+            f"• Всего пользователей: {total_count}\n"
             f"• С доступом: {allowed_count}\n"
             f"• Без доступа: {blocked_count}",
             reply_markup=get_user_management_keyboard()
         )
     except Exception:
         pass
-    await callback.answer()
 
 
-@admin_router.callback_query(F.data == "admin_send_notification")
+@callback_table.exact("admin_send_notification")
 async def send_notification_menu(callback: CallbackQuery, session: AsyncSession):
     """Меню отправки уведомления"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    kb_buttons = [
-        [InlineKeyboardButton(text="💰 Зарплата выдана", callback_data="notify_salary")],
-        [InlineKeyboardButton(text="📞 Назначен созвон", callback_data="notify_call")],
-        [InlineKeyboardButton(text="⚠️ Назначен штраф", callback_data="notify_penalty")],
-        [InlineKeyboardButton(text="📝 Кастомное уведомление", callback_data="notify_custom")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_notification_menu_keyboard()
 
     try:
         await callback.message.edit_text(
@@ -136,7 +349,7 @@ async def send_notification_menu(callback: CallbackQuery, session: AsyncSession)
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "admin_respond_numbers")
+@callback_table.exact("admin_respond_numbers")
 async def respond_numbers_menu(callback: CallbackQuery, session: AsyncSession):
     """Меню ответа на запрос номеров"""
     if not is_admin(callback):
@@ -145,10 +358,7 @@ async def respond_numbers_menu(callback: CallbackQuery, session: AsyncSession):
 
     users = await UserRepository.get_all_users(session)
     if not users:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard()
         await callback.message.edit_text("👥 Пользователи не найдены", reply_markup=keyboard)
         await callback.answer()
         return
@@ -157,7 +367,7 @@ async def respond_numbers_menu(callback: CallbackQuery, session: AsyncSession):
     kb_buttons = []
     for u in users:
         label = f"{u.username or u.tg_id} ({u.tg_id})"
-        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"respond_numbers_user_{u.id}")])
+        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=NumbersRecipient(user_id=u.id).pack())])
 
     # добавить кнопку назад
     kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")])
@@ -170,18 +380,14 @@ async def respond_numbers_menu(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("numbers_sent_confirm_"))
-async def numbers_sent_confirm(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(NumbersDone)
+async def numbers_sent_confirm(callback: CallbackQuery, callback_data: NumbersDone, session: AsyncSession):
     """Обработчик подтверждения пополнения номеров"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -197,8 +403,7 @@ async def numbers_sent_confirm(callback: CallbackQuery, session: AsyncSession):
     )
 
     # Отправить уведомление пользователю о пополнении
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     try:
         await bot.send_message(
             user.tg_id,
@@ -214,18 +419,14 @@ async def numbers_sent_confirm(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("proxy_sent_confirm_"))
-async def proxy_sent_confirm(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(ProxyDone)
+async def proxy_sent_confirm(callback: CallbackQuery, callback_data: ProxyDone, session: AsyncSession):
     """Обработчик подтверждения пополнения прокси"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -241,8 +442,7 @@ async def proxy_sent_confirm(callback: CallbackQuery, session: AsyncSession):
     )
 
     # Отправить уведомление пользователю о пополнении
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     try:
         await bot.send_message(
             user.tg_id,
@@ -258,18 +458,14 @@ async def proxy_sent_confirm(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("proxy_respond_"))
-async def proxy_respond(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callback_table.on(ProxyReply)
+async def proxy_respond(callback: CallbackQuery, callback_data: ProxyReply, state: FSMContext, session: AsyncSession):
     """Обработчик кнопки ответа на запрос прокси"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -288,18 +484,15 @@ async def proxy_respond(callback: CallbackQuery, state: FSMContext, session: Asy
 
 
 
-@admin_router.callback_query(F.data.startswith("numbers_respond_"))
-async def numbers_respond(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callback_table.on(NumbersReply)
+async def numbers_respond(callback: CallbackQuery, callback_data: NumbersReply, state: FSMContext,
+                          session: AsyncSession):
     """Обработчик кнопки ответа на запрос номеров"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -318,18 +511,15 @@ async def numbers_respond(callback: CallbackQuery, state: FSMContext, session: A
 
 
 
-@admin_router.callback_query(F.data.startswith("respond_numbers_user_"))
-async def respond_numbers_user_selected(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callback_table.on(NumbersRecipient)
+async def respond_numbers_user_selected(callback: CallbackQuery, callback_data: NumbersRecipient, state: FSMContext,
+                                        session: AsyncSession):
     """Выбран пользователь для отправки номеров"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Некорректный пользователь.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -367,8 +557,7 @@ async def handle_numbers_input(message: Message, state: FSMContext, session: Asy
         return
 
     # Отправить ответ пользователю
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
+    bot = message.bot
 
     try:
         await bot.send_message(
@@ -419,8 +608,7 @@ async def handle_proxy_input(message: Message, state: FSMContext, session: Async
         return
 
     # Отправить ответ пользователю
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
+    bot = message.bot
 
     try:
         await bot.send_message(
@@ -453,7 +641,7 @@ async def handle_proxy_input(message: Message, state: FSMContext, session: Async
 
 
 
-@admin_router.callback_query(F.data == "admin_back")
+@callback_table.exact("admin_back")
 async def admin_back(callback: CallbackQuery):
     """Вернуться в главное меню администратора"""
     if not is_admin(callback):
@@ -471,61 +659,75 @@ async def admin_back(callback: CallbackQuery):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "accounts_all")
-async def show_all_accounts(callback: CallbackQuery, session: AsyncSession):
+@callback_table.exact("accounts_all")
+async def show_all_accounts(callback: CallbackQuery):
     """Показать все аккаунты и отправить архив со всеми файлами"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    accounts = await AccountRepository.get_all_accounts(session)
+    # Сбор архива может занять минуты, поэтому выполняется в фоне
+    await admin_tasks.run(callback, "accounts_export", lambda progress: _export_all_accounts(callback, progress))
+
+
+def _add_account_to_zip(zf, arcname: str, location):
+    if location.is_cold:
+        # Архив из холодного хранилища читается из пакета по смещению
+        with location.open() as src, zf.open(arcname, "w", force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    else:
+        zf.write(str(location.path), arcname=arcname)
 
-    if not accounts:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_view_accounts")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
-        await callback.message.edit_text("📭 Аккаунты не найдены", reply_markup=keyboard)
-        await callback.answer()
-        return
 
-    # Подготовить список существующих файлов из data/uploads
-    from config import UPLOAD_DIR
+async def _export_all_accounts(callback: CallbackQuery, progress):
+    """Собрать ZIP-архив со всеми файлами аккаунтов и отправить администратору"""
+    async with AsyncSessionLocal() as session:
+        accounts = await AccountRepository.get_all_accounts(session)
+
+        if not accounts:
+            keyboard = get_admin_panel_keyboard("admin_view_accounts")
+            await progress.update("📭 Аккаунты не найдены", force=True, reply_markup=keyboard)
+            return
+
+        # Подготовить список существующих файлов: по индексу сверки, диск проверяется только для непроиндексированных
+        indexed_paths = await FileIndexRepository.get_file_paths(session)
+        blobs = await BlobRepository.get_by_sha256s(session, {acc.sha256 for acc in accounts if acc.sha256})
     existing_files = []
     for acc in accounts:
-        path = UPLOAD_DIR / str(acc.user_id) / acc.file_path
-        if path.exists():
-            existing_files.append((acc, path))
+        location = locate_account_file(acc, blobs.get(acc.sha256))
+        if location.is_cold or get_account_relative_path(acc) in indexed_paths or location.path.exists():
+            existing_files.append((acc, location))
 
-    # Создать архив со всеми файлами
-    import tempfile, zipfile, os
-    
-    bot = Bot(token=BOT_TOKEN)
     tmp_zip = None
-    
     try:
         # Создать временный ZIP-архив
         tmp = tempfile.NamedTemporaryFile(prefix="accounts_all_", suffix=".zip", delete=False)
         tmp_zip = tmp.name
         tmp.close()
 
-        # Добавить все файлы в архив
+        # Добавить все файлы в архив, файлы пишутся в отдельном потоке
+        archived = 0
         with zipfile.ZipFile(tmp_zip, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for acc, path in existing_files:
-                arcname = f"account_{acc.id}_{path.name}"
-                zf.write(str(path), arcname=arcname)
+            for done, (acc, location) in enumerate(existing_files, start=1):
+                arcname = f"account_{acc.id}_{get_account_filename(acc)}"
+                try:
+                    await asyncio.to_thread(_add_account_to_zip, zf, arcname, location)
+                    archived += 1
+                except FileNotFoundError:
+                    # Файл удален после последней сверки
+                    pass
+                await progress.update(f"📦 Собираю архив: {done} из {len(existing_files)} файлов...")
 
         # Отправить архив
-        await callback.message.edit_text(f"📦 Отправляю архив со всеми {len(existing_files)} файлами...")
-        await bot.send_document(callback.from_user.id, FSInputFile(tmp_zip))
-        
+        await progress.update(f"📦 Отправляю архив со всеми {archived} файлами...", force=True)
+        await callback.bot.send_document(callback.from_user.id, FSInputFile(tmp_zip))
+
         # Отправить итог
-        await callback.message.answer(f"✅ Всего аккаунтов: {len(accounts)} (файлов архивировано: {len(existing_files)})")
-    
+        await callback.message.answer(f"✅ Всего аккаунтов: {len(accounts)} (файлов архивировано: {archived})")
+
     except Exception as e:
         await callback.message.answer(f"❌ Ошибка при создании архива: {str(e)}")
-    
+
     finally:
         # Очистка временного файла
         if tmp_zip and os.path.exists(tmp_zip):
@@ -534,10 +736,8 @@ async def show_all_accounts(callback: CallbackQuery, session: AsyncSession):
             except Exception:
                 pass
 
-    await callback.answer()
-
 
-@admin_router.callback_query(F.data == "accounts_by_user")
+@callback_table.exact("accounts_by_user")
 async def accounts_by_user(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Показать список пользователей для выбора"""
     if not is_admin(callback):
@@ -546,11 +746,7 @@ async def accounts_by_user(callback: CallbackQuery, state: FSMContext, session:
 
     users = await UserRepository.get_all_users(session)
     if not users:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_view_accounts")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("admin_view_accounts")
         await callback.message.edit_text("👥 Пользователи не найдены", reply_markup=keyboard)
         await callback.answer()
         return
@@ -559,7 +755,7 @@ async def accounts_by_user(callback: CallbackQuery, state: FSMContext, session:
     kb_buttons = []
     for u in users:
         label = f"{u.username or u.tg_id} ({u.tg_id})"
-        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"accounts_user_{u.id}")])
+        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=UserAccounts(user_id=u.id).pack())])
 
     # добавить кнопку назад
     kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")])
@@ -569,28 +765,21 @@ async def accounts_by_user(callback: CallbackQuery, state: FSMContext, session:
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("accounts_user_"))
-async def accounts_user_selected(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callback_table.on(UserAccounts)
+async def accounts_user_selected(callback: CallbackQuery, callback_data: UserAccounts, state: FSMContext,
+                                 session: AsyncSession):
     """Показать аккаунты пользователя кнопками"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Некорректный пользователь.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     # Получить все аккаунты пользователя
     accounts = await AccountRepository.get_accounts_by_user(session, user_id)
     
     if not accounts:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="accounts_by_user")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("accounts_by_user")
         await callback.message.edit_text(f"📭 Аккаунты не найдены для пользователя ID {user_id}", reply_markup=keyboard)
         await callback.answer()
         return
@@ -610,9 +799,9 @@ async def accounts_user_selected(callback: CallbackQuery, state: FSMContext, ses
             status_text = "Не проверен"
         
         # Извлечь только имя файла (без пути)
-        filename = Path(acc.file_path).name
+        filename = get_account_filename(acc)
         button_text = f"{status_emoji} {filename} - {status_text}"
-        kb_buttons.append([InlineKeyboardButton(text=button_text, callback_data=f"acc_edit_{acc.id}")])
+        kb_buttons.append([InlineKeyboardButton(text=button_text, callback_data=AccountEdit(account_id=acc.id).pack())])
 
     # Добавить кнопку назад
     kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")])
@@ -626,60 +815,41 @@ async def accounts_user_selected(callback: CallbackQuery, state: FSMContext, ses
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("acc_edit_"))
-async def edit_account_status(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(AccountEdit)
+async def edit_account_status(callback: CallbackQuery, callback_data: AccountEdit, session: AsyncSession):
     """Показать детали аккаунта с возможностью изменения"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        account_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Некорректный аккаунт.", show_alert=True)
-        return
+    account_id = callback_data.account_id
 
     account = await AccountRepository.get_account_by_id(session, account_id)
     if not account:
         await callback.answer("❌ Аккаунт не найден.", show_alert=True)
         return
 
-    message_text = format_account_info(account)
-
-    # Построить кнопки для действий
-    kb_buttons = []
-    
-    # Если не отправлен, добавить кнопку "Отправлено"
-    if not account.sent:
-        kb_buttons.append([InlineKeyboardButton(text="✅ Отправлено", callback_data=f"account_sent_{account.id}")])
-    
-    # Кнопки блокировки/разблокировки
-    if not account.locked:
-        kb_buttons.append([InlineKeyboardButton(text="🔒 Заблокировать", callback_data=f"account_lock_{account.id}")])
-    else:
-        kb_buttons.append([InlineKeyboardButton(text="🔓 Разблокировать", callback_data=f"account_unlock_{account.id}")])
-
-    kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data=f"accounts_user_{account.user_id}")])
+    check = await ArchiveRepository.get_check(session, account.id)
+    members = await ArchiveRepository.get_members(session, account.id, limit=10)
+    message_text = format_account_info(account, check, members)
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    # Кнопка "Отправлено" только для неотправленных, блокировка/разблокировка по статусу
+    keyboard = get_account_edit_keyboard(
+        account.id, not account.sent, account.locked, UserAccounts(user_id=account.user_id).pack()
+    )
     await callback.message.edit_text(message_text, reply_markup=keyboard)
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("acc_status_"))
-async def set_account_status(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(AccountStatus)
+async def set_account_status(callback: CallbackQuery, callback_data: AccountStatus, session: AsyncSession):
     """Установить статус аккаунта и уведомить пользователя"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        parts = callback.data.split("_")
-        account_id = int(parts[2])
-        status = parts[3]  # verified, locked, unverified
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    account_id = callback_data.account_id
+    status = callback_data.status  # locked, unverified
 
     account = await AccountRepository.get_account_by_id(session, account_id)
     if not account:
@@ -699,10 +869,9 @@ async def set_account_status(callback: CallbackQuery, session: AsyncSession):
     await session.commit()
 
     # Отправить уведомление пользователю
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     user = await UserRepository.get_user_by_id(session, account.user_id)
-    filename = Path(account.file_path).name
+    filename = get_account_filename(account)
     
     try:
         await bot.send_message(
@@ -721,64 +890,49 @@ async def set_account_status(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "accounts_unsent")
+@callback_table.exact("accounts_unsent")
 async def show_unsent_accounts(callback: CallbackQuery, session: AsyncSession):
     """Показать список пользователей с неотправленными аккаунтами"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    accounts = await AccountRepository.get_unsent_accounts(session)
+    # Пользователи вместе с числом неотправленных аккаунтов одним запросом
+    users = await AccountRepository.get_users_with_unsent_accounts(session)
 
-    if not accounts:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_view_accounts")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    if not users:
+        keyboard = get_admin_panel_keyboard("admin_view_accounts")
         await callback.message.edit_text("✅ Все аккаунты отправлены", reply_markup=keyboard)
         await callback.answer()
         return
 
-    # Получить уникальных пользователей с неотправленными аккаунтами
-    users_dict = {}
-    for account in accounts:
-        if account.user_id not in users_dict:
-            user = await UserRepository.get_user_by_id(session, account.user_id)
-            if user:
-                users_dict[account.user_id] = user
-
     # Построить кнопки пользователей
     kb_buttons = []
-    for user_id, user in users_dict.items():
+    for user, _ in users:
         label = f"{user.username or user.tg_id}"
-        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"unsent_user_{user_id}")])
+        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=UnsentUser(user_id=user.id).pack())])
 
     kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_view_accounts")])
     keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
     
     await callback.message.edit_text(
         f"⏳ Неотправленные аккаунты\n\n"
-        f"Всего аккаунтов: {len(accounts)}\n"
-        f"Пользователей: {len(users_dict)}\n\n"
+        f"Всего аккаунтов: {sum(count for _, count in users)}\n"
+        f"Пользователей: {len(users)}\n\n"
         f"Выберите пользователя:",
         reply_markup=keyboard
     )
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("unsent_user_"))
-async def show_user_unsent_accounts(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(UnsentUser)
+async def show_user_unsent_accounts(callback: CallbackQuery, callback_data: UnsentUser, session: AsyncSession):
     """Показать неотправленные аккаунты выбранного пользователя"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     # Получить все аккаунты пользователя
     accounts = await AccountRepository.get_accounts_by_user(session, user_id)
@@ -786,11 +940,7 @@ async def show_user_unsent_accounts(callback: CallbackQuery, session: AsyncSessi
     unsent_accounts = [acc for acc in accounts if not acc.sent]
 
     if not unsent_accounts:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="accounts_unsent")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("accounts_unsent")
         await callback.message.edit_text(
             "✅ У этого пользователя нет неотправленных аккаунтов",
             reply_markup=keyboard
@@ -803,7 +953,7 @@ async def show_user_unsent_accounts(callback: CallbackQuery, session: AsyncSessi
     for account in unsent_accounts:
         status_locked = "🔒" if account.locked else "✅"
         label = f"{status_locked} #{account.id} | {account.month}"
-        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"unsent_account_{account.id}")])
+        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=UnsentAccount(account_id=account.id).pack())])
 
     kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="accounts_unsent")])
     keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
@@ -817,18 +967,14 @@ async def show_user_unsent_accounts(callback: CallbackQuery, session: AsyncSessi
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("unsent_account_"))
-async def show_unsent_account_details(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(UnsentAccount)
+async def show_unsent_account_details(callback: CallbackQuery, callback_data: UnsentAccount, session: AsyncSession):
     """Показать детали неотправленного аккаунта с кнопкой отправки"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        account_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    account_id = callback_data.account_id
 
     account = await AccountRepository.get_account_by_id(session, account_id)
     if not account:
@@ -837,38 +983,26 @@ async def show_unsent_account_details(callback: CallbackQuery, session: AsyncSes
         return
 
     user = await UserRepository.get_user_by_id(session, account.user_id)
-    message_text = format_account_info(account)
+    check = await ArchiveRepository.get_check(session, account.id)
+    members = await ArchiveRepository.get_members(session, account.id, limit=10)
+    message_text = format_account_info(account, check, members)
     message_text += f"\n\n👤 Пользователь: @{user.username}"
 
     # Построить кнопки действий
-    kb_buttons = [
-        [InlineKeyboardButton(text="✅ Отправлено", callback_data=f"account_sent_{account.id}")],
-    ]
-
-    if not account.locked:
-        kb_buttons.append([InlineKeyboardButton(text="🔒 Заблокировать", callback_data=f"account_lock_{account.id}")])
-    else:
-        kb_buttons.append([InlineKeyboardButton(text="🔓 Разблокировать", callback_data=f"account_unlock_{account.id}")])
-
-    kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data=f"unsent_user_{account.user_id}")])
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_account_edit_keyboard(account.id, True, account.locked, UnsentUser(user_id=account.user_id).pack())
 
     await callback.message.edit_text(message_text, reply_markup=keyboard)
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("account_sent_"))
-async def mark_account_sent(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(AccountSent)
+async def mark_account_sent(callback: CallbackQuery, callback_data: AccountSent, session: AsyncSession):
     """Отметить аккаунт как отправленный"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        account_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    account_id = callback_data.account_id
 
     account = await AccountRepository.get_account_by_id(session, account_id)
     if not account:
@@ -882,9 +1016,8 @@ async def mark_account_sent(callback: CallbackQuery, session: AsyncSession):
     await session.commit()
 
     # Отправить уведомление пользователю
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
-    filename = Path(account.file_path).name
+    bot = callback.bot
+    filename = get_account_filename(account)
     
     try:
         await bot.send_message(
@@ -896,8 +1029,7 @@ async def mark_account_sent(callback: CallbackQuery, session: AsyncSession):
     except:
         pass
 
-    kb_buttons = [[InlineKeyboardButton(text="🔙 Назад", callback_data=f"unsent_user_{account.user_id}")]]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_back_keyboard(UnsentUser(user_id=account.user_id).pack())
     
     await callback.message.edit_text(
         f"✅ Аккаунт {filename} отмечен как отправленный\n\n"
@@ -909,18 +1041,14 @@ async def mark_account_sent(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("account_lock_"))
-async def lock_account(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(AccountLock)
+async def lock_account(callback: CallbackQuery, callback_data: AccountLock, session: AsyncSession):
     """Заблокировать аккаунт"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        account_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    account_id = callback_data.account_id
 
     account = await AccountRepository.get_account_by_id(session, account_id)
     if not account:
@@ -934,9 +1062,8 @@ async def lock_account(callback: CallbackQuery, session: AsyncSession):
     await session.commit()
 
     # Отправить уведомление пользователю
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
-    filename = Path(account.file_path).name
+    bot = callback.bot
+    filename = get_account_filename(account)
     
     try:
         await bot.send_message(
@@ -948,8 +1075,7 @@ async def lock_account(callback: CallbackQuery, session: AsyncSession):
     except:
         pass
 
-    kb_buttons = [[InlineKeyboardButton(text="🔙 Назад", callback_data=f"unsent_user_{account.user_id}")]]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_back_keyboard(UnsentUser(user_id=account.user_id).pack())
     
     await callback.message.edit_text(
         f"✅ Аккаунт {filename} заблокирован\n\n"
@@ -961,18 +1087,14 @@ async def lock_account(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("account_unlock_"))
-async def unlock_account(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(AccountUnlock)
+async def unlock_account(callback: CallbackQuery, callback_data: AccountUnlock, session: AsyncSession):
     """Разблокировать аккаунт"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        account_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    account_id = callback_data.account_id
 
     account = await AccountRepository.get_account_by_id(session, account_id)
     if not account:
@@ -986,9 +1108,8 @@ async def unlock_account(callback: CallbackQuery, session: AsyncSession):
     await session.commit()
 
     # Отправить уведомление пользователю
-    from aiogram import Bot
-    bot = Bot(token=BOT_TOKEN)
-    filename = Path(account.file_path).name
+    bot = callback.bot
+    filename = get_account_filename(account)
     
     try:
         await bot.send_message(
@@ -1000,8 +1121,7 @@ async def unlock_account(callback: CallbackQuery, session: AsyncSession):
     except:
         pass
 
-    kb_buttons = [[InlineKeyboardButton(text="🔙 Назад", callback_data=f"unsent_user_{account.user_id}")]]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_back_keyboard(UnsentUser(user_id=account.user_id).pack())
     
     await callback.message.edit_text(
         f"✅ Аккаунт {filename} разблокирован\n\n"
@@ -1013,14 +1133,15 @@ async def unlock_account(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("notify_") & ~F.data.startswith("notify_user_select_"))
-async def handle_notification_callback(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callback_table.on(Notify)
+async def handle_notification_callback(callback: CallbackQuery, callback_data: Notify, state: FSMContext,
+                                       session: AsyncSession):
     """Обработчик выбора типа уведомления"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    notification_type = callback.data.replace("notify_", "")
+    notification_type = callback_data.kind
 
     if notification_type == "custom":
         # Кастомное уведомление
@@ -1046,12 +1167,7 @@ async def handle_notification_callback(callback: CallbackQuery, state: FSMContex
             await state.set_state(AdminStates.waiting_for_call_datetime)
         else:
             # Спросить кому отправить для остальных типов
-            kb_buttons = [
-                [InlineKeyboardButton(text="👤 Конкретному пользователю", callback_data="notify_single")],
-                [InlineKeyboardButton(text="👥 Всем пользователям", callback_data="notify_all")],
-                [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_send_notification")],
-            ]
-            keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+            keyboard = get_notification_recipient_keyboard()
             await callback.message.edit_text(
                 "👥 Кому отправить уведомление?",
                 reply_markup=keyboard
@@ -1076,7 +1192,7 @@ async def handle_notification_callback(callback: CallbackQuery, state: FSMContex
                 if user.tg_id == callback.from_user.id:  # Пропустить текущего админа
                     continue
                 label = f"@{user.username}" if user.username else f"ID: {user.tg_id}"
-                kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"notify_user_select_{user.id}")])
+                kb_buttons.append([InlineKeyboardButton(text=label, callback_data=NotifyRecipient(user_id=user.id).pack())])
 
             if not kb_buttons:
                 await callback.message.edit_text("👥 Нет других пользователей")
@@ -1100,11 +1216,7 @@ async def handle_notification_callback(callback: CallbackQuery, state: FSMContex
                 call_datetime = data.get("call_datetime")
                 text = get_notification_text(notification_type, call_datetime)
             
-            kb_buttons = [
-                [InlineKeyboardButton(text="✅ Да", callback_data="confirm_yes")],
-                [InlineKeyboardButton(text="❌ Нет", callback_data="confirm_no")],
-            ]
-            keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+            keyboard = get_notification_confirm_keyboard()
             
             await callback.message.edit_text(
                 f"📢 Уведомление\n\n{text}\n\n"
@@ -1129,12 +1241,7 @@ async def get_call_datetime(message: Message, state: FSMContext):
     await state.update_data(call_datetime=datetime_text)
     
     # Спросить кому отправить
-    kb_buttons = [
-        [InlineKeyboardButton(text="👤 Конкретному пользователю", callback_data="notify_single")],
-        [InlineKeyboardButton(text="👥 Всем пользователям", callback_data="notify_all")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_send_notification")],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_notification_recipient_keyboard()
     
     await message.answer(
         "👥 Кому отправить уведомление?",
@@ -1158,12 +1265,7 @@ async def handle_custom_notification_text(message: Message, state: FSMContext):
     await state.update_data(custom_notification_text=custom_text, notification_type="custom")
     
     # Спросить кому отправить
-    kb_buttons = [
-        [InlineKeyboardButton(text="👤 Конкретному пользователю", callback_data="notify_single")],
-        [InlineKeyboardButton(text="👥 Всем пользователям", callback_data="notify_all")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_send_notification")],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_notification_recipient_keyboard()
     
     await message.answer(
         f"📝 Ваше уведомление:\n\n{custom_text}\n\n"
@@ -1172,20 +1274,15 @@ async def handle_custom_notification_text(message: Message, state: FSMContext):
     )
 
 
-@admin_router.callback_query(F.data.startswith("notify_user_select_"))
-async def select_notification_user(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callback_table.on(NotifyRecipient)
+async def select_notification_user(callback: CallbackQuery, callback_data: NotifyRecipient, state: FSMContext,
+                                   session: AsyncSession):
     """Выбрать пользователя для отправки уведомления из списка"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception as e:
-        import logging
-        logging.error(f"Error parsing user_id from {callback.data}: {e}")
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -1207,11 +1304,7 @@ async def select_notification_user(callback: CallbackQuery, state: FSMContext, s
     if not text:
         text = "Уведомление"
 
-    kb_buttons = [
-        [InlineKeyboardButton(text="✅ Да", callback_data="confirm_yes")],
-        [InlineKeyboardButton(text="❌ Нет", callback_data="confirm_no")],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_notification_confirm_keyboard()
 
     user_label = f"ID: {user.tg_id}"
     if user.username and user.username != "!":
@@ -1230,7 +1323,7 @@ async def select_notification_user(callback: CallbackQuery, state: FSMContext, s
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "confirm_yes")
+@callback_table.exact("confirm_yes")
 async def send_notification(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Отправить уведомление"""
     if not is_admin(callback):
@@ -1242,10 +1335,6 @@ async def send_notification(callback: CallbackQuery, state: FSMContext, session:
     recipient_id = data.get("recipient_id")
     notification_type = data.get("notification_type", "custom")
 
-    from aiogram import Bot
-    from config import BOT_TOKEN
-    bot = Bot(token=BOT_TOKEN)
-
     # Получить текст в зависимости от типа уведомления
     if notification_type == "custom":
         text = data.get("custom_notification_text", "Уведомление")
@@ -1256,13 +1345,13 @@ async def send_notification(callback: CallbackQuery, state: FSMContext, session:
         log_action = f"notification_sent_{notification_type}"
 
     if recipient_type == "single":
+        await callback.answer()
         if not recipient_id:
             await callback.message.edit_text("❌ Ошибка: получатель не выбран")
-            await callback.answer()
             return
-        
+
         try:
-            await bot.send_message(recipient_id, text)
+            await callback.bot.send_message(recipient_id, text)
             await callback.message.edit_text("✅ Уведомление отправлено")
             await LogRepository.create_log(
                 session, log_action, 
@@ -1270,33 +1359,51 @@ async def send_notification(callback: CallbackQuery, state: FSMContext, session:
             )
         except Exception as e:
             await callback.message.edit_text(f"❌ Ошибка при отправке\n\n{str(e)}")
+        await state.clear()
     else:  # all
-        users = await UserRepository.get_all_users(session)
-        sent_count = 0
-        for user in users:
-            if user.access:  # Отправить только пользователям с доступом
-                try:
-                    await bot.send_message(user.tg_id, text)
-                    sent_count += 1
-                except:
-                    pass
+        # Рассылка идет в фоне; состояние очищается только после запуска, чтобы повторное нажатие не дублировало ее
+        if await admin_tasks.run(
+            callback, "broadcast", lambda progress: _broadcast_notification(callback, text, log_action, progress)
+        ):
+            await state.clear()
+
+
+async def _broadcast_notification(callback: CallbackQuery, text: str, log_action: str, progress):
+    """Разослать уведомление всем пользователям с доступом"""
+    async with AsyncSessionLocal() as session:
+        recipients = await UserRepository.get_allowed_tg_ids(session)
+
+    sent_count = 0
+    pending = len(recipients)
+    BROADCASTS_RUNNING.inc()
+    BROADCAST_PENDING.inc(pending)
+    try:
+        for done, tg_id in enumerate(recipients, start=1):
+            try:
+                await callback.bot.send_message(tg_id, text)
+                sent_count += 1
+                BROADCAST_MESSAGES.inc(result="sent")
+            except Exception:
+                BROADCAST_MESSAGES.inc(result="failed")
+            pending -= 1
+            BROADCAST_PENDING.dec()
+            await progress.update(f"📤 Рассылка: {done} из {len(recipients)} (доставлено {sent_count})")
+    finally:
+        BROADCASTS_RUNNING.dec()
+        BROADCAST_PENDING.dec(pending)
 
-        await callback.message.edit_text(
-            f"✅ Уведомление отправлено {sent_count} пользователям"
-        )
-        
-        log_action_all = log_action.replace("_sent", "_sent_all")
+    await progress.update(f"✅ Уведомление отправлено {sent_count} пользователям", force=True)
+
+    log_action_all = log_action.replace("_sent", "_sent_all")
+    async with AsyncSessionLocal() as session:
         await LogRepository.create_log(
             session, log_action_all,
             admin_id=callback.from_user.id,
             description=f"Sent to {sent_count} users"
         )
 
-    await state.clear()
-    await callback.answer()
-
 
-@admin_router.callback_query(F.data == "confirm_no")
+@callback_table.exact("confirm_no")
 async def cancel_notification(callback: CallbackQuery, state: FSMContext):
     """Отменить отправку уведомления"""
     await callback.message.edit_text("❌ Отменено")
@@ -1304,7 +1411,7 @@ async def cancel_notification(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "manage_allow_user")
+@callback_table.exact("manage_allow_user")
 async def manage_allow_user_callback(callback: CallbackQuery, session: AsyncSession):
     """Показать список пользователей для разрешения доступа"""
     if not is_admin(callback):
@@ -1313,11 +1420,7 @@ async def manage_allow_user_callback(callback: CallbackQuery, session: AsyncSess
 
     users = await UserRepository.get_all_users(session)
     if not users:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("admin_manage_users")
         await callback.message.edit_text("👥 Нет пользователей", reply_markup=keyboard)
         await callback.answer()
         return
@@ -1327,14 +1430,10 @@ async def manage_allow_user_callback(callback: CallbackQuery, session: AsyncSess
     for user in users:
         if not user.access:
             label = f"@{user.username}" if user.username else f"ID: {user.tg_id}"
-            kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"user_allow_{user.id}")])
+            kb_buttons.append([InlineKeyboardButton(text=label, callback_data=UserAllow(user_id=user.id).pack())])
 
     if not kb_buttons:
-        kb_buttons_empty = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons_empty)
+        keyboard = get_admin_panel_keyboard("admin_manage_users")
         await callback.message.edit_text("✅ Все пользователи уже имеют доступ", reply_markup=keyboard)
         await callback.answer()
         return
@@ -1345,7 +1444,7 @@ async def manage_allow_user_callback(callback: CallbackQuery, session: AsyncSess
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "manage_deny_user")
+@callback_table.exact("manage_deny_user")
 async def manage_deny_user_callback(callback: CallbackQuery, session: AsyncSession):
     """Показать список пользователей для запрещения доступа"""
     if not is_admin(callback):
@@ -1354,11 +1453,7 @@ async def manage_deny_user_callback(callback: CallbackQuery, session: AsyncSessi
 
     users = await UserRepository.get_all_users(session)
     if not users:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("admin_manage_users")
         await callback.message.edit_text("👥 Нет пользователей", reply_markup=keyboard)
         await callback.answer()
         return
@@ -1368,14 +1463,10 @@ async def manage_deny_user_callback(callback: CallbackQuery, session: AsyncSessi
     for user in users:
         if user.access:
             label = f"@{user.username}" if user.username else f"ID: {user.tg_id}"
-            kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"user_deny_{user.id}")])
+            kb_buttons.append([InlineKeyboardButton(text=label, callback_data=UserDeny(user_id=user.id).pack())])
 
     if not kb_buttons:
-        kb_buttons_empty = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons_empty)
+        keyboard = get_admin_panel_keyboard("admin_manage_users")
         await callback.message.edit_text("❌ Все пользователи уже без доступа", reply_markup=keyboard)
         await callback.answer()
         return
@@ -1386,7 +1477,7 @@ async def manage_deny_user_callback(callback: CallbackQuery, session: AsyncSessi
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "manage_user_info")
+@callback_table.exact("manage_user_info")
 async def manage_user_info_callback(callback: CallbackQuery, session: AsyncSession):
     """Показать список пользователей для получения информации"""
     if not is_admin(callback):
@@ -1395,11 +1486,7 @@ async def manage_user_info_callback(callback: CallbackQuery, session: AsyncSessi
 
     users = await UserRepository.get_all_users(session)
     if not users:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("admin_manage_users")
         await callback.message.edit_text("👥 Нет пользователей", reply_markup=keyboard)
         await callback.answer()
         return
@@ -1408,7 +1495,7 @@ async def manage_user_info_callback(callback: CallbackQuery, session: AsyncSessi
     kb_buttons = []
     for user in users:
         label = f"{user.username or user.tg_id}"
-        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=f"user_info_{user.id}")])
+        kb_buttons.append([InlineKeyboardButton(text=label, callback_data=UserInfo(user_id=user.id).pack())])
 
     kb_buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")])
     keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
@@ -1416,7 +1503,7 @@ async def manage_user_info_callback(callback: CallbackQuery, session: AsyncSessi
     await callback.answer()
 
 
-@admin_router.callback_query(F.data == "manage_list_users")
+@callback_table.exact("manage_list_users")
 async def manage_list_users_callback(callback: CallbackQuery, session: AsyncSession):
     """Показать список всех пользователей"""
     if not is_admin(callback):
@@ -1425,11 +1512,7 @@ async def manage_list_users_callback(callback: CallbackQuery, session: AsyncSess
 
     users = await UserRepository.get_all_users(session)
     if not users:
-        kb_buttons = [
-            [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")],
-            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+        keyboard = get_admin_panel_keyboard("admin_manage_users")
         await callback.message.edit_text("👥 Нет пользователей", reply_markup=keyboard)
         await callback.answer()
         return
@@ -1444,24 +1527,19 @@ async def manage_list_users_callback(callback: CallbackQuery, session: AsyncSess
     if len(users) > 30:
         message_text += f"\n... и еще {len(users) - 30} пользователей"
 
-    kb_buttons = [[InlineKeyboardButton(text="🔙 Назад", callback_data="admin_manage_users")]]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_back_keyboard("admin_manage_users")
     await callback.message.edit_text(message_text, reply_markup=keyboard)
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("user_allow_"))
-async def handle_user_allow(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(UserAllow)
+async def handle_user_allow(callback: CallbackQuery, callback_data: UserAllow, session: AsyncSession):
     """Разрешить доступ выбранному пользователю"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.update_user_access(session, user_id, True)
     if not user:
@@ -1475,7 +1553,7 @@ async def handle_user_allow(callback: CallbackQuery, session: AsyncSession):
     )
 
     # Отправить уведомление пользователю
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     try:
         await bot.send_message(
             user.tg_id,
@@ -1489,18 +1567,14 @@ async def handle_user_allow(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("user_deny_"))
-async def handle_user_deny(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(UserDeny)
+async def handle_user_deny(callback: CallbackQuery, callback_data: UserDeny, session: AsyncSession):
     """Запретить доступ выбранному пользователю"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.update_user_access(session, user_id, False)
     if not user:
@@ -1514,7 +1588,7 @@ async def handle_user_deny(callback: CallbackQuery, session: AsyncSession):
     )
 
     # Отправить уведомление пользователю
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     try:
         await bot.send_message(
             user.tg_id,
@@ -1528,18 +1602,14 @@ async def handle_user_deny(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("user_info_"))
-async def handle_user_info(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(UserInfo)
+async def handle_user_info(callback: CallbackQuery, callback_data: UserInfo, session: AsyncSession):
     """Показать информацию о выбранном пользователе"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
 
-    try:
-        user_id = int(callback.data.split("_")[-1])
-    except Exception:
-        await callback.answer("Ошибка обработки.", show_alert=True)
-        return
+    user_id = callback_data.user_id
 
     user = await UserRepository.get_user_by_id(session, user_id)
     if not user:
@@ -1580,7 +1650,7 @@ async def handle_user_manage_username(message: Message, state: FSMContext, sessi
         )
         
         # Отправить уведомление пользователю
-        bot = Bot(token=BOT_TOKEN)
+        bot = message.bot
         try:
             await bot.send_message(
                 user.tg_id,
@@ -1600,7 +1670,7 @@ async def handle_user_manage_username(message: Message, state: FSMContext, sessi
         )
         
         # Отправить уведомление пользователю
-        bot = Bot(token=BOT_TOKEN)
+        bot = message.bot
         try:
             await bot.send_message(
                 user.tg_id,
@@ -1622,7 +1692,7 @@ async def handle_user_manage_username(message: Message, state: FSMContext, sessi
     await message.answer("Выберите действие:", reply_markup=get_admin_main_keyboard())
 
 
-@admin_router.callback_query(F.data == "admin_add_admin")
+@callback_table.exact("admin_add_admin")
 async def add_admin_callback(callback: CallbackQuery, state: FSMContext):
     """Начать процесс добавления администратора"""
     if not is_admin(callback):
@@ -1631,7 +1701,8 @@ async def add_admin_callback(callback: CallbackQuery, state: FSMContext):
 
     await callback.message.edit_text(
         "➕ Добавить администратора\n\n"
-        "Введите username пользователя, которого нужно сделать администратором:"
+        "Введите username пользователя, которого нужно сделать администратором "
+        "(для администратора будет предложено снять права):"
     )
     await state.set_state(AdminStates.waiting_for_admin_username)
     await callback.answer()
@@ -1656,12 +1727,24 @@ async def handle_admin_username(message: Message, state: FSMContext, session: As
         await message.answer("Выберите действие:", reply_markup=get_admin_main_keyboard())
         return
     
-    # Проверить, не администратор ли уже
-    if user.tg_id in ADMIN_IDS:
-        await message.answer(
-            f"⚠️ Пользователь @{username} уже является администратором."
-        )
+    # Уже администратор: предложить снять права
+    if user.tg_id in admin_roles:
         await state.clear()
+        if user.tg_id in ADMIN_IDS:
+            # Роль из конфигурации восстановится при перезапуске
+            await message.answer(
+                f"⚠️ Пользователь @{username} назначен администратором через ADMIN_IDS.\n\n"
+                "Чтобы снять права, уберите его ID из ADMIN_IDS в файле .env и перезапустите бота."
+            )
+        elif user.tg_id == message.from_user.id:
+            await message.answer("⚠️ Нельзя снять права администратора с самого себя.")
+        else:
+            await message.answer(
+                f"⚠️ Пользователь @{username} уже является администратором.\n\n"
+                f"Снять с него права администратора?",
+                reply_markup=get_confirm_revoke_admin_keyboard(user.id)
+            )
+            return
         await message.answer("Выберите действие:", reply_markup=get_admin_main_keyboard())
         return
     
@@ -1669,13 +1752,7 @@ async def handle_admin_username(message: Message, state: FSMContext, session: As
     user_info = format_user_info(user)
     accounts = await AccountRepository.get_accounts_by_user(session, user.id)
     
-    kb_buttons = [
-        [
-            InlineKeyboardButton(text="✅ Да, добавить админом", callback_data=f"confirm_add_admin_{user.id}"),
-            InlineKeyboardButton(text="❌ Отмена", callback_data="admin_back")
-        ]
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_confirm_add_admin_keyboard(user.id)
     
     await message.answer(
         f"{user_info}\n\n"
@@ -1686,14 +1763,14 @@ async def handle_admin_username(message: Message, state: FSMContext, session: As
     await state.clear()
 
 
-@admin_router.callback_query(F.data.startswith("confirm_add_admin_"))
-async def confirm_add_admin(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(ConfirmAddAdmin)
+async def confirm_add_admin(callback: CallbackQuery, callback_data: ConfirmAddAdmin, session: AsyncSession):
     """Подтвердить добавление администратора"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
     
-    user_id = int(callback.data.split("_")[-1])
+    user_id = callback_data.user_id
     
     # Получить пользователя
     user = await session.get(User, user_id)
@@ -1702,25 +1779,75 @@ async def confirm_add_admin(callback: CallbackQuery, session: AsyncSession):
         await callback.answer("❌ Пользователь не найден.", show_alert=True)
         return
     
-    # Добавить в ADMIN_IDS (это требует изменения конфига, но мы можем отправить сообщение админу)
+    if user.tg_id in admin_roles:
+        await callback.answer("⚠️ Пользователь уже является администратором.", show_alert=True)
+        return
+
+    # Роль сохраняется в БД и действует сразу, без перезапуска бота
+    await admin_roles.grant(session, user)
+    await LogRepository.create_log(session, "admin_added", user.id, admin_id=callback.from_user.id)
+
+    try:
+        await callback.bot.send_message(
+            user.tg_id,
+            "👨‍💼 Вам выданы права администратора.\n\n"
+            "Панель администратора: /admin"
+        )
+    except Exception:
+        pass
+
     await callback.message.edit_text(
-        f"✅ Пользователь @{user.username} должен быть добавлен в ADMIN_IDS в config.py\n\n"
-        f"Telegram ID: `{user.tg_id}`\n\n"
-        f"Добавьте следующую строку в ADMIN_IDS в config.py:\n"
-        f"`{user.tg_id},  # @{user.username}`\n\n"
-        f"После этого перезагрузите бота."
+        f"✅ Пользователь @{user.username} назначен администратором\n\n"
+        f"Telegram ID: {user.tg_id}",
+        reply_markup=get_admin_panel_keyboard()
     )
     await callback.answer()
 
 
-@admin_router.callback_query(F.data.startswith("approve_new_user_"))
-async def approve_new_user(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(RevokeAdmin)
+async def confirm_revoke_admin(callback: CallbackQuery, callback_data: RevokeAdmin, session: AsyncSession):
+    """Подтвердить снятие роли администратора"""
+    if not is_admin(callback):
+        await callback.answer("❌ Доступ запрещен.", show_alert=True)
+        return
+
+    user = await session.get(User, callback_data.user_id)
+    if not user:
+        await callback.answer("❌ Пользователь не найден.", show_alert=True)
+        return
+
+    if user.tg_id not in admin_roles:
+        await callback.answer("⚠️ Пользователь не является администратором.", show_alert=True)
+        return
+    if user.tg_id in ADMIN_IDS or user.tg_id == callback.from_user.id:
+        await callback.answer("⚠️ С этого администратора нельзя снять права через бота.", show_alert=True)
+        return
+
+    # Роль снимается в БД и в кэше сразу, другие процессы подхватят ее при перезагрузке
+    await admin_roles.revoke(session, user)
+    await LogRepository.create_log(session, "admin_removed", user.id, admin_id=callback.from_user.id)
+
+    try:
+        await callback.bot.send_message(user.tg_id, "ℹ️ С вас сняты права администратора.")
+    except Exception:
+        pass
+
+    await callback.message.edit_text(
+        f"✅ С пользователя @{user.username} сняты права администратора\n\n"
+        f"Telegram ID: {user.tg_id}",
+        reply_markup=get_admin_panel_keyboard()
+    )
+    await callback.answer()
+
+
+@callback_table.on(ApproveUser)
+async def approve_new_user(callback: CallbackQuery, callback_data: ApproveUser, session: AsyncSession):
     """Одобрить доступ для нового пользователя"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
     
-    user_id = int(callback.data.split("_")[-1])
+    user_id = callback_data.user_id
     user = await session.get(User, user_id)
     
     if not user:
@@ -1734,7 +1861,7 @@ async def approve_new_user(callback: CallbackQuery, session: AsyncSession):
     username_display = f"@{user.username}" if user.username else f"ID {user.tg_id}"
     
     # Уведомить пользователя
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     try:
         await bot.send_message(
             user.tg_id,
@@ -1747,25 +1874,21 @@ async def approve_new_user(callback: CallbackQuery, session: AsyncSession):
     await callback.message.edit_text(
         f"✅ Доступ разрешен для {username_display}\n\n"
         f"ID: {user.tg_id}",
-        reply_markup=InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")]
-            ]
-        )
+        reply_markup=get_admin_panel_keyboard()
     )
     await callback.answer()
     
     await LogRepository.create_log(session, "new_user_approved", user.id, admin_id=callback.from_user.id)
 
 
-@admin_router.callback_query(F.data.startswith("deny_new_user_"))
-async def deny_new_user(callback: CallbackQuery, session: AsyncSession):
+@callback_table.on(RejectUser)
+async def deny_new_user(callback: CallbackQuery, callback_data: RejectUser, session: AsyncSession):
     """Отказать в доступе для нового пользователя"""
     if not is_admin(callback):
         await callback.answer("❌ Доступ запрещен.", show_alert=True)
         return
     
-    user_id = int(callback.data.split("_")[-1])
+    user_id = callback_data.user_id
     user = await session.get(User, user_id)
     
     if not user:
@@ -1779,7 +1902,7 @@ async def deny_new_user(callback: CallbackQuery, session: AsyncSession):
     username_display = f"@{user.username}" if user.username else f"ID {user.tg_id}"
     
     # Уведомить пользователя
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     try:
         await bot.send_message(
             user.tg_id,
@@ -1792,14 +1915,52 @@ async def deny_new_user(callback: CallbackQuery, session: AsyncSession):
     await callback.message.edit_text(
         f"❌ Доступ запрещен для {username_display}\n\n"
         f"ID: {user.tg_id}",
-        reply_markup=InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")]
-            ]
-        )
+        reply_markup=get_admin_panel_keyboard()
     )
     await callback.answer()
     
     await LogRepository.create_log(session, "new_user_denied", user.id, admin_id=callback.from_user.id)
 
 
+@callback_table.on(AccountDelete)
+async def delete_account(callback: CallbackQuery, callback_data: AccountDelete, session: AsyncSession):
+    """Удалить аккаунт после подтверждения"""
+    if not is_admin(callback):
+        await callback.answer("❌ Доступ запрещен.", show_alert=True)
+        return
+
+    account = await AccountRepository.get_account_by_id(session, callback_data.account_id)
+    if not account:
+        await callback.answer("❌ Аккаунт не найден.", show_alert=True)
+        return
+
+    filename = get_account_filename(account)
+    if not callback_data.confirm:
+        await callback.message.edit_text(
+            f"🗑 Удалить аккаунт #{account.id} ({filename})?\n\n"
+            f"Файл и результат проверки архива будут удалены без возможности восстановления.",
+            reply_markup=get_account_delete_keyboard(account.id)
+        )
+        await callback.answer()
+        return
+
+    user_id = account.user_id
+    orphan_path = await AccountRepository.delete_account(session, account.id)
+    # Файл убирается до коммита, пока транзакция удерживает запись в БД: параллельная загрузка
+    # того же содержимого сохранится после коммита и вернет файл из своей копии (settle_blob)
+    detached = await asyncio.to_thread(detach_blob_file, orphan_path) if orphan_path else None
+    try:
+        await session.commit()
+    except BaseException:
+        if detached:
+            await asyncio.to_thread(restore_blob_file, detached, orphan_path)
+        raise
+    if detached:
+        await asyncio.to_thread(detached.unlink, missing_ok=True)
+
+    await callback.message.edit_text(
+        f"🗑 Аккаунт {filename} удален",
+        reply_markup=get_back_keyboard(UserAccounts(user_id=user_id).pack())
+    )
+    await LogRepository.create_log(session, "account_deleted", user_id, admin_id=callback.from_user.id)
+    await callback.answer()
@@ -1,15 +1,26 @@
-from aiogram import Router, F
-from aiogram.types import Message, Document, CallbackQuery
+import asyncio
+import logging
+
+from aiogram import Bot, Router, F
+from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
 
-from app.utils.db_utils import UserRepository, AccountRepository, LogRepository
-from app.utils.keyboards import get_user_main_keyboard, get_confirm_keyboard
-from app.utils.helpers import get_current_month, get_user_upload_dir, format_user_info
-from config import UPLOAD_DIR, ADMIN_IDS
+from app.utils.db_utils import UserRepository, AccountRepository, BlobRepository, LogRepository
+from app.utils.keyboards import get_user_main_keyboard, get_confirm_keyboard, get_request_response_keyboard
+from app.utils.helpers import get_current_month, format_user_info
+from app.utils.storage import download_to_blob, remove_blob_file, settle_blob
+from app.utils.downloads import UploadJob, download_queue, album_collector
+from app.utils.quotas import upload_quota
+from app.utils.archive_checks import archive_checker
+from app.utils.callbacks import callback_table
+from app.utils.admins import admin_roles
+from app.models import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
 
 user_router = Router()
 
@@ -38,14 +49,12 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
         # Если пользователь новый - отправить уведомление администратору
         if is_new_user:
             # Отправить уведомление админам о новом пользователе
-            from aiogram import Bot
-            from config import BOT_TOKEN
             from app.utils.keyboards import get_new_user_approval_keyboard
-            bot = Bot(token=BOT_TOKEN)
+            bot = message.bot
             
             username_display = f"@{user.username}" if user.username else "не указано"
             
-            for admin_id in ADMIN_IDS:
+            for admin_id in admin_roles:
                 try:
                     await bot.send_message(
                         admin_id,
@@ -75,12 +84,12 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
         f"Ваш ID: {user.tg_id}\n"
         f"Имя: {user.username or 'не указано'}\n\n"
         f"Выберите действие:",
-        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in ADMIN_IDS)
+        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in admin_roles)
     )
     await LogRepository.create_log(session, "user_start", user.id)
 
 
-@user_router.callback_query(F.data == "user_send_account")
+@callback_table.exact("user_send_account")
 async def send_account(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Обработчик кнопки отправки аккаунта"""
     user = await UserRepository.get_user_by_tg_id(session, callback.from_user.id)
@@ -120,65 +129,236 @@ async def handle_account_upload(message: Message, state: FSMContext, session: As
         )
         return
 
-    # Загрузить файл
-    from aiogram import Bot
-    from config import BOT_TOKEN
+    # Квота проверяется до скачивания: размер документа известен заранее
+    reason = upload_quota.check(user, document.file_size or 0)
+    if reason:
+        await message.answer(
+            f"❌ Архив не принят: {reason}\n\n"
+            f"Обратитесь к администратору."
+        )
+        return
+    upload_quota.reserve(user.id, document.file_size or 0)
 
-    bot = Bot(token=BOT_TOKEN)
-    user_dir = get_user_upload_dir(user.id)
-    file_path = user_dir / document.file_name
+    user_id, tg_id, username = user.id, user.tg_id, user.username
 
-    try:
-        await bot.download(document, destination=str(file_path))
+    if message.media_group_id:
+        # Документы альбома собираются в одну пачку; состояние сбрасывается после ее постановки в очередь
+        album_collector.add(
+            message.media_group_id, document,
+            lambda documents: enqueue_account_upload(message, state, user_id, tg_id, username, documents)
+        )
+        return
+
+    await enqueue_account_upload(message, state, user_id, tg_id, username, [document])
 
-        # Сохранить информацию в БД (только имя файла)
-        month = get_current_month()
-        account = await AccountRepository.create_account(
-            session, user.id, document.file_name, month
+
+async def enqueue_account_upload(message: Message, state: FSMContext, user_id: int, tg_id: int,
+                                 username: str, documents: list):
+    """Поставить загрузку архивов в очередь и сразу ответить пользователю"""
+    job = UploadJob(
+        user_id=user_id, tg_id=tg_id, username=username,
+        chat_id=message.chat.id, documents=tuple(documents), month=get_current_month()
+    )
+    try:
+        position = download_queue.submit(job)
+    except asyncio.QueueFull:
+        for document in documents:
+            upload_quota.release(user_id, document.file_size or 0)
+        await message.answer(
+            "⏳ Очередь загрузок переполнена\n\n"
+            "Пожалуйста, отправьте архив чуть позже."
         )
+        return
 
+    file_names = ", ".join(doc.file_name for doc in documents)
+    if len(documents) > 1:
+        await message.answer(
+            f"📥 Архивов принято в обработку: {len(documents)}\n\n"
+            f"📁 Файлы: {file_names}\n"
+            f"🔢 Позиция в очереди: {position}\n\n"
+            f"Мы сообщим, когда файлы будут сохранены."
+        )
+    else:
         await message.answer(
-            f"✅ Архив успешно загружен\n\n"
-            f"📁 Файл: {document.file_name}\n"
-            f"📅 Месяц: {month}\n"
-            f"🆔 ID архива: {account.id}"
+            f"📥 Архив принят в обработку\n\n"
+            f"📁 Файл: {file_names}\n"
+            f"🔢 Позиция в очереди: {position}\n\n"
+            f"Мы сообщим, когда файл будет сохранен."
+        )
+
+    await state.clear()
+    await message.answer(
+        "Выберите действие:",
+        reply_markup=get_user_main_keyboard()
+    )
+
+
+async def process_account_upload(bot: Bot, job: UploadJob):
+    """Скачать архивы из очереди, создать аккаунты и уведомить пользователя и администраторов"""
+    try:
+        await _store_account_upload(bot, job)
+    finally:
+        # Резерв квоты снимается всегда: сохраненные файлы уже учтены в счетчиках пользователя
+        for document in job.documents:
+            upload_quota.release(job.user_id, document.file_size or 0)
+
+
+async def _send_upload_message(bot: Bot, chat_id: int, text: str):
+    """Сообщить пользователю о загрузке (пользователь мог заблокировать бота)"""
+    try:
+        await bot.send_message(chat_id, text)
+    except Exception:
+        pass
+
+
+async def _discard_new_blobs(stored: list):
+    """Удалить файлы, записанные заданием, на которые не ссылается ни одна запись blob-а"""
+    for _, stored_blob in stored:
+        settle_blob(stored_blob, keep=False)
+    created = [blob for _, blob in stored if blob.created]
+    if not created:
+        return
+    async with AsyncSessionLocal() as session:
+        tracked = await BlobRepository.get_by_sha256s(session, {blob.sha256 for blob in created})
+    for stored_blob in created:
+        blob = tracked.get(stored_blob.sha256)
+        # Тот же файл могла успеть сохранить параллельная загрузка того же содержимого
+        if blob is None or blob.bundle or blob.path != stored_blob.path:
+            remove_blob_file(stored_blob.path)
+
+
+async def _store_account_upload(bot: Bot, job: UploadJob):
+    """Скачать архивы задания и сохранить аккаунты"""
+    # Документы альбома скачиваются параллельно
+    results = await asyncio.gather(
+        *(download_to_blob(bot, document) for document in job.documents),
+        return_exceptions=True
+    )
+    stored = []
+    failed = []
+    for document, result in zip(job.documents, results):
+        # Отмененная загрузка возвращает CancelledError, он не наследует Exception
+        if isinstance(result, BaseException):
+            failed.append((document, result))
+        else:
+            stored.append((document, result))
+
+    for document, error in failed:
+        await _send_upload_message(
+            bot, job.chat_id,
+            f"❌ Ошибка при загрузке файла {document.file_name}\n\n"
+            f"Пожалуйста, попробуйте еще раз.\n\n"
+            f"Ошибка: {str(error)}"
         )
 
+    if not stored:
+        return
+
+    accounts = None
+    async with AsyncSessionLocal() as session:
+        try:
+            duplicates = await AccountRepository.get_accounts_by_sha256(
+                session, {blob.sha256 for _, blob in stored}
+            )
+
+            # Сохранить информацию в БД одной транзакцией, когда все файлы полностью записаны
+            accounts = await AccountRepository.create_accounts(
+                session, job.user_id, job.month,
+                [(blob.path, document.file_name, blob.sha256, blob.size) for document, blob in stored]
+            )
+
+            # Новая копия на диске не нужна, если содержимое уже упаковано в холодное хранилище
+            # или записано раньше по другому пути (blob-ы с расширением в имени)
+            blobs = await BlobRepository.get_by_sha256s(session, {blob.sha256 for _, blob in stored})
+            for _, stored_blob in stored:
+                blob = blobs.get(stored_blob.sha256)
+                keep = blob is not None and not blob.bundle and blob.path == stored_blob.path
+                if stored_blob.created and not keep:
+                    remove_blob_file(stored_blob.path)
+                # Файл мог удалить параллельный delete_account: запасная копия возвращает его на место
+                settle_blob(stored_blob, keep)
+        except Exception as e:
+            # Аккаунты не сохранены: записанные заданием файлы остались бы на диске без записей в БД
+            if accounts is None:
+                try:
+                    await _discard_new_blobs(stored)
+                except Exception as discard_error:
+                    logger.error(f"[ERROR] Не удалось удалить файлы несохраненной загрузки: {discard_error}")
+            names = ", ".join(document.file_name for document, _ in stored)
+            await _send_upload_message(
+                bot, job.chat_id,
+                f"❌ Ошибка при загрузке файлов {names}\n\n"
+                f"Пожалуйста, попробуйте еще раз.\n\n"
+                f"Ошибка: {str(e)}"
+            )
+            return
+
+        # Проверить целостность и построить манифест архивов в фоне
+        archive_checker.submit(account.id for account in accounts)
+
+        def duplicate_note(sha256: str) -> str:
+            if sha256 not in duplicates:
+                return ""
+            duplicate_ids = ", ".join(f"#{acc.id}" for acc in duplicates[sha256])
+            return f"⚠️ Дубликат: такой же файл уже загружен ({duplicate_ids})"
+
+        if len(accounts) == 1:
+            document, blob = stored[0]
+            note = duplicate_note(blob.sha256)
+            note = f"\n\n{note}" if note else ""
+            user_text = (
+                f"✅ Архив успешно загружен\n\n"
+                f"📁 Файл: {document.file_name}\n"
+                f"📅 Месяц: {job.month}\n"
+                f"🆔 ID архива: {accounts[0].id}"
+                f"{note}"
+            )
+            admin_details = (
+                f"📁 Файл: {document.file_name}\n"
+                f"📅 Месяц: {job.month}\n"
+                f"🆔 Account ID: {accounts[0].id}"
+                f"{note}"
+            )
+        else:
+            lines = []
+            for (document, blob), account in zip(stored, accounts):
+                note = duplicate_note(blob.sha256)
+                lines.append(f"📁 {document.file_name} — 🆔 {account.id}" + (f"\n   {note}" if note else ""))
+            file_list = "\n".join(lines)
+            user_text = (
+                f"✅ Архивов успешно загружено: {len(accounts)}\n\n"
+                f"{file_list}\n\n"
+                f"📅 Месяц: {job.month}"
+            )
+            admin_details = (
+                f"📦 Архивов: {len(accounts)}\n"
+                f"📅 Месяц: {job.month}\n\n"
+                f"{file_list}"
+            )
+
+        await _send_upload_message(bot, job.chat_id, user_text)
+
         # Отправить уведомление администратору
-        for admin_id in ADMIN_IDS:
+        for admin_id in admin_roles:
             try:
                 await bot.send_message(
                     admin_id,
                     f"📤 Новый архив от пользователя\n\n"
-                    f"👤 Username: @{user.username or 'не указан'}\n"
-                    f"🆔 User ID: {user.tg_id}\n"
-                    f"📁 Файл: {document.file_name}\n"
-                    f"📅 Месяц: {month}\n"
-                    f"🆔 Account ID: {account.id}"
+                    f"👤 Username: @{job.username or 'не указан'}\n"
+                    f"🆔 User ID: {job.tg_id}\n"
+                    f"{admin_details}"
                 )
             except:
                 pass
 
-        await LogRepository.create_log(
-            session, "account_uploaded", user.id,
-            description=f"File: {document.file_name}, Account ID: {account.id}"
-        )
-
-    except Exception as e:
-        await message.answer(
-            f"❌ Ошибка при загрузке файла\n\n"
-            f"Пожалуйста, попробуйте еще раз.\n\n"
-            f"Ошибка: {str(e)}"
-        )
-
-    await state.clear()
-    await message.answer(
-        "Выберите действие:",
-        reply_markup=get_user_main_keyboard()
-    )
+        for (document, blob), account in zip(stored, accounts):
+            await LogRepository.create_log(
+                session, "account_uploaded", job.user_id,
+                description=f"File: {document.file_name}, Account ID: {account.id}, SHA-256: {blob.sha256}"
+            )
 
 
-@user_router.callback_query(F.data == "user_request_proxy")
+@callback_table.exact("user_request_proxy")
 async def request_proxy(callback: CallbackQuery, session: AsyncSession):
     """Обработчик запроса прокси"""
     user = await UserRepository.get_user_by_tg_id(session, callback.from_user.id)
@@ -190,26 +370,16 @@ async def request_proxy(callback: CallbackQuery, session: AsyncSession):
     await callback.message.edit_text(
         "📤 Ваш запрос отправлен администратору\n\n"
         "Вы запросили прокси. Администратор получит ваш запрос и ответит вам.",
-        reply_markup=get_user_main_keyboard(is_admin=callback.from_user.id in ADMIN_IDS)
+        reply_markup=get_user_main_keyboard(is_admin=callback.from_user.id in admin_roles)
     )
 
     # Отправить уведомление администратору
-    from aiogram import Bot
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    from config import BOT_TOKEN
-
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     
     # Создать кнопки для ответа админа
-    kb_buttons = [
-        [
-            InlineKeyboardButton(text="✅ Пополнил", callback_data=f"proxy_sent_confirm_{user.id}"),
-            InlineKeyboardButton(text="💬 Ответить", callback_data=f"proxy_respond_{user.id}")
-        ]
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_request_response_keyboard("proxy", user.id)
     
-    for admin_id in ADMIN_IDS:
+    for admin_id in admin_roles:
         try:
             await bot.send_message(
                 admin_id,
@@ -225,7 +395,7 @@ async def request_proxy(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@user_router.callback_query(F.data == "user_open_shift")
+@callback_table.exact("user_open_shift")
 async def open_shift_request(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Начать процесс открытия смены: запросить время по МСК"""
     user = await UserRepository.get_user_by_tg_id(session, callback.from_user.id)
@@ -263,11 +433,9 @@ async def handle_shift_time(message: Message, state: FSMContext, session: AsyncS
         return
 
     # Отправить уведомление администраторам
-    from aiogram import Bot
-    from config import BOT_TOKEN
-    bot = Bot(token=BOT_TOKEN)
+    bot = message.bot
 
-    for admin_id in ADMIN_IDS:
+    for admin_id in admin_roles:
         try:
             await bot.send_message(
                 admin_id,
@@ -285,14 +453,14 @@ async def handle_shift_time(message: Message, state: FSMContext, session: AsyncS
 
     await message.answer(
         f"✅ Запрос отправлен администраторам. Вы записаны на смену в {time_text} МСК.",
-        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in ADMIN_IDS)
+        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in admin_roles)
     )
 
     await state.clear()
 
 
 
-@user_router.callback_query(F.data == "user_close_shift")
+@callback_table.exact("user_close_shift")
 async def close_shift_request(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Начать процесс закрытия смены: запросить время и количество аккаунтов"""
     user = await UserRepository.get_user_by_tg_id(session, callback.from_user.id)
@@ -337,11 +505,9 @@ async def handle_shift_close(message: Message, state: FSMContext, session: Async
     actual_count = len(accounts)
 
     # Отправить уведомление администраторам
-    from aiogram import Bot
-    from config import BOT_TOKEN
-    bot = Bot(token=BOT_TOKEN)
+    bot = message.bot
 
-    for admin_id in ADMIN_IDS:
+    for admin_id in admin_roles:
         try:
             await bot.send_message(
                 admin_id,
@@ -362,13 +528,13 @@ async def handle_shift_close(message: Message, state: FSMContext, session: Async
 
     await message.answer(
         f"✅ Закрытие смены отправлено администраторам. Время: {time_text}. Количество: {reported_count} (реально {actual_count}).",
-        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in ADMIN_IDS)
+        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in admin_roles)
     )
 
     await state.clear()
 
 
-@user_router.callback_query(F.data == "user_request_numbers")
+@callback_table.exact("user_request_numbers")
 async def request_numbers(callback: CallbackQuery, session: AsyncSession):
     """Обработчик запроса номеров"""
     user = await UserRepository.get_user_by_tg_id(session, callback.from_user.id)
@@ -380,26 +546,16 @@ async def request_numbers(callback: CallbackQuery, session: AsyncSession):
     await callback.message.edit_text(
         "📤 Ваш запрос отправлен администратору\n\n"
         "Вы запросили номера. Администратор получит ваш запрос и ответит вам.",
-        reply_markup=get_user_main_keyboard(is_admin=callback.from_user.id in ADMIN_IDS)
+        reply_markup=get_user_main_keyboard(is_admin=callback.from_user.id in admin_roles)
     )
 
     # Отправить уведомление администратору
-    from aiogram import Bot
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    from config import BOT_TOKEN
-
-    bot = Bot(token=BOT_TOKEN)
+    bot = callback.bot
     
     # Создать кнопки для ответа админа
-    kb_buttons = [
-        [
-            InlineKeyboardButton(text="✅ Пополнил", callback_data=f"numbers_sent_confirm_{user.id}"),
-            InlineKeyboardButton(text="💬 Ответить", callback_data=f"numbers_respond_{user.id}")
-        ]
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=kb_buttons)
+    keyboard = get_request_response_keyboard("numbers", user.id)
     
-    for admin_id in ADMIN_IDS:
+    for admin_id in admin_roles:
         try:
             await bot.send_message(
                 admin_id,
@@ -415,7 +571,7 @@ async def request_numbers(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@user_router.callback_query(F.data == "user_attach_wallet")
+@callback_table.exact("user_attach_wallet")
 async def attach_wallet(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Обработчик прикрепления TRX-кошелька"""
     user = await UserRepository.get_user_by_tg_id(session, callback.from_user.id)
@@ -453,7 +609,7 @@ async def save_wallet(message: Message, state: FSMContext, session: AsyncSession
     await message.answer(
         f"✅ TRX-кошелек успешно сохранен\n\n"
         f"Адрес: {wallet}",
-        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in ADMIN_IDS)
+        reply_markup=get_user_main_keyboard(is_admin=message.from_user.id in admin_roles)
     )
 
     await LogRepository.create_log(
@@ -463,7 +619,7 @@ async def save_wallet(message: Message, state: FSMContext, session: AsyncSession
     await state.clear()
 
 
-@user_router.callback_query(F.data == "user_main_menu")
+@callback_table.exact("user_main_menu")
 async def user_main_menu(callback: CallbackQuery, state: FSMContext):
     """Вернуться в главное меню пользователя"""
     await state.clear()
@@ -471,17 +627,17 @@ async def user_main_menu(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text(
             "👨‍💼 Главное меню\n\n"
             "Выберите действие:",
-            reply_markup=get_user_main_keyboard(is_admin=callback.from_user.id in ADMIN_IDS)
+            reply_markup=get_user_main_keyboard(is_admin=callback.from_user.id in admin_roles)
         )
     except Exception:
         pass
     await callback.answer()
 
 
-@user_router.callback_query(F.data == "user_to_admin_panel")
+@callback_table.exact("user_to_admin_panel")
 async def user_to_admin_panel(callback: CallbackQuery, session: AsyncSession):
     """Переключиться на админ панель"""
-    if callback.from_user.id not in ADMIN_IDS:
+    if callback.from_user.id not in admin_roles:
         await callback.answer("❌ У вас нет доступа к админ панели.", show_alert=True)
         return
 
@@ -1,8 +1,12 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, select
+from sqlalchemy import (
+    Boolean, Column, Integer, Float, String, DateTime, ForeignKey, Text, select, update, inspect, text, table, column
+)
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
-from config import DATABASE_URL
+from sqlalchemy.schema import CreateColumn
+from config import DATABASE_URL, UPDATE_CONCURRENCY
+from app.utils.sql_profiler import sql_profiler
 
 Base = declarative_base()
 
@@ -16,6 +20,12 @@ class User(Base):
     username = Column(String(255), nullable=True)
     trx_wallet = Column(String(255), nullable=True)
     access = Column(Boolean, default=False)  # Доступ по умолчанию запрещен
+    is_admin = Column(Boolean, nullable=False, default=False, server_default="0", index=True)
+    # Роль назначена через бота; роль из ADMIN_IDS снимается при удалении id из конфигурации
+    admin_granted = Column(Boolean, nullable=False, default=False, server_default="0")
+    # Счетчики занятого места, обновляются при загрузке и удалении аккаунтов
+    storage_bytes = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    storage_files = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     def __repr__(self):
@@ -29,7 +39,9 @@ class Account(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     month = Column(String(7), nullable=False)  # YYYY-MM формат
-    file_path = Column(String(512), nullable=False)
+    file_path = Column(String(512), nullable=False)  # Путь к blob относительно UPLOAD_DIR
+    file_name = Column(String(255), nullable=True)  # Исходное имя файла
+    sha256 = Column(String(64), nullable=True, index=True)
     sent = Column(Boolean, default=False)
     locked = Column(Boolean, default=False)
     date_created = Column(DateTime, default=datetime.utcnow, index=True)
@@ -38,6 +50,82 @@ class Account(Base):
         return f"<Account {self.id} (user_id={self.user_id}, month={self.month})>"
 
 
+class Blob(Base):
+    """Модель файла в контентно-адресуемом хранилище"""
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), unique=True, nullable=False, index=True)
+    path = Column(String(512), nullable=False)  # Путь относительно UPLOAD_DIR
+    size = Column(Integer, nullable=False, default=0)
+    ref_count = Column(Integer, nullable=False, default=0)
+    # Холодное хранилище: пакет (относительно UPLOAD_DIR) и смещение в нем; None - файл лежит по path
+    bundle = Column(String(512), nullable=True, index=True)
+    bundle_offset = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Blob {self.sha256[:12]} (refs={self.ref_count})>"
+
+
+class ArchiveCheck(Base):
+    """Результат проверки целостности архива аккаунта"""
+    __tablename__ = "archive_checks"
+
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), unique=True, nullable=False, index=True)
+    status = Column(String(20), nullable=False)  # ok, corrupt, unsupported, missing
+    archive_type = Column(String(10), nullable=True)
+    member_count = Column(Integer, nullable=False, default=0, index=True)
+    total_size = Column(Integer, nullable=False, default=0, index=True)
+    error = Column(Text, nullable=True)
+    checked_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ArchiveCheck account_id={self.account_id} ({self.status})>"
+
+
+class ArchiveMember(Base):
+    """Файл внутри архива аккаунта (манифест)"""
+    __tablename__ = "archive_members"
+
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, index=True)
+    name = Column(String(1024), nullable=False)
+    size = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ArchiveMember {self.name} (account_id={self.account_id})>"
+
+
+class FileIndexEntry(Base):
+    """Запись индекса файлов в UPLOAD_DIR (заполняется сверкой диска с БД)"""
+    __tablename__ = "file_index"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String(512), unique=True, nullable=False, index=True)  # Относительно UPLOAD_DIR
+    is_dir = Column(Boolean, nullable=False, default=False)
+    size = Column(Integer, nullable=False, default=0)
+    mtime = Column(Float, nullable=True)  # None - файл добавлен при загрузке и еще не сверялся
+
+    def __repr__(self):
+        return f"<FileIndexEntry {self.path}>"
+
+
+class FSMRecord(Base):
+    """Сохраненное состояние FSM пользователя (переживает перезапуск бота)"""
+    __tablename__ = "fsm_states"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String(255), unique=True, nullable=False, index=True)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)  # JSON
+    updated_at = Column(Float, nullable=False, index=True)  # Unix time последнего изменения
+
+    def __repr__(self):
+        return f"<FSMRecord {self.key} ({self.state})>"
+
+
 class Log(Base):
     """Модель логирования"""
     __tablename__ = "logs"
@@ -53,19 +141,86 @@ class Log(Base):
         return f"<Log {self.action_type} at {self.timestamp}>"
 
 
+# Полнотекстовый индекс (SQLite FTS5) по путям файлов внутри архивов.
+# Заполняется триггерами, поэтому новые загрузки индексируются инкрементально.
+archive_members_fts = table("archive_members_fts", column("rowid"), column("name"))
+
+_SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS archive_members_fts USING fts5(
+        name, content='archive_members', content_rowid='id', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS archive_members_fts_ai AFTER INSERT ON archive_members BEGIN
+        INSERT INTO archive_members_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS archive_members_fts_ad AFTER DELETE ON archive_members BEGIN
+        INSERT INTO archive_members_fts(archive_members_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS archive_members_fts_au AFTER UPDATE OF name ON archive_members BEGIN
+        INSERT INTO archive_members_fts(archive_members_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO archive_members_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+
 # Инициализация движка БД и сессии
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Запас пула сверх числа обновлений: каждому обновлению хватит второго соединения, остальное - фоновым задачам
+engine = create_async_engine(DATABASE_URL, echo=False, pool_size=5, max_overflow=UPDATE_CONCURRENCY + 5)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Подсчет запросов по обновлениям и блокам query_budget
+sql_profiler.install(engine)
+
+
+def _add_missing_columns(sync_conn):
+    """Добавить в существующие таблицы колонки, появившиеся в моделях"""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _create_search_index(sync_conn):
+    """Создать полнотекстовый индекс по манифестам архивов (только SQLite)"""
+    if sync_conn.dialect.name != "sqlite":
+        return
+    is_new = not inspect(sync_conn).has_table("archive_members_fts")
+    for statement in _SEARCH_INDEX_DDL:
+        sync_conn.execute(text(statement))
+    if is_new:
+        # Проиндексировать манифесты, сохраненные до появления индекса
+        sync_conn.execute(text("INSERT INTO archive_members_fts(archive_members_fts) VALUES ('rebuild')"))
 
 
 async def init_db():
     """Инициализация базы данных"""
+    if engine.dialect.name != "sqlite":
+        # Репозитории используют upsert-ы SQLite (INSERT ... ON CONFLICT) и полнотекстовый индекс FTS5
+        raise ValueError(
+            f"Поддерживается только SQLite (sqlite+aiosqlite://...), DATABASE_URL указывает на {engine.dialect.name}"
+        )
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_search_index)
     
-    # Добавить администраторов в БД с полным доступом
+    # Добавить администраторов из ADMIN_IDS в БД с полным доступом;
+    # администраторы, назначенные через бота, хранятся только в БД
     from config import ADMIN_IDS
     async with AsyncSessionLocal() as session:
+        # Снять роль с администраторов, убранных из ADMIN_IDS (назначенные через бота остаются).
+        # Записи, созданные до появления admin_granted, считаются назначенными из конфигурации
+        await session.execute(
+            update(User)
+            .where(User.is_admin.is_(True), User.admin_granted.is_(False), User.tg_id.not_in(ADMIN_IDS))
+            .values(is_admin=False)
+        )
         for admin_id in ADMIN_IDS:
             # Проверить, существует ли администратор
             existing_admin = await session.execute(
@@ -81,10 +236,19 @@ async def init_db():
                     access=True  # Администраторы имеют доступ по умолчанию
                 )
                 session.add(admin)
+            admin.is_admin = True
         
         await session.commit()
 
 
+async def enable_wal():
+    """Журнал WAL для SQLite: чтение не блокирует запись, когда с базой работают несколько процессов"""
+    if engine.dialect.name != "sqlite":
+        return
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
 async def get_db():
     """Получить сессию БД"""
     async with AsyncSessionLocal() as session:
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from aiogram.types import CallbackQuery, Message
+
+from config import ADMIN_TASK_LIMIT, TASK_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class TaskProgress:
+    """Сообщение с прогрессом фоновой задачи: редактируется не чаще раза в interval секунд"""
+
+    def __init__(self, message: Message, interval: float):
+        self.message = message
+        self.interval = interval
+        self._last_edit = 0.0
+
+    async def update(self, text: str, force: bool = False, reply_markup=None):
+        now = time.monotonic()
+        if not force and now - self._last_edit < self.interval:
+            return
+        self._last_edit = now
+        try:
+            await self.message.edit_text(text, reply_markup=reply_markup)
+        except Exception as e:
+            # Сообщение могли удалить, сама задача от этого не должна падать
+            logger.debug(f"Не удалось обновить прогресс задачи: {e}")
+
+
+class AdminTaskRunner:
+    """Фоновые задачи администраторов.
+
+    Callback подтверждается сразу, работа идет в отдельной задаче и сообщает о ходе
+    выполнения правкой исходного сообщения. Ошибки задачи логируются и показываются
+    в том же сообщении. Один администратор может одновременно запустить не больше limit задач.
+    """
+
+    def __init__(self, limit: int, progress_interval: float):
+        self.limit = limit
+        self.progress_interval = progress_interval
+        self._tasks: dict[int, set] = defaultdict(set)
+        self.finished = 0
+        self.failed = 0
+
+    def running(self, admin_id: int = None) -> int:
+        """Число выполняющихся задач администратора или всех администраторов"""
+        if admin_id is not None:
+            return len(self._tasks.get(admin_id, ()))
+        return sum(len(tasks) for tasks in self._tasks.values())
+
+    async def run(self, callback: CallbackQuery, name: str,
+                  work: Callable[[TaskProgress], Awaitable[None]]) -> bool:
+        """Подтвердить callback и запустить work(progress) в фоне"""
+        admin_id = callback.from_user.id
+        if self.running(admin_id) >= self.limit:
+            await callback.answer(
+                "⏳ Предыдущая задача еще выполняется. Дождитесь ее завершения.", show_alert=True
+            )
+            return False
+
+        await callback.answer("⏳ Выполняется...")
+        progress = TaskProgress(callback.message, self.progress_interval)
+        task = asyncio.create_task(self._supervise(name, admin_id, work, progress), name=f"admin-{name}-{admin_id}")
+        self._tasks[admin_id].add(task)
+        task.add_done_callback(lambda t: self._discard(admin_id, t))
+        return True
+
+    def _discard(self, admin_id: int, task: asyncio.Task):
+        tasks = self._tasks.get(admin_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._tasks[admin_id]
+
+    async def _supervise(self, name: str, admin_id: int, work, progress: TaskProgress):
+        started = time.monotonic()
+        try:
+            await work(progress)
+        except asyncio.CancelledError:
+            await progress.update("⛔ Задача прервана: бот остановлен", force=True)
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"[ERROR] Фоновая задача {name} администратора {admin_id}: {e}", exc_info=True)
+            await progress.update(f"❌ Ошибка при выполнении: {e}", force=True)
+        else:
+            self.finished += 1
+            logger.info(f"Фоновая задача {name} администратора {admin_id} выполнена за {time.monotonic() - started:.1f} с")
+
+    async def shutdown(self):
+        """Прервать все выполняющиеся задачи"""
+        tasks = [task for tasks in self._tasks.values() for task in tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+admin_tasks = AdminTaskRunner(ADMIN_TASK_LIMIT, TASK_PROGRESS_INTERVAL)
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Optional
+
+from config import ADMIN_RELOAD_INTERVAL
+from app.models import AsyncSessionLocal
+from app.utils.db_utils import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class AdminRoles:
+    """Роли администраторов из БД, закэшированные в памяти как множество Telegram ID.
+
+    Проверка «id in admin_roles» не обращается к БД. Назначение через бота сразу
+    обновляет кэш, изменения из других процессов подхватываются периодической перезагрузкой.
+    """
+
+    def __init__(self, reload_interval: int):
+        self.reload_interval = reload_interval
+        self._ids: frozenset = frozenset()
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, tg_id) -> bool:
+        return tg_id in self._ids
+
+    def __iter__(self):
+        # Снимок: рассылка по администраторам не должна ломаться при изменении состава
+        return iter(sorted(self._ids))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def load(self):
+        """Перечитать администраторов из БД"""
+        async with AsyncSessionLocal() as session:
+            ids = frozenset(await UserRepository.get_admin_tg_ids(session))
+        if ids != self._ids:
+            logger.info(f"Администраторы: {sorted(ids)}")
+        self._ids = ids
+
+    async def grant(self, session, user):
+        """Сделать пользователя администратором"""
+        await UserRepository.set_admin(session, user.id, True)
+        self._ids = self._ids | {user.tg_id}
+
+    async def revoke(self, session, user):
+        """Снять роль администратора"""
+        await UserRepository.set_admin(session, user.id, False)
+        self._ids = self._ids - {user.tg_id}
+
+    def start(self):
+        """Запустить периодическую перезагрузку"""
+        if self.reload_interval > 0:
+            self._task = asyncio.create_task(self._reload_loop(), name="admin-roles-reload")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"[ERROR] Ошибка загрузки администраторов: {e}", exc_info=True)
+
+
+admin_roles = AdminRoles(ADMIN_RELOAD_INTERVAL)
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import ARCHIVE_CHECK_WORKERS
+from app.models import AsyncSessionLocal
+from app.utils.archives import inspect_archive, STATUS_CORRUPT
+from app.utils.db_utils import AccountRepository, ArchiveRepository, BlobRepository, LogRepository
+from app.utils.storage import locate_account_file, get_account_filename
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveChecker:
+    """Проверка загруженных архивов в пуле процессов, не блокирующая event loop"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self):
+        """Запустить пул процессов"""
+        # spawn: дочерние процессы не наследуют event loop и открытые соединения
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Проверка архивов запущена: процессов={self.workers}")
+
+    @property
+    def pending(self) -> int:
+        """Количество выполняющихся пакетов проверки"""
+        return len(self._tasks)
+
+    def submit(self, account_ids):
+        """Поставить архивы аккаунтов на проверку в фоне"""
+        if self._pool is None:
+            return
+        task = asyncio.create_task(self._check_accounts(list(account_ids)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def backfill(self):
+        """Проверить архивы, загруженные до появления проверки"""
+        async with AsyncSessionLocal() as session:
+            account_ids = await ArchiveRepository.get_unchecked_account_ids(session)
+        if account_ids:
+            logger.info(f"Непроверенных архивов: {len(account_ids)}, запускаю проверку")
+            self.submit(account_ids)
+
+    async def _check_accounts(self, account_ids: list):
+        loop = asyncio.get_running_loop()
+        async with AsyncSessionLocal() as session:
+            for account_id in account_ids:
+                try:
+                    account = await AccountRepository.get_account_by_id(session, account_id)
+                    if not account:
+                        continue
+
+                    # Одинаковые файлы проверяются один раз
+                    if account.sha256:
+                        same_files = await AccountRepository.get_accounts_by_sha256(session, [account.sha256])
+                        copied = False
+                        for other in same_files.get(account.sha256, []):
+                            if other.id != account.id:
+                                copied = await ArchiveRepository.copy_report(session, other.id, account.id)
+                                if copied:
+                                    break
+                        if copied:
+                            continue
+
+                    blob = await BlobRepository.get_by_sha256(session, account.sha256) if account.sha256 else None
+                    location = locate_account_file(account, blob)
+                    report = await loop.run_in_executor(
+                        self._pool, inspect_archive,
+                        str(location.path), get_account_filename(account), location.offset, location.size
+                    )
+                    await ArchiveRepository.save_report(session, account.id, report)
+
+                    if report.status == STATUS_CORRUPT:
+                        await LogRepository.create_log(
+                            session, "archive_corrupt", account.user_id,
+                            description=f"Account ID: {account.id}, Error: {report.error}"
+                        )
+                except Exception as e:
+                    await session.rollback()
+                    logger.error(f"[ERROR] Ошибка проверки архива аккаунта {account_id}: {e}", exc_info=True)
+
+    async def shutdown(self):
+        """Остановить проверки и пул процессов"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+archive_checker = ArchiveChecker(ARCHIVE_CHECK_WORKERS)
@@ -0,0 +1,123 @@
+"""
+Проверка целостности архивов и построение их содержимого.
+
+Модуль намеренно зависит только от стандартной библиотеки: функции отсюда
+выполняются в отдельных процессах пула и не должны тянуть за собой конфигурацию бота.
+"""
+import gzip
+import tarfile
+import zipfile
+import zlib
+import lzma
+from pathlib import Path
+from typing import NamedTuple
+
+from app.utils.bundles import open_section
+
+# Сколько файлов архива сохранять в манифест (счетчики считаются по всем файлам)
+MAX_MANIFEST_MEMBERS = 5000
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+STATUS_OK = "ok"
+STATUS_CORRUPT = "corrupt"
+STATUS_UNSUPPORTED = "unsupported"
+STATUS_MISSING = "missing"
+
+_RAR_MAGIC = b"Rar!\x1a\x07"
+_7Z_MAGIC = b"7z\xbc\xaf\x27\x1c"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class ArchiveReport(NamedTuple):
+    """Результат проверки архива"""
+    status: str
+    archive_type: str
+    member_count: int
+    total_size: int  # Суммарный размер файлов после распаковки
+    members: list  # [(имя, размер)], не больше MAX_MANIFEST_MEMBERS
+    error: str = None
+
+
+def _drain(fileobj) -> int:
+    """Дочитать поток до конца (проверяет CRC сжатых данных) и вернуть число байт"""
+    total = 0
+    while True:
+        chunk = fileobj.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return total
+        total += len(chunk)
+
+
+def _inspect_zip(fileobj) -> ArchiveReport:
+    with zipfile.ZipFile(fileobj) as zf:
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+        bad_member = zf.testzip()
+    members = [(info.filename, info.file_size) for info in infos]
+    total_size = sum(size for _, size in members)
+    if bad_member is not None:
+        return ArchiveReport(STATUS_CORRUPT, "zip", len(members), total_size,
+                             members[:MAX_MANIFEST_MEMBERS], f"Ошибка CRC: {bad_member}")
+    return ArchiveReport(STATUS_OK, "zip", len(members), total_size, members[:MAX_MANIFEST_MEMBERS])
+
+
+def _inspect_tar(fileobj) -> ArchiveReport:
+    members = []
+    member_count = 0
+    total_size = 0
+    with tarfile.open(fileobj=fileobj, mode="r:*") as tf:
+        for info in tf:
+            if not info.isfile():
+                continue
+            extracted = tf.extractfile(info)
+            size = _drain(extracted) if extracted else 0
+            if size != info.size:
+                raise tarfile.ReadError(f"Файл {info.name} обрезан")
+            member_count += 1
+            total_size += info.size
+            if len(members) < MAX_MANIFEST_MEMBERS:
+                members.append((info.name, info.size))
+        # Дочитать сжатый поток, чтобы проверить контрольную сумму gzip/bz2/xz
+        _drain(tf.fileobj)
+    return ArchiveReport(STATUS_OK, "tar", member_count, total_size, members)
+
+
+def _inspect_gzip(fileobj, original_name: str) -> ArchiveReport:
+    with gzip.open(fileobj, "rb") as f:
+        size = _drain(f)
+    name = Path(original_name)
+    name = name.stem if name.suffix.lower() == ".gz" else name.name
+    return ArchiveReport(STATUS_OK, "gz", 1, size, [(name, size)])
+
+
+def inspect_archive(path: str, original_name: str = None, offset: int = None, size: int = None) -> ArchiveReport:
+    """Проверить архив (CRC всех файлов) и получить список его содержимого.
+
+    Если задано смещение, архив читается из пакета холодного хранилища.
+    """
+    archive_path = Path(path)
+    if not archive_path.is_file():
+        return ArchiveReport(STATUS_MISSING, "", 0, 0, [], "Файл не найден")
+
+    with (open_section(archive_path, offset, size) if offset is not None else open(archive_path, "rb")) as f:
+        header = f.read(8)
+        try:
+            f.seek(0)
+            if zipfile.is_zipfile(f):
+                return _inspect_zip(f)
+            f.seek(0)
+            if tarfile.is_tarfile(f):
+                f.seek(0)
+                return _inspect_tar(f)
+            f.seek(0)
+            if header.startswith(_GZIP_MAGIC):
+                return _inspect_gzip(f, original_name or archive_path.name)
+        except (zipfile.BadZipFile, tarfile.TarError, gzip.BadGzipFile, zlib.error,
+                lzma.LZMAError, EOFError, OSError, ValueError) as e:
+            return ArchiveReport(STATUS_CORRUPT, "", 0, 0, [], str(e) or type(e).__name__)
+
+    if header.startswith(_RAR_MAGIC):
+        return ArchiveReport(STATUS_UNSUPPORTED, "rar", 0, 0, [])
+    if header.startswith(_7Z_MAGIC):
+        return ArchiveReport(STATUS_UNSUPPORTED, "7z", 0, 0, [])
+    return ArchiveReport(STATUS_CORRUPT, "", 0, 0, [], "Неизвестный формат архива")
@@ -0,0 +1,133 @@
+"""
+Пакеты холодного хранилища: много архивов в одном файле с таблицей смещений.
+
+Формат: MAGIC | данные файлов подряд | таблица (JSON: sha256 -> [offset, size]) | футер.
+Футер хранит смещение и размер таблицы, поэтому пакет можно прочитать без базы данных.
+Модуль зависит только от стандартной библиотеки и используется в процессах проверки архивов.
+"""
+import errno
+import hashlib
+import io
+import json
+import os
+import struct
+from pathlib import Path
+
+MAGIC = b"WBBUNDL1"
+_FOOTER = struct.Struct("<QQ8s")  # смещение таблицы, размер таблицы, MAGIC
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BundleError(Exception):
+    """Файл не является пакетом или поврежден"""
+
+
+class SectionReader(io.RawIOBase):
+    """Файловый объект для чтения участка [offset, offset + size) другого файла"""
+
+    def __init__(self, path, offset: int, size: int):
+        self._file = open(path, "rb")
+        self._start = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            # Как у обычного файла: zipfile и tarfile ожидают OSError
+            raise OSError(errno.EINVAL, "Отрицательная позиция")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        remaining = self._size - self._pos
+        if remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:remaining]
+        self._file.seek(self._start + self._pos)
+        read = self._file.readinto(view)
+        self._pos += read
+        return read
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+def open_section(path, offset: int, size: int):
+    """Открыть архив внутри пакета на чтение"""
+    return io.BufferedReader(SectionReader(path, offset, size), buffer_size=COPY_CHUNK_SIZE)
+
+
+def read_table(path) -> dict:
+    """Прочитать таблицу смещений пакета: sha256 -> (offset, size)"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise BundleError(f"{path}: неверная сигнатура")
+        f.seek(-_FOOTER.size, io.SEEK_END)
+        table_offset, table_size, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic != MAGIC:
+            raise BundleError(f"{path}: поврежден футер")
+        f.seek(table_offset)
+        table = json.loads(f.read(table_size))
+    return {sha256: tuple(entry) for sha256, entry in table.items()}
+
+
+def write_bundle(target: Path, sources: list) -> list:
+    """Записать пакет из источников и вернуть [(offset, size, sha256)] в том же порядке.
+
+    Источник - путь к файлу или кортеж (путь к пакету, offset, size).
+    Одинаковое содержимое сохраняется один раз. Пакет пишется во временный файл
+    и появляется на месте атомарно.
+    """
+    tmp_path = target.with_name(f".{target.name}.part")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    table = {}
+    placed = []
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            for source in sources:
+                offset = out.tell()
+                digest = hashlib.sha256()
+                src = open_section(*source) if isinstance(source, tuple) else open(source, "rb")
+                with src:
+                    while chunk := src.read(COPY_CHUNK_SIZE):
+                        digest.update(chunk)
+                        out.write(chunk)
+                size = out.tell() - offset
+                sha256 = digest.hexdigest()
+                if sha256 in table:
+                    # Дубликат: откатить запись и сослаться на уже сохраненную копию
+                    out.seek(offset)
+                    out.truncate()
+                    offset, size = table[sha256]
+                else:
+                    table[sha256] = (offset, size)
+                placed.append((offset, size, sha256))
+
+            table_offset = out.tell()
+            table_data = json.dumps(table, separators=(",", ":")).encode()
+            out.write(table_data)
+            out.write(_FOOTER.pack(table_offset, len(table_data), MAGIC))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return placed
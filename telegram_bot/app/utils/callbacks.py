@@ -0,0 +1,253 @@
+"""
+Данные inline-кнопок и таблица маршрутизации callback-запросов.
+
+Кнопка с параметрами кодируется классом CallbackData: короткий префикс и поля через «:».
+Обработчик находится по точному значению или по префиксу за одно обращение к словарю,
+вместо последовательной проверки фильтров всех обработчиков.
+"""
+import logging
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+
+# ============ ДАННЫЕ КНОПОК ============
+
+class NumbersDone(CallbackData, prefix="nd"):
+    """Сервис номеров пополнен"""
+    user_id: int
+
+
+class NumbersReply(CallbackData, prefix="nr"):
+    """Ответить на запрос номеров"""
+    user_id: int
+
+
+class NumbersRecipient(CallbackData, prefix="nu"):
+    """Выбор пользователя для отправки номеров"""
+    user_id: int
+
+
+class ProxyDone(CallbackData, prefix="pd"):
+    """Прокси пополнены"""
+    user_id: int
+
+
+class ProxyReply(CallbackData, prefix="pr"):
+    """Ответить на запрос прокси"""
+    user_id: int
+
+
+class UserAccounts(CallbackData, prefix="ua"):
+    """Аккаунты пользователя"""
+    user_id: int
+
+
+class AccountEdit(CallbackData, prefix="ae"):
+    """Карточка аккаунта"""
+    account_id: int
+
+
+class AccountStatus(CallbackData, prefix="as"):
+    """Смена статуса аккаунта (locked, unverified)"""
+    account_id: int
+    status: str
+
+
+class UnsentUser(CallbackData, prefix="uu"):
+    """Неотправленные аккаунты пользователя"""
+    user_id: int
+
+
+class UnsentAccount(CallbackData, prefix="un"):
+    """Карточка неотправленного аккаунта"""
+    account_id: int
+
+
+class AccountSent(CallbackData, prefix="sent"):
+    """Отметить аккаунт отправленным"""
+    account_id: int
+
+
+class AccountLock(CallbackData, prefix="lock"):
+    """Заблокировать аккаунт"""
+    account_id: int
+
+
+class AccountUnlock(CallbackData, prefix="unlock"):
+    """Разблокировать аккаунт"""
+    account_id: int
+
+
+class AccountDelete(CallbackData, prefix="del"):
+    """Удалить аккаунт (confirm - после подтверждения)"""
+    account_id: int
+    confirm: bool = False
+
+
+class UserAllow(CallbackData, prefix="allow"):
+    """Разрешить доступ пользователю"""
+    user_id: int
+
+
+class UserDeny(CallbackData, prefix="deny"):
+    """Запретить доступ пользователю"""
+    user_id: int
+
+
+class UserInfo(CallbackData, prefix="info"):
+    """Информация о пользователе"""
+    user_id: int
+
+
+class ConfirmAddAdmin(CallbackData, prefix="add_admin"):
+    """Подтвердить назначение администратора"""
+    user_id: int
+
+
+class RevokeAdmin(CallbackData, prefix="rm_admin"):
+    """Подтвердить снятие роли администратора"""
+    user_id: int
+
+
+class ApproveUser(CallbackData, prefix="approve"):
+    """Одобрить нового пользователя"""
+    user_id: int
+
+
+class RejectUser(CallbackData, prefix="reject"):
+    """Отказать новому пользователю"""
+    user_id: int
+
+
+class Notify(CallbackData, prefix="ntf"):
+    """Выбор типа или получателя уведомления (salary, call, penalty, custom, single, all)"""
+    kind: str
+
+
+class NotifyRecipient(CallbackData, prefix="ntf_u"):
+    """Выбор пользователя для уведомления"""
+    user_id: int
+
+
+# Кнопки старого формата «<префикс>_<значение>» (или «<префикс>_<значение>_<значение>»
+# для нескольких полей) в уже отправленных сообщениях
+LEGACY_PREFIXES = {
+    "numbers_sent_confirm": NumbersDone,
+    "numbers_respond": NumbersReply,
+    "respond_numbers_user": NumbersRecipient,
+    "proxy_sent_confirm": ProxyDone,
+    "proxy_respond": ProxyReply,
+    "accounts_user": UserAccounts,
+    "acc_edit": AccountEdit,
+    "acc_status": AccountStatus,
+    "unsent_user": UnsentUser,
+    "unsent_account": UnsentAccount,
+    "account_sent": AccountSent,
+    "account_lock": AccountLock,
+    "account_unlock": AccountUnlock,
+    "user_allow": UserAllow,
+    "user_deny": UserDeny,
+    "user_info": UserInfo,
+    "confirm_add_admin": ConfirmAddAdmin,
+    "approve_new_user": ApproveUser,
+    "deny_new_user": RejectUser,
+    "notify": Notify,
+    "notify_user_select": NotifyRecipient,
+}
+
+
+# ============ ТАБЛИЦА МАРШРУТИЗАЦИИ ============
+
+class UnknownCallback(LookupError):
+    """Для данных кнопки не зарегистрирован обработчик"""
+
+
+class CallbackTable:
+    """Таблица обработчиков callback-запросов.
+
+    Обработчики регистрируются по точному значению данных (exact) или по классу
+    CallbackData (on) и получают разобранные данные в аргументе callback_data.
+    Нераспознанные и поврежденные данные обрабатываются в одном месте.
+    """
+
+    def __init__(self, legacy_prefixes: dict = None):
+        self._exact: dict[str, CallableObject] = {}
+        self._prefixed: dict[str, tuple] = {}  # префикс -> (класс данных, обработчик)
+        self._legacy = dict(legacy_prefixes or {})  # старый префикс -> класс данных
+        # Число полей в старых данных: значения отделяются от префикса с конца строки
+        self._legacy_arities = sorted({len(codec.model_fields) for codec in self._legacy.values()})
+        self.router = Router(name="callbacks")
+        self.router.callback_query.register(self.dispatch)
+        self.unknown = 0
+
+    def exact(self, *values: str):
+        """Зарегистрировать обработчик кнопок с фиксированными данными"""
+        def decorator(handler):
+            for value in values:
+                if value in self._exact:
+                    raise ValueError(f"Обработчик для «{value}» уже зарегистрирован")
+                self._exact[value] = CallableObject(handler)
+            return handler
+        return decorator
+
+    def on(self, codec: type[CallbackData]):
+        """Зарегистрировать обработчик кнопок с данными класса codec"""
+        def decorator(handler):
+            if codec.__prefix__ in self._prefixed:
+                raise ValueError(f"Обработчик для префикса «{codec.__prefix__}» уже зарегистрирован")
+            self._prefixed[codec.__prefix__] = (codec, CallableObject(handler))
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> tuple:
+        """Найти обработчик и разобрать данные кнопки: (обработчик, callback_data или None)"""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler, None
+
+        prefix, sep, _ = data.partition(":")
+        if sep:
+            entry = self._prefixed.get(prefix)
+            if entry is not None:
+                codec, handler = entry
+                return handler, codec.unpack(data)
+
+        for arity in self._legacy_arities:
+            old_prefix, *values = data.rsplit("_", arity)
+            codec = self._legacy.get(old_prefix)
+            if codec is None or len(values) != arity or len(codec.model_fields) != arity:
+                continue
+            entry = self._prefixed.get(codec.__prefix__)
+            if entry is not None:
+                return entry[1], codec(**dict(zip(codec.model_fields, values)))
+
+        raise UnknownCallback(data)
+
+    def handler_name(self, data: str) -> str:
+        """Имя обработчика кнопки (для метрик и логов)"""
+        try:
+            handler, _ = self.resolve(data or "")
+        except (UnknownCallback, ValueError, TypeError):
+            return "unknown_callback"
+        return handler.callback.__name__
+
+    async def dispatch(self, callback: CallbackQuery, **kwargs):
+        try:
+            handler, callback_data = self.resolve(callback.data or "")
+        except (UnknownCallback, ValueError, TypeError) as e:
+            self.unknown += 1
+            logger.warning(f"Необработанные данные кнопки {callback.data!r} от {callback.from_user.id}: {e}")
+            await callback.answer("⚠️ Кнопка устарела. Откройте меню заново.", show_alert=True)
+            return None
+
+        if callback_data is not None:
+            kwargs["callback_data"] = callback_data
+        return await handler.call(callback, **kwargs)
+
+
+callback_table = CallbackTable(LEGACY_PREFIXES)
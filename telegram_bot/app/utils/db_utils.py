@@ -1,8 +1,15 @@
+import re
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, update, delete, insert, and_, case, func, String
+# Upsert-ы в диалекте SQLite: init_db не запускает бота с другой БД
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload
-from app.models import User, Account, Log
+from app.models import (
+    User, Account, Log, Blob, ArchiveCheck, ArchiveMember, FileIndexEntry, FSMRecord, archive_members_fts
+)
+from app.utils.archives import ArchiveReport
+from app.utils.storage import get_account_relative_path
 
 
 class UserRepository:
@@ -68,6 +75,35 @@ class UserRepository:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+    @staticmethod
+    async def get_admin_tg_ids(session: AsyncSession):
+        """Telegram ID всех администраторов"""
+        result = await session.execute(select(User.tg_id).where(User.is_admin.is_(True)))
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def set_admin(session: AsyncSession, user_id: int, is_admin: bool):
+        """Назначить или снять роль администратора через бота (администратор всегда имеет доступ)"""
+        values = {"is_admin": is_admin, "admin_granted": is_admin}
+        if is_admin:
+            values["access"] = True
+        await session.execute(update(User).where(User.id == user_id).values(**values))
+        await session.commit()
+
+    @staticmethod
+    async def count_users_by_access(session: AsyncSession):
+        """Число пользователей: (всего, с доступом)"""
+        result = await session.execute(
+            select(func.count(User.id), func.coalesce(func.sum(case((User.access.is_(True), 1), else_=0)), 0))
+        )
+        return tuple(result.one())
+
+    @staticmethod
+    async def get_allowed_tg_ids(session: AsyncSession):
+        """Telegram ID пользователей с доступом"""
+        result = await session.execute(select(User.tg_id).where(User.access.is_(True)).order_by(User.id))
+        return result.scalars().all()
+
     @staticmethod
     async def delete_user(session: AsyncSession, user_id: int):
         """Удалить пользователя"""
@@ -77,19 +113,145 @@ class UserRepository:
             await session.commit()
         return user
 
+    @staticmethod
+    async def add_storage_usage(session: AsyncSession, user_id: int, size: int, files: int):
+        """Изменить счетчики занятого места пользователя (без коммита)"""
+        await session.execute(
+            update(User).where(User.id == user_id).values(
+                storage_bytes=User.storage_bytes + size,
+                storage_files=User.storage_files + files,
+            )
+        )
+
+    @staticmethod
+    async def get_top_storage_users(session: AsyncSession, limit: int = 10):
+        """Пользователи, занимающие больше всего места"""
+        stmt = select(User).where(User.storage_files > 0).order_by(User.storage_bytes.desc()).limit(limit)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_storage_totals(session: AsyncSession):
+        """Суммарное занятое место: (байт, файлов)"""
+        result = await session.execute(
+            select(func.coalesce(func.sum(User.storage_bytes), 0), func.coalesce(func.sum(User.storage_files), 0))
+        )
+        return tuple(result.one())
+
+    @staticmethod
+    async def recalculate_storage_usage(session: AsyncSession):
+        """Пересчитать счетчики всех пользователей по аккаунтам, blob-ам и индексу файлов"""
+        account_size = func.coalesce(Blob.size, FileIndexEntry.size, 0)
+        total_bytes = (
+            select(func.coalesce(func.sum(account_size), 0))
+            .select_from(Account)
+            .outerjoin(Blob, Blob.sha256 == Account.sha256)
+            .outerjoin(FileIndexEntry, FileIndexEntry.path == account_relative_path_expr())
+            .where(Account.user_id == User.id)
+            .scalar_subquery()
+        )
+        total_files = select(func.count(Account.id)).where(Account.user_id == User.id).scalar_subquery()
+        await session.execute(update(User).values(storage_bytes=total_bytes, storage_files=total_files))
+        await session.commit()
+
 
 class AccountRepository:
     """Репозиторий для работы с аккаунтами"""
 
     @staticmethod
-    async def create_account(session: AsyncSession, user_id: int, file_path: str, month: str):
+    async def create_account(session: AsyncSession, user_id: int, file_path: str, month: str,
+                             file_name: str = None, sha256: str = None, size: int = 0):
         """Создать новый аккаунт (по умолчанию статус Проверен)"""
-        account = Account(user_id=user_id, file_path=file_path, month=month, sent=True, locked=False)
+        if sha256:
+            blob = await BlobRepository.acquire(session, sha256, file_path, size)
+            file_path = blob.path
+        await UserRepository.add_storage_usage(session, user_id, size, 1)
+        account = Account(
+            user_id=user_id, file_path=file_path, month=month, file_name=file_name,
+            sha256=sha256, sent=True, locked=False
+        )
         session.add(account)
         await session.commit()
         await session.refresh(account)
         return account
 
+    @staticmethod
+    async def create_accounts(session: AsyncSession, user_id: int, month: str, files):
+        """Создать несколько аккаунтов одной транзакцией.
+
+        files - список кортежей (file_path, file_name, sha256, size).
+        """
+        if not files:
+            return []
+        blobs = await BlobRepository.acquire_many(
+            session, [(sha256, file_path, size) for file_path, _, sha256, size in files]
+        )
+        rows = [
+            {"user_id": user_id, "file_path": blobs[sha256].path, "month": month, "file_name": file_name,
+             "sha256": sha256, "sent": True, "locked": False}
+            for _, file_name, sha256, _ in files
+        ]
+        # Один INSERT на все аккаунты; ID выдаются по порядку строк, сортировка по ID восстанавливает порядок files
+        result = await session.scalars(insert(Account).returning(Account), rows)
+        accounts = sorted(result.all(), key=lambda account: account.id)
+        await UserRepository.add_storage_usage(session, user_id, sum(file[3] for file in files), len(files))
+        await session.commit()
+        return accounts
+
+    @staticmethod
+    async def get_accounts_by_sha256(session: AsyncSession, hashes):
+        """Получить аккаунты с тем же содержимым файлов, сгруппированные по хэшу"""
+        stmt = select(Account).where(Account.sha256.in_(list(hashes))).order_by(Account.date_created)
+        result = await session.execute(stmt)
+        grouped = {}
+        for account in result.scalars().all():
+            grouped.setdefault(account.sha256, []).append(account)
+        return grouped
+
+    @staticmethod
+    async def delete_account(session: AsyncSession, account_id: int):
+        """Удалить аккаунт вместе с манифестом архива и освободить ссылку на файл (без коммита).
+
+        Возвращает путь файла в горячем хранилище, на который больше никто не ссылается, или None.
+        Файл нужно убрать до коммита, пока транзакция удерживает запись в БД. Упакованное
+        содержимое остается в холодном пакете до его пересборки.
+        """
+        account = await AccountRepository.get_account_by_id(session, account_id)
+        if not account:
+            return None
+        # Записи полнотекстового индекса удаляет триггер archive_members_fts_ad
+        await session.execute(delete(ArchiveMember).where(ArchiveMember.account_id == account.id))
+        await session.execute(delete(ArchiveCheck).where(ArchiveCheck.account_id == account.id))
+        orphan_path = None
+        size = 0
+        if account.sha256:
+            blob = await BlobRepository.release(session, account.sha256)
+            if blob:
+                size = blob.size
+            if blob and blob.ref_count == 0:
+                if blob.bundle is None:
+                    orphan_path = blob.path
+                await session.delete(blob)
+        else:
+            path = get_account_relative_path(account)
+            # Размер старых файлов известен только из индекса
+            size = await session.scalar(select(FileIndexEntry.size).where(FileIndexEntry.path == path)) or 0
+            # Старые файлы хранятся по имени, и на один файл могут ссылаться несколько аккаунтов
+            shared = await session.scalar(
+                select(func.count(Account.id)).where(
+                    Account.id != account.id, Account.sha256.is_(None),
+                    Account.user_id == account.user_id, Account.file_path == account.file_path,
+                )
+            )
+            if not shared:
+                orphan_path = path
+        if orphan_path:
+            await FileIndexRepository.remove_paths(session, [orphan_path])
+        await UserRepository.add_storage_usage(session, account.user_id, -size, -1)
+        await session.delete(account)
+        await session.flush()
+        return orphan_path
+
     @staticmethod
     async def get_account_by_id(session: AsyncSession, account_id: int):
         """Получить аккаунт по ID"""
@@ -145,6 +307,402 @@ class AccountRepository:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+    @staticmethod
+    async def get_users_with_unsent_accounts(session: AsyncSession):
+        """Пользователи с неотправленными аккаунтами и число таких аккаунтов (одним запросом).
+
+        Возвращает список (пользователь, количество), сначала пользователи с самым новым аккаунтом.
+        """
+        stmt = (
+            select(User, func.count(Account.id))
+            .join(Account, Account.user_id == User.id)
+            .where(Account.sent == False)
+            .group_by(User.id)
+            .order_by(func.max(Account.date_created).desc())
+        )
+        result = await session.execute(stmt)
+        return result.all()
+
+    @staticmethod
+    async def get_legacy_accounts_before(session: AsyncSession, month: str):
+        """Аккаунты со старыми файлами (вне хранилища blob-ов) за месяцы до month"""
+        stmt = select(Account).where(Account.sha256.is_(None), Account.month < month).order_by(Account.id)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def attach_blob(session: AsyncSession, account, sha256: str, path: str, size: int):
+        """Перевести аккаунт со старым файлом на blob (без коммита)"""
+        blob = await BlobRepository.acquire(session, sha256, path, size)
+        account.sha256 = sha256
+        account.file_path = blob.path
+        return blob
+
+
+class BlobRepository:
+    """Репозиторий для работы с файлами хранилища (без коммита, его выполняет вызывающий код)"""
+
+    @staticmethod
+    async def get_by_sha256(session: AsyncSession, sha256: str):
+        """Получить blob по хэшу"""
+        stmt = select(Blob).where(Blob.sha256 == sha256)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def acquire(session: AsyncSession, sha256: str, path: str, size: int):
+        """Увеличить счетчик ссылок на blob (создать запись, если ее нет)"""
+        blobs = await BlobRepository.acquire_many(session, [(sha256, path, size)])
+        return blobs[sha256]
+
+    @staticmethod
+    async def acquire_many(session: AsyncSession, files):
+        """Увеличить счетчики ссылок на blob-ы (создать недостающие записи). files - список (sha256, path, size).
+
+        Возвращает sha256 -> Blob. Для уже известного хэша остается прежний путь: blob-ы, сохраненные
+        до перехода на пути без расширения, лежат по другому пути, и ссылаться нужно на blob.path.
+        """
+        now = datetime.utcnow()
+        rows = {}
+        for sha256, path, size in files:
+            row = rows.setdefault(sha256, {"sha256": sha256, "path": path, "size": size, "ref_count": 0, "created_at": now})
+            row["ref_count"] += 1
+        rows = list(rows.values())
+        # Атомарный upsert: параллельные загрузки одного файла не конфликтуют
+        for i in range(0, len(rows), 500):
+            stmt = sqlite_insert(Blob).values(rows[i:i + 500])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Blob.sha256], set_={"ref_count": Blob.ref_count + stmt.excluded.ref_count}
+            )
+            await session.execute(stmt)
+        # Счетчики изменены в обход ORM: загруженные ранее записи сессии обновляются
+        stmt = (
+            select(Blob).where(Blob.sha256.in_([row["sha256"] for row in rows]))
+            .execution_options(populate_existing=True)
+        )
+        result = await session.execute(stmt)
+        blobs = {blob.sha256: blob for blob in result.scalars().all()}
+        await FileIndexRepository.add_files(
+            session, [(blob.path, blob.size) for blob in blobs.values() if blob.bundle is None]
+        )
+        return blobs
+
+    @staticmethod
+    async def get_by_sha256s(session: AsyncSession, hashes):
+        """Получить blob-ы по хэшам: sha256 -> Blob"""
+        hashes = list(hashes)
+        if not hashes:
+            return {}
+        stmt = select(Blob).where(Blob.sha256.in_(hashes))
+        result = await session.execute(stmt)
+        return {blob.sha256: blob for blob in result.scalars().all()}
+
+    @staticmethod
+    async def get_tiering_candidates(session: AsyncSession, before_month: str):
+        """Неупакованные blob-ы, все аккаунты которых относятся к месяцам до before_month.
+
+        Возвращает [(Blob, самый ранний месяц аккаунтов)].
+        """
+        stmt = (
+            select(Blob, func.min(Account.month))
+            .join(Account, Account.sha256 == Blob.sha256)
+            .where(Blob.bundle.is_(None))
+            .group_by(Blob.id)
+            .having(func.max(Account.month) < before_month)
+        )
+        result = await session.execute(stmt)
+        return result.all()
+
+    @staticmethod
+    async def get_by_bundle_prefix(session: AsyncSession, prefix: str):
+        """Blob-ы, упакованные в пакеты с путем, начинающимся с prefix"""
+        stmt = select(Blob).where(Blob.bundle.like(f"{prefix}%")).order_by(Blob.bundle_offset)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def move_to_bundle(session: AsyncSession, sha256: str, bundle: str, offset: int):
+        """Отметить, что содержимое blob-а хранится в пакете"""
+        await session.execute(
+            update(Blob).where(Blob.sha256 == sha256).values(bundle=bundle, bundle_offset=offset)
+        )
+
+    @staticmethod
+    async def release(session: AsyncSession, sha256: str):
+        """Уменьшить счетчик ссылок на blob"""
+        stmt = (
+            update(Blob)
+            .where(Blob.sha256 == sha256, Blob.ref_count > 0)
+            .values(ref_count=Blob.ref_count - 1)
+            .execution_options(synchronize_session="fetch")
+        )
+        await session.execute(stmt)
+        return await BlobRepository.get_by_sha256(session, sha256)
+
+
+def account_relative_path_expr():
+    """SQL-выражение пути файла аккаунта относительно UPLOAD_DIR (как storage.get_account_relative_path)"""
+    return case(
+        (Account.sha256.is_not(None), Account.file_path),
+        else_=func.cast(Account.user_id, String) + "/" + Account.file_path,
+    )
+
+
+class FileIndexRepository:
+    """Репозиторий индекса файлов на диске (без коммита, кроме apply_scan)"""
+
+    @staticmethod
+    async def load_index(session: AsyncSession):
+        """Загрузить индекс: путь -> (is_dir, size, mtime)"""
+        stmt = select(FileIndexEntry.path, FileIndexEntry.is_dir, FileIndexEntry.size, FileIndexEntry.mtime)
+        result = await session.execute(stmt)
+        return {path: (is_dir, size, mtime) for path, is_dir, size, mtime in result.all()}
+
+    @staticmethod
+    async def add_file(session: AsyncSession, path: str, size: int):
+        """Добавить только что сохраненный файл (mtime уточнит следующая сверка)"""
+        await FileIndexRepository.add_files(session, [(path, size)])
+
+    @staticmethod
+    async def add_files(session: AsyncSession, files):
+        """Добавить сохраненные файлы одним запросом. files - список (path, size)"""
+        files = list(files)
+        for i in range(0, len(files), 500):
+            stmt = sqlite_insert(FileIndexEntry).values([
+                {"path": path, "is_dir": False, "size": size, "mtime": None} for path, size in files[i:i + 500]
+            ]).on_conflict_do_nothing(index_elements=[FileIndexEntry.path])
+            await session.execute(stmt)
+
+    @staticmethod
+    async def remove_paths(session: AsyncSession, paths):
+        """Удалить записи индекса"""
+        paths = list(paths)
+        for i in range(0, len(paths), 500):
+            await session.execute(delete(FileIndexEntry).where(FileIndexEntry.path.in_(paths[i:i + 500])))
+
+    @staticmethod
+    async def apply_scan(session: AsyncSession, upserts, removed):
+        """Применить результат сканирования диска. upserts - список (path, is_dir, size, mtime)"""
+        for i in range(0, len(upserts), 500):
+            stmt = sqlite_insert(FileIndexEntry).values([
+                {"path": path, "is_dir": is_dir, "size": size, "mtime": mtime}
+                for path, is_dir, size, mtime in upserts[i:i + 500]
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[FileIndexEntry.path],
+                set_={"is_dir": stmt.excluded.is_dir, "size": stmt.excluded.size, "mtime": stmt.excluded.mtime},
+            )
+            await session.execute(stmt)
+        await FileIndexRepository.remove_paths(session, removed)
+        await session.commit()
+
+    @staticmethod
+    async def get_file_paths(session: AsyncSession):
+        """Получить множество путей проиндексированных файлов"""
+        stmt = select(FileIndexEntry.path).where(FileIndexEntry.is_dir == False)
+        result = await session.execute(stmt)
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def get_missing_accounts(session: AsyncSession, limit: int = 10):
+        """Аккаунты, файла которых нет в индексе: (количество, первые limit аккаунтов)"""
+        indexed = select(FileIndexEntry.path).where(FileIndexEntry.is_dir == False)
+        cold = select(Blob.sha256).where(Blob.bundle.in_(indexed))
+        condition = and_(
+            account_relative_path_expr().not_in(indexed),
+            func.coalesce(Account.sha256.not_in(cold), True),
+        )
+        count = await session.scalar(select(func.count(Account.id)).where(condition))
+        result = await session.execute(select(Account).where(condition).order_by(Account.id).limit(limit))
+        return count, result.scalars().all()
+
+    @staticmethod
+    async def get_orphan_files(session: AsyncSession, ignore_prefix: str, limit: int = 10):
+        """Файлы, на которые не ссылается ни один аккаунт: (количество, первые limit путей)"""
+        referenced = select(account_relative_path_expr())
+        condition = and_(
+            FileIndexEntry.is_dir == False,
+            FileIndexEntry.path.not_like(f"{ignore_prefix}%"),
+            FileIndexEntry.path.not_in(referenced),
+            FileIndexEntry.path.not_in(select(Blob.bundle).where(Blob.bundle.is_not(None))),
+        )
+        count = await session.scalar(select(func.count(FileIndexEntry.id)).where(condition))
+        result = await session.execute(
+            select(FileIndexEntry.path).where(condition).order_by(FileIndexEntry.path).limit(limit)
+        )
+        return count, result.scalars().all()
+
+
+class FSMRepository:
+    """Репозиторий состояний FSM"""
+
+    @staticmethod
+    async def get(session: AsyncSession, key: str):
+        """Получить (state, data, updated_at) по ключу или None"""
+        stmt = select(FSMRecord.state, FSMRecord.data, FSMRecord.updated_at).where(FSMRecord.key == key)
+        result = await session.execute(stmt)
+        return result.one_or_none()
+
+    @staticmethod
+    async def save(session: AsyncSession, key: str, state, data, updated_at: float):
+        """Сохранить состояние (data - JSON-строка)"""
+        stmt = sqlite_insert(FSMRecord).values(key=key, state=state, data=data, updated_at=updated_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at},
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+    @staticmethod
+    async def delete(session: AsyncSession, key: str):
+        """Удалить состояние"""
+        await session.execute(delete(FSMRecord).where(FSMRecord.key == key))
+        await session.commit()
+
+    @staticmethod
+    async def delete_expired(session: AsyncSession, before: float) -> int:
+        """Удалить состояния, не менявшиеся с момента before. Возвращает число удаленных"""
+        result = await session.execute(delete(FSMRecord).where(FSMRecord.updated_at < before))
+        await session.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def count_by_state(session: AsyncSession):
+        """Количество сохраненных состояний по их названию"""
+        stmt = select(FSMRecord.state, func.count(FSMRecord.id)).group_by(FSMRecord.state)
+        result = await session.execute(stmt)
+        return dict(result.all())
+
+
+def to_fts_query(text: str) -> str:
+    """Преобразовать пользовательский текст в безопасный FTS5-запрос (фраза с префиксом)"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return '""'
+    return '"' + " ".join(words) + '"*'
+
+
+class ArchiveRepository:
+    """Репозиторий для результатов проверки архивов и их манифестов"""
+
+    @staticmethod
+    async def save_report(session: AsyncSession, account_id: int, report):
+        """Сохранить результат проверки архива (перезаписывает предыдущий)"""
+        await session.execute(delete(ArchiveMember).where(ArchiveMember.account_id == account_id))
+        await session.execute(delete(ArchiveCheck).where(ArchiveCheck.account_id == account_id))
+        session.add(ArchiveCheck(
+            account_id=account_id, status=report.status, archive_type=report.archive_type,
+            member_count=report.member_count, total_size=report.total_size, error=report.error
+        ))
+        if report.members:
+            await session.execute(
+                insert(ArchiveMember),
+                [{"account_id": account_id, "name": name, "size": size} for name, size in report.members]
+            )
+        await session.commit()
+
+    @staticmethod
+    async def copy_report(session: AsyncSession, source_account_id: int, account_id: int):
+        """Скопировать результат проверки с аккаунта с тем же файлом. Возвращает False, если копировать нечего"""
+        check = await ArchiveRepository.get_check(session, source_account_id)
+        if not check:
+            return False
+        members = await ArchiveRepository.get_members(session, source_account_id)
+        await ArchiveRepository.save_report(session, account_id, ArchiveReport(
+            check.status, check.archive_type, check.member_count, check.total_size,
+            [(m.name, m.size) for m in members], check.error
+        ))
+        return True
+
+    @staticmethod
+    async def get_check(session: AsyncSession, account_id: int):
+        """Получить результат проверки архива аккаунта"""
+        stmt = select(ArchiveCheck).where(ArchiveCheck.account_id == account_id)
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_members(session: AsyncSession, account_id: int, limit: int = None):
+        """Получить файлы из манифеста архива"""
+        stmt = select(ArchiveMember).where(ArchiveMember.account_id == account_id).order_by(ArchiveMember.id)
+        if limit:
+            stmt = stmt.limit(limit)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def search(session: AsyncSession, query: str = None, min_members: int = None,
+                     max_members: int = None, min_size: int = None, limit: int = 20):
+        """Найти аккаунты по содержимому архивов.
+
+        query ищется по полнотекстовому индексу путей файлов, остальные фильтры - по
+        индексированным счетчикам проверки. Возвращает список (аккаунт, проверка, совпавшие файлы),
+        новые аккаунты первыми.
+        """
+        filters = []
+        if min_members is not None:
+            filters.append(ArchiveCheck.member_count > min_members)
+        if max_members is not None:
+            filters.append(ArchiveCheck.member_count < max_members)
+        if min_size is not None:
+            filters.append(ArchiveCheck.total_size > min_size)
+
+        matched = {}
+        fts_query = to_fts_query(query) if query else None
+        if fts_query:
+            # Совпадения читаются потоком от новых к старым, пока не наберется limit аккаунтов,
+            # поэтому частые слова не заставляют сортировать все совпадения
+            stmt = (
+                select(ArchiveMember)
+                .select_from(archive_members_fts)
+                .join(ArchiveMember, ArchiveMember.id == archive_members_fts.c.rowid)
+                .join(ArchiveCheck, ArchiveCheck.account_id == ArchiveMember.account_id)
+                .where(archive_members_fts.c.name.match(fts_query), *filters)
+                .order_by(archive_members_fts.c.rowid.desc())
+                .execution_options(yield_per=500)
+            )
+            account_ids = []
+            result = await session.stream(stmt)
+            async for member in result.scalars():
+                if member.account_id not in matched:
+                    if len(account_ids) >= limit:
+                        break
+                    account_ids.append(member.account_id)
+                    matched[member.account_id] = []
+                matched[member.account_id].append(member)
+            await result.close()
+        else:
+            stmt = select(ArchiveCheck.account_id).where(*filters).order_by(ArchiveCheck.account_id.desc()).limit(limit)
+            account_ids = (await session.execute(stmt)).scalars().all()
+
+        if not account_ids:
+            return []
+
+        stmt = (
+            select(Account, ArchiveCheck)
+            .join(ArchiveCheck, ArchiveCheck.account_id == Account.id)
+            .where(Account.id.in_(account_ids))
+        )
+        rows = {account.id: (account, check) for account, check in (await session.execute(stmt)).all()}
+
+        return [
+            (*rows[account_id], matched.get(account_id, []))
+            for account_id in account_ids if account_id in rows
+        ]
+
+    @staticmethod
+    async def get_unchecked_account_ids(session: AsyncSession):
+        """Получить ID аккаунтов, архивы которых еще не проверялись"""
+        stmt = (
+            select(Account.id)
+            .outerjoin(ArchiveCheck, ArchiveCheck.account_id == Account.id)
+            .where(ArchiveCheck.id.is_(None))
+            .order_by(Account.id)
+        )
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
 
 class LogRepository:
     """Репозиторий для работы с логами"""
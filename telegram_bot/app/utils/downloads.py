@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from config import DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE, ALBUM_COLLECT_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+class UploadJob(NamedTuple):
+    """Задание на загрузку архивов пользователя (один документ или целый альбом)"""
+    user_id: int  # ID пользователя в БД
+    tg_id: int
+    username: Optional[str]
+    chat_id: int
+    documents: tuple  # aiogram.types.Document
+    month: str
+
+
+class DownloadQueue:
+    """Ограниченная очередь загрузок, обрабатываемая фиксированным пулом воркеров"""
+
+    def __init__(self, workers: int, maxsize: int):
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks: list[asyncio.Task] = []
+        self._bot = None
+        self._processor: Optional[Callable[[Any, UploadJob], Awaitable[None]]] = None
+
+    @property
+    def pending(self) -> int:
+        """Количество заданий, ожидающих обработки"""
+        return self._queue.qsize()
+
+    def start(self, bot, processor: Callable[[Any, UploadJob], Awaitable[None]]):
+        """Запустить воркеры"""
+        self._bot = bot
+        self._processor = processor
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"download-worker-{i}"))
+        logger.info(f"Очередь загрузок запущена: воркеров={self.workers}, размер={self._queue.maxsize}")
+
+    def submit(self, job: UploadJob) -> int:
+        """Поставить задание в очередь и вернуть его позицию.
+
+        Бросает asyncio.QueueFull, если очередь заполнена.
+        """
+        self._queue.put_nowait(job)
+        return self._queue.qsize()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._processor(self._bot, job)
+            except Exception as e:
+                names = ", ".join(doc.file_name for doc in job.documents)
+                logger.error(f"[ERROR] Ошибка обработки загрузки {names}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 30):
+        """Дождаться обработки очереди (не дольше timeout) и остановить воркеры"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Очередь загрузок остановлена, необработанных заданий: {self.pending}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+class AlbumCollector:
+    """Собирает документы одного альбома (media group), пришедшие отдельными сообщениями"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._albums: dict[str, list] = {}
+        self._last_seen: dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._stopped = asyncio.Event()
+
+    def add(self, media_group_id: str, item, on_complete: Callable[[list], Awaitable[None]]) -> bool:
+        """Добавить элемент альбома.
+
+        on_complete вызывается один раз со всеми элементами, когда новые перестают приходить
+        в течение delay секунд. Возвращает True для первого элемента альбома.
+        """
+        loop = asyncio.get_running_loop()
+        self._last_seen[media_group_id] = loop.time()
+        if media_group_id in self._albums:
+            self._albums[media_group_id].append(item)
+            return False
+
+        self._albums[media_group_id] = [item]
+        task = asyncio.create_task(self._flush(media_group_id, on_complete), name=f"album-{media_group_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _flush(self, media_group_id: str, on_complete: Callable[[list], Awaitable[None]]):
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = self._last_seen[media_group_id] + self.delay - loop.time()
+            if wait <= 0:
+                break
+            try:
+                # При остановке альбом передается дальше, не дожидаясь остальных элементов
+                await asyncio.wait_for(self._stopped.wait(), wait)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+        items = self._albums.pop(media_group_id)
+        self._last_seen.pop(media_group_id, None)
+        try:
+            await on_complete(items)
+        except Exception as e:
+            logger.error(f"[ERROR] Ошибка обработки альбома {media_group_id}: {e}", exc_info=True)
+
+    async def stop(self):
+        """Сразу передать дальше собранные альбомы (вызывать до остановки очереди загрузок).
+
+        Иначе документы недособранного альбома теряются вместе с резервом квоты под них.
+        """
+        self._stopped.set()
+        if self._tasks:
+            logger.info(f"Передача собранных альбомов: {len(self._tasks)}")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+download_queue = DownloadQueue(DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE)
+album_collector = AlbumCollector(ALBUM_COLLECT_DELAY)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+from config import FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_COMPACT_INTERVAL
+from app.models import AsyncSessionLocal
+from app.utils.db_utils import FSMRepository
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище состояний FSM в базе данных бота с кэшем в памяти.
+
+    Запись идет сквозь кэш сразу в БД, поэтому незавершенные сценарии переживают перезапуск.
+    Кэш ограничен по размеру (LRU), состояния старше ttl секунд считаются сброшенными
+    и периодически удаляются из БД.
+    """
+
+    def __init__(self, ttl: int, cache_size: int, compact_interval: int):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.compact_interval = compact_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._cache: OrderedDict[str, tuple] = OrderedDict()  # key -> (state, data, updated_at)
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        """Запустить периодическую очистку устаревших состояний"""
+        self._task = asyncio.create_task(self._compact_loop(), name="fsm-compaction")
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def held_states(self) -> Counter:
+        """Незавершенные сценарии в кэше по названию состояния"""
+        return Counter(
+            record[0] for record in list(self._cache.values())
+            if record[0] is not None and not self._is_expired(record[2])
+        )
+
+    def _is_expired(self, updated_at: float) -> bool:
+        return self.ttl > 0 and updated_at < time.time() - self.ttl
+
+    def _remember(self, key: str, record: tuple):
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, key: str) -> tuple:
+        """Получить (state, data, updated_at) из кэша или БД"""
+        record = self._cache.get(key)
+        if record is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        else:
+            self.misses += 1
+            async with AsyncSessionLocal() as session:
+                row = await FSMRepository.get(session, key)
+            record = (row.state, json.loads(row.data or "{}"), row.updated_at) if row else (None, {}, 0.0)
+            self._remember(key, record)
+
+        if record[0] is None and not record[1]:
+            return record
+        if self._is_expired(record[2]):
+            # Сценарий брошен слишком давно: начать с чистого состояния
+            await self._save(key, None, {})
+            return None, {}, 0.0
+        return record
+
+    async def _save(self, key: str, state: Optional[str], data: dict):
+        record = (state, data, time.time())
+        self._remember(key, record)
+        try:
+            async with AsyncSessionLocal() as session:
+                if state is None and not data:
+                    await FSMRepository.delete(session, key)
+                else:
+                    await FSMRepository.save(session, key, state, json.dumps(data, ensure_ascii=False), record[2])
+        except Exception:
+            # Кэш не должен расходиться с БД
+            self._cache.pop(key, None)
+            raise
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        _, data, _ = await self._load(storage_key)
+        await self._save(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Данные FSM должны быть словарем, а не {type(data).__name__}")
+        storage_key = self.key_builder.build(key)
+        state, _, _ = await self._load(storage_key)
+        await self._save(storage_key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, data, _ = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    async def compact(self) -> int:
+        """Удалить устаревшие состояния из БД и кэша"""
+        if self.ttl <= 0:
+            return 0
+        before = time.time() - self.ttl
+        for key in [key for key, record in self._cache.items() if record[2] and record[2] < before]:
+            del self._cache[key]
+        async with AsyncSessionLocal() as session:
+            removed = await FSMRepository.delete_expired(session, before)
+        if removed:
+            logger.info(f"Удалено устаревших состояний FSM: {removed}")
+        return removed
+
+    async def _compact_loop(self):
+        while True:
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"[ERROR] Ошибка очистки состояний FSM: {e}", exc_info=True)
+            await asyncio.sleep(self.compact_interval)
+
+
+fsm_storage = SQLiteStorage(FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_COMPACT_INTERVAL)
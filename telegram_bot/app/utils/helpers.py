@@ -1,7 +1,9 @@
 import os
+import re
 from datetime import datetime
 from pathlib import Path
 from config import UPLOAD_DIR
+from app.utils.storage import get_account_filename
 
 
 def get_current_month() -> str:
@@ -23,7 +25,35 @@ def save_uploaded_file(file_path: str, user_id: int, filename: str) -> str:
     return str(new_file_path)
 
 
-def format_account_info(account) -> str:
+def format_size(num_bytes: int) -> str:
+    """Форматировать размер в байтах в человекочитаемый вид"""
+    size = float(num_bytes or 0)
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+# Длина текста сообщения с запасом до лимита Telegram (4096 символов)
+MESSAGE_TEXT_LIMIT = 4000
+
+
+def shorten(text: str, limit: int = 80) -> str:
+    """Обрезать строку до limit символов, сохранив конец (обычно там имя файла)"""
+    if len(text) <= limit:
+        return text
+    return "…" + text[-(limit - 1):]
+
+
+ARCHIVE_STATUS_TEXT = {
+    "ok": "✅ Целый",
+    "corrupt": "❌ Поврежден",
+    "unsupported": "❔ Формат не проверяется",
+    "missing": "⚠️ Файл не найден",
+}
+
+
+def format_account_info(account, check=None, members=(), members_limit: int = 10) -> str:
     """Форматировать информацию об аккаунте"""
     status_sent = "✅ Отправлен" if account.sent else "❌ Не отправлен"
     status_locked = "🔒 Заблокирован" if account.locked else "🔓 Разблокирован"
@@ -32,11 +62,28 @@ def format_account_info(account) -> str:
         f"📁 Аккаунт #{account.id}\n"
         f"👤 ID пользователя: {account.user_id}\n"
         f"📅 Месяц: {account.month}\n"
-        f"📄 Файл: {Path(account.file_path).name}\n"
+        f"📄 Файл: {get_account_filename(account)}\n"
         f"📍 Статус отправки: {status_sent}\n"
         f"🔐 Статус блокировки: {status_locked}\n"
         f"⏰ Загружено: {account.date_created.strftime('%d.%m.%Y %H:%M:%S')}"
     )
+    if account.sha256:
+        info += f"\n#️⃣ SHA-256: {account.sha256[:16]}…"
+
+    if check is None:
+        info += "\n\n🧪 Проверка архива: ⏳ Еще не выполнена"
+        return info
+
+    archive_type = f" ({check.archive_type})" if check.archive_type else ""
+    info += f"\n\n🧪 Проверка архива: {ARCHIVE_STATUS_TEXT.get(check.status, check.status)}{archive_type}"
+    if check.error:
+        info += f"\n⚠️ {check.error}"
+    if check.member_count:
+        info += f"\n📦 Файлов: {check.member_count}, распаковано: {format_size(check.total_size)}"
+        for member in list(members)[:members_limit]:
+            info += f"\n  • {shorten(member.name)} ({format_size(member.size)})"
+        if check.member_count > members_limit:
+            info += f"\n  … и еще {check.member_count - members_limit}"
     return info
 
 
@@ -51,11 +98,30 @@ def format_user_info(user) -> str:
         f"📝 Username: {user.username or 'Не указан'}\n"
         f"💳 TRX кошелек: {wallet}\n"
         f"🔑 {access_status}\n"
+        f"💾 Занято: {format_size(user.storage_bytes or 0)} ({user.storage_files or 0} файлов)\n"
         f"⏰ Дата создания: {user.created_at.strftime('%d.%m.%Y %H:%M:%S')}"
     )
     return info
 
 
+def parse_archive_search(args: str) -> dict:
+    """Разобрать аргументы поиска по архивам: текст и фильтры files>N, files<N, size>N (МБ)"""
+    params = {"query": None, "min_members": None, "max_members": None, "min_size": None}
+    words = []
+    for token in args.split():
+        match = re.fullmatch(r"(files|size)([<>])(\d+)", token.lower())
+        if not match:
+            words.append(token)
+            continue
+        field, op, value = match.group(1), match.group(2), int(match.group(3))
+        if field == "files":
+            params["min_members" if op == ">" else "max_members"] = value
+        elif op == ">":
+            params["min_size"] = value * 1024 * 1024
+    params["query"] = " ".join(words) or None
+    return params
+
+
 def escape_markdown(text: str) -> str:
     """Экранировать спецсимволы для markdown"""
     special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
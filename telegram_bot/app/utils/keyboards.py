@@ -1,7 +1,65 @@
+import functools
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 
+from app.utils.callbacks import (
+    AccountDelete, AccountEdit, AccountLock, AccountSent, AccountUnlock, ApproveUser, ConfirmAddAdmin, Notify,
+    NumbersDone, NumbersReply, ProxyDone, ProxyReply, RejectUser, RevokeAdmin
+)
+
+# ============ РЕЕСТР КЛАВИАТУР ============
+# Обработчики не изменяют клавиатуры после получения, поэтому один объект можно
+# отправлять сколько угодно раз: статические строятся один раз,
+# параметризованные кэшируются с ограничением размера. Не изменяйте возвращаемые объекты.
+
+_static_builders = {}
+_static_markups = {}
+_cached_builders = {}
+
+
+def static_keyboard(builder):
+    """Клавиатура без параметров: строится один раз"""
+    name = builder.__name__
+    _static_builders[name] = builder
+
+    @functools.wraps(builder)
+    def wrapper() -> InlineKeyboardMarkup:
+        markup = _static_markups.get(name)
+        if markup is None:
+            markup = _static_markups[name] = builder()
+        return markup
+
+    return wrapper
+
+
+def cached_keyboard(maxsize: int):
+    """Клавиатура, зависящая от параметров: последние maxsize вариантов хранятся в LRU-кэше"""
+    def decorator(builder):
+        cached = functools.lru_cache(maxsize=maxsize)(builder)
+        _cached_builders[builder.__name__] = cached
+        return cached
+    return decorator
+
+
+def build_static_keyboards():
+    """Построить все статические клавиатуры (вызывается при запуске)"""
+    for name, builder in _static_builders.items():
+        _static_markups[name] = builder()
+    return len(_static_markups)
+
+
+def keyboard_cache_stats() -> dict:
+    """Статистика кэшей параметризованных клавиатур: имя -> (попадания, промахи, размер)"""
+    stats = {}
+    for name, cached in _cached_builders.items():
+        info = cached.cache_info()
+        stats[name] = (info.hits, info.misses, info.currsize)
+    return stats
+
+
 # ============ ПОЛЬЗОВАТЕЛЬСКИЕ КЛАВИАТУРЫ ============
 
+@cached_keyboard(maxsize=2)
 def get_user_main_keyboard(is_admin: bool = False) -> InlineKeyboardMarkup:
     """Главное меню пользователя"""
     buttons = [
@@ -23,6 +81,7 @@ def get_user_main_keyboard(is_admin: bool = False) -> InlineKeyboardMarkup:
 
 # ============ АДМИНСКИЕ КЛАВИАТУРЫ ============
 
+@static_keyboard
 def get_admin_main_keyboard() -> InlineKeyboardMarkup:
     """Главное меню администратора"""
     keyboard = InlineKeyboardMarkup(
@@ -36,6 +95,7 @@ def get_admin_main_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+@static_keyboard
 def get_accounts_view_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для просмотра аккаунтов"""
     keyboard = InlineKeyboardMarkup(
@@ -49,31 +109,34 @@ def get_accounts_view_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+@static_keyboard
 def get_notification_type_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора типа уведомления"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="💰 Зарплата выдана", callback_data="notify_salary")],
-            [InlineKeyboardButton(text="📞 Назначен созвон", callback_data="notify_call")],
-            [InlineKeyboardButton(text="⚠️ Назначен штраф", callback_data="notify_penalty")],
+            [InlineKeyboardButton(text="💰 Зарплата выдана", callback_data=Notify(kind="salary").pack())],
+            [InlineKeyboardButton(text="📞 Назначен созвон", callback_data=Notify(kind="call").pack())],
+            [InlineKeyboardButton(text="⚠️ Назначен штраф", callback_data=Notify(kind="penalty").pack())],
             [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_send_notification")],
         ]
     )
     return keyboard
 
 
+@static_keyboard
 def get_notification_recipient_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора получателя уведомления"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="👤 Конкретному пользователю", callback_data="notify_single")],
-            [InlineKeyboardButton(text="👥 Всем пользователям", callback_data="notify_all")],
+            [InlineKeyboardButton(text="👤 Конкретному пользователю", callback_data=Notify(kind="single").pack())],
+            [InlineKeyboardButton(text="👥 Всем пользователям", callback_data=Notify(kind="all").pack())],
             [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_send_notification")],
         ]
     )
     return keyboard
 
 
+@static_keyboard
 def get_confirm_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения"""
     keyboard = InlineKeyboardMarkup(
@@ -87,32 +150,35 @@ def get_confirm_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+@cached_keyboard(maxsize=256)
 def get_account_actions_keyboard(account_id: int) -> InlineKeyboardMarkup:
     """Клавиатура для управления аккаунтом"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Отправлено", callback_data=f"account_sent_{account_id}")],
+            [InlineKeyboardButton(text="✅ Отправлено", callback_data=AccountSent(account_id=account_id).pack())],
             [InlineKeyboardButton(text="❌ Не отправлено", callback_data=f"account_unsent_{account_id}")],
-            [InlineKeyboardButton(text="🔒 Заблокировать", callback_data=f"account_lock_{account_id}")],
-            [InlineKeyboardButton(text="🔓 Разблокировать", callback_data=f"account_unlock_{account_id}")],
+            [InlineKeyboardButton(text="🔒 Заблокировать", callback_data=AccountLock(account_id=account_id).pack())],
+            [InlineKeyboardButton(text="🔓 Разблокировать", callback_data=AccountUnlock(account_id=account_id).pack())],
         ]
     )
     return keyboard
 
 
+@cached_keyboard(maxsize=256)
 def get_new_user_approval_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """Клавиатура для одобрения/отказа новому пользователю"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Разрешить", callback_data=f"approve_new_user_{user_id}"),
-                InlineKeyboardButton(text="❌ Запретить", callback_data=f"deny_new_user_{user_id}")
+                InlineKeyboardButton(text="✅ Разрешить", callback_data=ApproveUser(user_id=user_id).pack()),
+                InlineKeyboardButton(text="❌ Запретить", callback_data=RejectUser(user_id=user_id).pack())
             ]
         ]
     )
     return keyboard
 
 
+@static_keyboard
 def get_user_management_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для управления пользователями"""
     keyboard = InlineKeyboardMarkup(
@@ -125,3 +191,122 @@ def get_user_management_keyboard() -> InlineKeyboardMarkup:
         ]
     )
     return keyboard
+
+
+@static_keyboard
+def get_notification_menu_keyboard() -> InlineKeyboardMarkup:
+    """Меню выбора уведомления в админ-панели"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="💰 Зарплата выдана", callback_data=Notify(kind="salary").pack())],
+            [InlineKeyboardButton(text="📞 Назначен созвон", callback_data=Notify(kind="call").pack())],
+            [InlineKeyboardButton(text="⚠️ Назначен штраф", callback_data=Notify(kind="penalty").pack())],
+            [InlineKeyboardButton(text="📝 Кастомное уведомление", callback_data=Notify(kind="custom").pack())],
+            [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")],
+        ]
+    )
+
+
+@static_keyboard
+def get_notification_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Подтверждение отправки уведомления"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Да", callback_data="confirm_yes")],
+            [InlineKeyboardButton(text="❌ Нет", callback_data="confirm_no")],
+        ]
+    )
+
+
+@cached_keyboard(maxsize=32)
+def get_admin_panel_keyboard(back_callback: str = None) -> InlineKeyboardMarkup:
+    """Кнопка возврата в админ-панель и, если задана, кнопка «Назад»"""
+    buttons = [[InlineKeyboardButton(text="👨‍💼 Админ панель", callback_data="admin_back")]]
+    if back_callback:
+        buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback)])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@cached_keyboard(maxsize=256)
+def get_back_keyboard(back_callback: str) -> InlineKeyboardMarkup:
+    """Одна кнопка «Назад»"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback)]]
+    )
+
+
+@cached_keyboard(maxsize=256)
+def get_account_edit_keyboard(account_id: int, show_sent: bool, locked: bool,
+                              back_callback: str) -> InlineKeyboardMarkup:
+    """Действия с аккаунтом в админ-панели"""
+    buttons = []
+    if show_sent:
+        buttons.append([InlineKeyboardButton(text="✅ Отправлено", callback_data=AccountSent(account_id=account_id).pack())])
+    if not locked:
+        buttons.append([InlineKeyboardButton(text="🔒 Заблокировать", callback_data=AccountLock(account_id=account_id).pack())])
+    else:
+        buttons.append([InlineKeyboardButton(text="🔓 Разблокировать", callback_data=AccountUnlock(account_id=account_id).pack())])
+    buttons.append([InlineKeyboardButton(text="🗑 Удалить", callback_data=AccountDelete(account_id=account_id).pack())])
+    buttons.append([InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback)])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@cached_keyboard(maxsize=256)
+def get_account_delete_keyboard(account_id: int) -> InlineKeyboardMarkup:
+    """Подтверждение удаления аккаунта"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🗑 Да, удалить", callback_data=AccountDelete(account_id=account_id, confirm=True).pack()
+                ),
+                InlineKeyboardButton(text="❌ Отмена", callback_data=AccountEdit(account_id=account_id).pack()),
+            ]
+        ]
+    )
+
+
+_REQUEST_RESPONSE_CALLBACKS = {
+    "numbers": (NumbersDone, NumbersReply),
+    "proxy": (ProxyDone, ProxyReply),
+}
+
+
+@cached_keyboard(maxsize=256)
+def get_request_response_keyboard(request_type: str, user_id: int) -> InlineKeyboardMarkup:
+    """Кнопки ответа администратора на запрос пользователя (proxy или numbers)"""
+    done, reply = _REQUEST_RESPONSE_CALLBACKS[request_type]
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Пополнил", callback_data=done(user_id=user_id).pack()),
+                InlineKeyboardButton(text="💬 Ответить", callback_data=reply(user_id=user_id).pack())
+            ]
+        ]
+    )
+
+
+@cached_keyboard(maxsize=64)
+def get_confirm_add_admin_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    """Подтверждение назначения пользователя администратором"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Да, добавить админом", callback_data=ConfirmAddAdmin(user_id=user_id).pack()),
+                InlineKeyboardButton(text="❌ Отмена", callback_data="admin_back")
+            ]
+        ]
+    )
+
+
+@cached_keyboard(maxsize=64)
+def get_confirm_revoke_admin_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    """Подтверждение снятия роли администратора"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="🚫 Да, снять права", callback_data=RevokeAdmin(user_id=user_id).pack()),
+                InlineKeyboardButton(text="❌ Отмена", callback_data="admin_back")
+            ]
+        ]
+    )
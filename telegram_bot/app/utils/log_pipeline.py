@@ -0,0 +1,174 @@
+"""
+Неблокирующее логирование.
+
+Обработчики логгеров только кладут запись в ограниченную очередь; в файл (JSON-строки)
+и в stdout пишет отдельный поток. Если диск не успевает и очередь переполнена,
+записи отбрасываются, а не задерживают цикл событий. Файл ротируется по размеру
+и по времени, старые файлы сжимаются gzip.
+"""
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+from config import (
+    LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE
+)
+from app.utils.timing import current_update
+
+CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class UpdateContextFilter(logging.Filter):
+    """Добавить к записи ID обновления и имя обработчика, в котором она сделана"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        stats = current_update()
+        if stats is not None:
+            record.update_id = stats.update_id
+            record.handler = stats.handler
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("update_id", "handler"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполнении очереди отбрасывает запись вместо ожидания"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение и traceback вычисляются здесь: аргументы могут измениться до записи в файл
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+        if self._unreported:
+            notice = logging.LogRecord(
+                "app.utils.log_pipeline", logging.WARNING, __file__, 0,
+                f"Отброшено записей лога: {self._unreported} (очередь переполнена)", None, None
+            )
+            try:
+                self.queue.put_nowait(notice)
+                self._unreported = 0
+            except queue.Full:
+                pass
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Ротация по размеру и по времени; старые файлы сохраняются как <файл>.N.gz"""
+
+    def __init__(self, filename, max_bytes: int, interval: int, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        self.rollover_at = time.time() + self.interval
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) == 0:
+            # Пустой файл не ротируется
+            return
+        super().doRollover()
+
+
+_listener = None
+_queue_handler = None
+
+
+def setup_logging() -> DroppingQueueHandler:
+    """Настроить корневой логгер: очередь в вызывающем потоке, запись в файл и stdout в фоновом"""
+    global _listener, _queue_handler
+
+    file_handler = CompressingRotatingFileHandler(LOG_FILE, LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, LOG_BACKUP_COUNT)
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(UpdateContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        queue_handler.queue, file_handler, console_handler, respect_handler_level=True
+    )
+    _listener.start()
+    _queue_handler = queue_handler
+    atexit.register(stop_logging)
+    return queue_handler
+
+
+def dropped_records() -> int:
+    """Сколько записей отброшено из-за переполнения очереди"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def stop_logging():
+    """Дописать оставшиеся в очереди записи и остановить поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,274 @@
+"""
+Метрики бота в текстовом формате Prometheus.
+
+Счетчики, гистограммы и значения хранятся в памяти процесса и отдаются по HTTP
+на /metrics. Заполняются middleware и событиями движка из timing.py. Значения,
+которые дешевле посчитать в момент запроса (состояния FSM), заполняются коллекторами.
+"""
+import bisect
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+from app.models import AsyncSessionLocal
+from app.utils.db_utils import FSMRepository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def replace(self, values: dict):
+        """Заменить все значения: {значения меток: значение}"""
+        self._values = {tuple(map(str, key)) if isinstance(key, tuple) else (str(key),): value
+                        for key, value in values.items()}
+
+
+class Histogram(_Metric):
+    """Распределение длительностей по корзинам"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]  # корзины, сумма, число
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self) -> int:
+        """Число наблюдений по всем меткам"""
+        return sum(series[2] for series in list(self._values.values()))
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик и коллекторов, вызываемых перед выдачей"""
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Awaitable[None]]):
+        """Зарегистрировать корутину, обновляющую значения перед выдачей"""
+        self._collectors.append(func)
+        return func
+
+    async def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                await collect()
+            except Exception as e:
+                logger.error(f"[ERROR] Ошибка сбора метрик {collect.__name__}: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HANDLER_LATENCY = registry.register(Histogram(
+    "bot_handler_duration_seconds", "Время обработки обновления", ["handler"]
+))
+HANDLER_ERRORS = registry.register(Counter(
+    "bot_handler_errors_total", "Необработанные исключения в обработчиках", ["handler"]
+))
+API_LATENCY = registry.register(Histogram(
+    "bot_api_request_duration_seconds", "Длительность запросов к Telegram Bot API", ["method"]
+))
+API_ERRORS = registry.register(Counter(
+    "bot_api_errors_total", "Ошибки запросов к Telegram Bot API", ["method", "error"]
+))
+DB_QUERIES = registry.register(Counter(
+    "bot_db_queries_total", "Выполненные SQL-запросы", ["operation"]
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "bot_db_query_duration_seconds", "Длительность SQL-запросов", ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+))
+FSM_STATES = registry.register(Gauge(
+    "bot_fsm_states", "Сохраненные состояния FSM по названию", ["state"]
+))
+BROADCAST_PENDING = registry.register(Gauge(
+    "bot_broadcast_pending", "Еще не отправленные сообщения выполняющихся рассылок"
+))
+BROADCAST_MESSAGES = registry.register(Counter(
+    "bot_broadcast_messages_total", "Сообщения рассылок", ["result"]
+))
+BROADCASTS_RUNNING = registry.register(Gauge(
+    "bot_broadcasts_running", "Выполняющиеся рассылки"
+))
+LOOP_LAG = registry.register(Gauge(
+    "bot_event_loop_lag_seconds", "Последняя задержка цикла событий"
+))
+LOOP_LAG_MAX = registry.register(Gauge(
+    "bot_event_loop_lag_max_seconds", "Максимальная задержка цикла событий с запуска"
+))
+LOOP_STALLS = registry.register(Counter(
+    "bot_event_loop_stalls_total", "Блокировки цикла событий дольше порога"
+))
+LOOP_STALL_DURATION = registry.register(Histogram(
+    "bot_event_loop_stall_duration_seconds", "Длительность блокировок цикла событий",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+))
+WEBHOOK_REQUESTS = registry.register(Counter(
+    "bot_webhook_requests_total", "Запросы к вебхуку по результату", ("result",)
+))
+WEBHOOK_PENDING = registry.register(Gauge(
+    "bot_webhook_pending_updates", "Принятые вебхуком обновления, которые еще обрабатываются"
+))
+WORKER_UPDATES = registry.register(Counter(
+    "bot_worker_updates_total", "Обновления, переданные процессам-обработчикам", ("worker",)
+))
+WORKER_QUEUED = registry.register(Gauge(
+    "bot_worker_queued_updates", "Обновления в очереди супервизора к процессу-обработчику", ("worker",)
+))
+WORKER_RESTARTS = registry.register(Counter(
+    "bot_worker_restarts_total", "Перезапуски упавших процессов-обработчиков", ("worker",)
+))
+UPTIME = registry.register(Gauge(
+    "bot_uptime_seconds", "Время работы процесса"
+))
+
+_started = time.monotonic()
+
+
+@registry.collector
+async def _collect_uptime():
+    UPTIME.set(time.monotonic() - _started)
+
+
+@registry.collector
+async def _collect_fsm_states():
+    async with AsyncSessionLocal() as session:
+        counts = await FSMRepository.count_by_state(session)
+    FSM_STATES.replace({state or "": count for state, count in counts.items()})
+
+
+# ============ HTTP-СЕРВЕР ============
+
+class MetricsServer:
+    """HTTP-сервер метрик"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_metrics(self, request):
+        body = await registry.render()
+        return web.Response(text=body, content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        """Запустить сервер (порт 0 - метрики отключены)"""
+        if not self.port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT)
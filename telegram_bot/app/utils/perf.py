@@ -0,0 +1,111 @@
+"""
+Сводка состояния бота для команды /perf.
+
+Все значения берутся из счетчиков в памяти и stat файла БД, без запросов к базе
+и обхода директорий, поэтому сводку можно открывать под нагрузкой. Размер директории
+загрузок берется из последней сверки файлов.
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy.engine import make_url
+
+from config import DATABASE_URL
+from app.utils.admin_tasks import admin_tasks
+from app.utils.archive_checks import archive_checker
+from app.utils.downloads import download_queue
+from app.utils.fsm_storage import fsm_storage
+from app.utils.keyboards import keyboard_cache_stats
+from app.utils.log_pipeline import dropped_records
+from app.utils.metrics import API_ERRORS, API_LATENCY, BROADCASTS_RUNNING, LOOP_LAG_MAX, _started
+from app.utils.reconcile import file_reconciler
+from app.utils.render import render_tracker
+from app.utils.timing import update_timer, percentile
+from app.utils.watchdog import loop_watchdog
+
+
+class PerfSnapshot(NamedTuple):
+    """Состояние бота в момент запроса"""
+    uptime: float
+    updates: int
+    rate: float  # обновлений в секунду за последнюю минуту
+    slow: int
+    p50: float
+    p95: float
+    p99: float
+    in_flight: int
+    api_calls: int
+    api_errors: int
+    admin_tasks: int
+    downloads_pending: int
+    archive_checks: int
+    broadcasts: int
+    asyncio_tasks: int
+    fsm_states: Counter
+    db_size: Optional[int]
+    uploads_size: Optional[int]
+    uploads_checked_at: Optional[datetime]
+    fsm_hits: int
+    fsm_misses: int
+    keyboard_hits: int
+    keyboard_misses: int
+    render_edits: int
+    render_skipped: int
+    loop_stalls: int
+    loop_lag_max: float
+    log_dropped: int
+
+
+def _database_size() -> Optional[int]:
+    """Размер файла SQLite вместе с журналом WAL (None для других СУБД)"""
+    url = make_url(DATABASE_URL)
+    if not url.drivername.startswith("sqlite") or not url.database or url.database == ":memory:":
+        return None
+    total = 0
+    for path in (url.database, url.database + "-wal"):
+        try:
+            total += os.stat(path).st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def collect_perf() -> PerfSnapshot:
+    """Собрать сводку из счетчиков в памяти"""
+    walls = update_timer.all_walls()
+    keyboards = keyboard_cache_stats().values()
+    report = file_reconciler.last_report
+    return PerfSnapshot(
+        uptime=time.monotonic() - _started,
+        updates=update_timer.updates,
+        rate=update_timer.rate(),
+        slow=update_timer.slow,
+        p50=percentile(walls, 50),
+        p95=percentile(walls, 95),
+        p99=percentile(walls, 99),
+        in_flight=len(update_timer.active),
+        api_calls=API_LATENCY.count(),
+        api_errors=int(API_ERRORS.total()),
+        admin_tasks=admin_tasks.running(),
+        downloads_pending=download_queue.pending,
+        archive_checks=archive_checker.pending,
+        broadcasts=int(BROADCASTS_RUNNING.get()),
+        asyncio_tasks=len(asyncio.all_tasks()),
+        fsm_states=fsm_storage.held_states(),
+        db_size=_database_size(),
+        uploads_size=report.total_bytes if report else None,
+        uploads_checked_at=report.finished_at if report else None,
+        fsm_hits=fsm_storage.hits,
+        fsm_misses=fsm_storage.misses,
+        keyboard_hits=sum(hits for hits, _, _ in keyboards),
+        keyboard_misses=sum(misses for _, misses, _ in keyboards),
+        render_edits=render_tracker.edits,
+        render_skipped=render_tracker.skipped,
+        loop_stalls=loop_watchdog.stalls,
+        loop_lag_max=LOOP_LAG_MAX.get(),
+        log_dropped=dropped_records(),
+    )
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from config import USER_QUOTA_MB, USER_QUOTA_FILES
+
+
+class UploadQuota:
+    """Проверка квот пользователя до скачивания файла.
+
+    Занятое место берется из счетчиков в записи пользователя, а архивы, стоящие в очереди,
+    учитываются через резерв в памяти, поэтому проверка не обращается к диску и выполняется за O(1).
+    """
+
+    def __init__(self, max_bytes: int, max_files: int):
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._reserved: dict[int, list] = {}  # user_id -> [байт, файлов]
+
+    def check(self, user, size: int) -> Optional[str]:
+        """Вернуть причину отказа, если файл размера size превысит квоту пользователя"""
+        reserved_bytes, reserved_files = self._reserved.get(user.id, (0, 0))
+        if self.max_files and user.storage_files + reserved_files + 1 > self.max_files:
+            return f"превышен лимит количества файлов ({self.max_files})"
+        if self.max_bytes and user.storage_bytes + reserved_bytes + size > self.max_bytes:
+            return f"превышен лимит места ({self.max_bytes // (1024 * 1024)} МБ)"
+        return None
+
+    def reserve(self, user_id: int, size: int):
+        """Зарезервировать место под файл, ожидающий загрузки"""
+        reserved = self._reserved.setdefault(user_id, [0, 0])
+        reserved[0] += size
+        reserved[1] += 1
+
+    def release(self, user_id: int, size: int):
+        """Снять резерв после загрузки файла или отказа"""
+        reserved = self._reserved.get(user_id)
+        if not reserved:
+            return
+        reserved[0] -= size
+        reserved[1] -= 1
+        if reserved[1] <= 0:
+            del self._reserved[user_id]
+
+
+upload_quota = UploadQuota(USER_QUOTA_MB * 1024 * 1024, USER_QUOTA_FILES)
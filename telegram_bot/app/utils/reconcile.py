@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from config import UPLOAD_DIR, RECONCILE_INTERVAL
+from app.models import AsyncSessionLocal
+from app.utils.db_utils import FileIndexRepository, UserRepository
+from app.utils.storage import BLOB_TMP_DIR
+
+logger = logging.getLogger(__name__)
+
+ROOT_KEY = "."
+# Временные файлы загрузок не считаются потерянными
+TMP_PREFIX = f"{BLOB_TMP_DIR.parent.name}/{BLOB_TMP_DIR.name}/"
+
+
+class ScanResult(NamedTuple):
+    """Изменения индекса по результатам сканирования"""
+    upserts: list  # [(path, is_dir, size, mtime)]
+    removed: list
+    scanned_dirs: int
+    skipped_dirs: int
+    files: int
+    total_bytes: int
+
+
+class ReconcileReport(NamedTuple):
+    """Отчет о сверке диска с БД"""
+    finished_at: datetime
+    duration: float
+    files: int
+    total_bytes: int
+    scanned_dirs: int
+    skipped_dirs: int
+    changed: int
+    removed: int
+    orphan_count: int
+    orphans: list
+    missing_count: int
+    missing: list  # Аккаунты без файла
+
+
+def scan_upload_dir(root: Path, index: dict) -> ScanResult:
+    """Инкрементально просканировать директорию загрузок.
+
+    Директория, mtime которой не изменился, не перечитывается: ее содержимое берется из индекса,
+    но вложенные директории все равно проверяются. Файлы в хранилище не перезаписываются
+    на месте, поэтому mtime директории достаточно, чтобы заметить добавление и удаление.
+    """
+    children = defaultdict(list)
+    for path in index:
+        if path != ROOT_KEY:
+            parent = path.rsplit("/", 1)[0] if "/" in path else ROOT_KEY
+            children[parent].append(path)
+
+    upserts = []
+    seen = set()
+    counters = {"scanned": 0, "skipped": 0, "files": 0, "bytes": 0}
+
+    def walk(rel_dir: str):
+        abs_dir = root if rel_dir == ROOT_KEY else root / rel_dir
+        try:
+            dir_stat = os.stat(abs_dir)
+        except FileNotFoundError:
+            return
+        seen.add(rel_dir)
+
+        previous = index.get(rel_dir)
+        if previous and previous[0] and previous[2] == dir_stat.st_mtime:
+            counters["skipped"] += 1
+            for child in children[rel_dir]:
+                seen.add(child)
+                if index[child][0]:
+                    walk(child)
+                else:
+                    counters["files"] += 1
+                    counters["bytes"] += index[child][1] or 0
+            return
+
+        counters["scanned"] += 1
+        upserts.append((rel_dir, True, 0, dir_stat.st_mtime))
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                child = entry.name if rel_dir == ROOT_KEY else f"{rel_dir}/{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    walk(child)
+                elif entry.is_file(follow_symlinks=False):
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    seen.add(child)
+                    counters["files"] += 1
+                    counters["bytes"] += entry_stat.st_size
+                    previous = index.get(child)
+                    if (not previous or previous[1] != entry_stat.st_size
+                            or previous[2] != entry_stat.st_mtime):
+                        upserts.append((child, False, entry_stat.st_size, entry_stat.st_mtime))
+
+    walk(ROOT_KEY)
+    removed = [path for path in index if path not in seen]
+    return ScanResult(upserts, removed, counters["scanned"], counters["skipped"], counters["files"],
+                      counters["bytes"])
+
+
+class FileReconciler:
+    """Фоновая сверка файлов в UPLOAD_DIR с записями аккаунтов"""
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.last_report: Optional[ReconcileReport] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        """Запустить периодическую сверку"""
+        self._task = asyncio.create_task(self._loop(), name="file-reconciler")
+
+    async def stop(self):
+        """Остановить периодическую сверку"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"[ERROR] Ошибка сверки файлов: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> ReconcileReport:
+        """Выполнить сверку сейчас"""
+        async with self._lock:
+            started = time.monotonic()
+            async with AsyncSessionLocal() as session:
+                index = await FileIndexRepository.load_index(session)
+                # Обход диска выполняется в потоке, чтобы не блокировать event loop
+                scan = await asyncio.to_thread(scan_upload_dir, UPLOAD_DIR, index)
+                await FileIndexRepository.apply_scan(session, scan.upserts, scan.removed)
+                # Исправить возможное расхождение счетчиков места с фактическими аккаунтами
+                await UserRepository.recalculate_storage_usage(session)
+
+                orphan_count, orphans = await FileIndexRepository.get_orphan_files(session, TMP_PREFIX)
+                missing_count, missing = await FileIndexRepository.get_missing_accounts(session)
+
+            report = ReconcileReport(
+                finished_at=datetime.utcnow(), duration=time.monotonic() - started,
+                files=scan.files, total_bytes=scan.total_bytes, scanned_dirs=scan.scanned_dirs, skipped_dirs=scan.skipped_dirs,
+                changed=len(scan.upserts), removed=len(scan.removed),
+                orphan_count=orphan_count, orphans=orphans,
+                missing_count=missing_count, missing=missing,
+            )
+            self.last_report = report
+
+            if orphan_count or missing_count:
+                logger.warning(
+                    f"Сверка файлов: потерянных файлов={orphan_count}, аккаунтов без файла={missing_count}"
+                )
+            logger.info(
+                f"Сверка файлов завершена за {report.duration:.2f} с: файлов={scan.files}, "
+                f"директорий просканировано={scan.scanned_dirs}, пропущено={scan.skipped_dirs}"
+            )
+            return report
+
+
+file_reconciler = FileReconciler(RECONCILE_INTERVAL)
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import Message
+
+from config import RENDER_CACHE_SIZE
+
+
+# Сущности, которые Telegram выделяет в тексте сам, без parse_mode
+_AUTO_ENTITY_TYPES = {"url", "mention", "hashtag", "cashtag", "bot_command", "email", "phone_number"}
+
+
+def _content_hash(text, parse_mode, entities, markup) -> int:
+    markup_json = markup.model_dump_json(exclude_none=True) if markup is not None else ""
+    return hash((text, parse_mode, repr(entities), markup_json))
+
+
+class RenderTracker(BaseRequestMiddleware):
+    """Пропуск редактирования сообщения, если текст и клавиатура не изменились.
+
+    Запоминает отпечаток последнего отправленного содержимого для (chat_id, message_id).
+    Повторное редактирование тем же содержимым не уходит в Telegram, поэтому обработчик
+    сразу переходит к ответу на callback. Ошибка «message is not modified» также гасится здесь.
+    """
+
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+        self._fingerprints: OrderedDict = OrderedDict()
+        self.edits = 0
+        self.skipped = 0
+
+    @staticmethod
+    def _key(method):
+        if getattr(method, "inline_message_id", None):
+            return method.inline_message_id
+        return method.chat_id, method.message_id
+
+    @staticmethod
+    def _fingerprint(method) -> int:
+        parse_mode = method.parse_mode if isinstance(method.parse_mode, str) else None
+        return _content_hash(method.text, parse_mode, method.entities, method.reply_markup)
+
+    def _remember(self, key, fingerprint: int):
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        while len(self._fingerprints) > self.max_messages:
+            self._fingerprints.popitem(last=False)
+
+    def seed(self, message):
+        """Запомнить содержимое сообщения, пришедшего в callback (например, после перезапуска)"""
+        if getattr(message, "text", None) is None:
+            # Нет сообщения или оно недоступно боту
+            return
+        key = (message.chat.id, message.message_id)
+        if key in self._fingerprints:
+            return
+        # Сообщения с форматированием не запоминаются: по тексту нельзя восстановить исходную разметку
+        if message.entities and any(entity.type not in _AUTO_ENTITY_TYPES for entity in message.entities):
+            return
+        self._remember(key, _content_hash(message.text, None, None, message.reply_markup))
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, EditMessageText):
+            return await self._edit(make_request, bot, method)
+
+        if isinstance(method, SendMessage):
+            message = await make_request(bot, method)
+            if isinstance(message, Message):
+                self._remember((message.chat.id, message.message_id), self._fingerprint(method))
+            return message
+
+        # Любое другое изменение сообщения (клавиатура, подпись, удаление) делает отпечаток неактуальным
+        if getattr(method, "message_id", None) is not None and hasattr(method, "chat_id"):
+            self._fingerprints.pop((method.chat_id, method.message_id), None)
+        return await make_request(bot, method)
+
+    async def _edit(self, make_request, bot, method: EditMessageText):
+        key = self._key(method)
+        fingerprint = self._fingerprint(method)
+        if self._fingerprints.get(key) == fingerprint:
+            self._fingerprints.move_to_end(key)
+            self.skipped += 1
+            return True
+
+        self.edits += 1
+        try:
+            result = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if "message is not modified" in e.message:
+                self._remember(key, fingerprint)
+                return True
+            self._fingerprints.pop(key, None)
+            raise
+        self._remember(key, fingerprint)
+        return result
+
+
+render_tracker = RenderTracker(RENDER_CACHE_SIZE)
+
+
+async def render_seed_middleware(handler, event, data):
+    """Запомнить текущее содержимое сообщения, на кнопку которого нажали"""
+    render_tracker.seed(event.message)
+    return await handler(event, data)
@@ -0,0 +1,161 @@
+"""
+Профилирование SQL-запросов по обновлениям.
+
+Слушатель движка считает выполненные запросы в активном профиле (contextvar).
+Профиль открывается на каждое обновление (при SQL_PROFILE=1) или вручную через query_budget.
+Запросы сравниваются по отпечатку - тексту без значений, поэтому одинаковые SELECT-ы
+в цикле по строкам видны как повторы (вероятный N+1).
+"""
+import json
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from config import SQL_PROFILE, SQL_N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Текст запроса без значений: литералы и списки IN заменены на «?»"""
+    text = _SPACE_RE.sub(" ", statement).strip()
+    text = _STRING_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    return _IN_LIST_RE.sub("(?, ...)", text)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Блок кода выполнил больше запросов, чем разрешено"""
+
+
+class QueryProfile:
+    """Запросы, выполненные в одном обновлении или блоке кода"""
+
+    def __init__(self, label: str, parent: Optional["QueryProfile"] = None):
+        self.label = label
+        self.parent = parent
+        self.count = 0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str):
+        key = fingerprint(statement)
+        profile = self
+        while profile is not None:
+            profile.count += 1
+            profile.fingerprints[key] += 1
+            profile = profile.parent
+
+    def repeated(self, threshold: int) -> list:
+        """[(отпечаток, раз)] запросов, выполненных не меньше threshold раз"""
+        return [(key, count) for key, count in self.fingerprints.most_common() if count >= threshold]
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_query_profile", default=None)
+
+
+class SQLProfiler:
+    """Профилировщик SQL-запросов с отчетом по обработчикам"""
+
+    def __init__(self, enabled: bool, n_plus_one_threshold: int):
+        self.enabled = enabled
+        self.threshold = n_plus_one_threshold
+        self._handlers: dict[str, dict] = {}
+
+    def install(self, engine):
+        """Подключить подсчет запросов к движку (без активного профиля почти ничего не стоит)"""
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            profile = _current_profile.get()
+            if profile is not None:
+                profile.record(statement)
+
+    @contextmanager
+    def profile(self, label: str):
+        """Открыть профиль запросов на время блока"""
+        profile = QueryProfile(label, _current_profile.get())
+        token = _current_profile.set(profile)
+        try:
+            yield profile
+        finally:
+            _current_profile.reset(token)
+
+    @contextmanager
+    def profile_update(self, handler: str):
+        """Профиль одного обновления: результат попадает в отчет по обработчикам"""
+        if not self.enabled:
+            yield None
+            return
+        with self.profile(handler) as profile:
+            yield profile
+        self._collect(handler, profile)
+
+    def _collect(self, handler: str, profile: QueryProfile):
+        stats = self._handlers.get(handler)
+        if stats is None:
+            stats = self._handlers[handler] = {
+                "updates": 0, "queries": 0, "max_queries": 0,
+                "fingerprints": Counter(), "n_plus_one": Counter(),
+            }
+        stats["updates"] += 1
+        stats["queries"] += profile.count
+        stats["max_queries"] = max(stats["max_queries"], profile.count)
+        stats["fingerprints"].update(profile.fingerprints)
+        for key, count in profile.repeated(self.threshold):
+            stats["n_plus_one"][key] += 1
+            logger.warning(f"Возможный N+1 в {handler}: {count} раз {key[:200]}")
+
+    def report(self, limit: int = 15) -> list:
+        """[(обработчик, обновлений, запросов в среднем, максимум, [(отпечаток, обновлений с N+1)])]"""
+        rows = []
+        for handler, stats in self._handlers.items():
+            rows.append((
+                handler, stats["updates"], stats["queries"] / stats["updates"], stats["max_queries"],
+                stats["n_plus_one"].most_common(3),
+            ))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:limit]
+
+    def dump(self, path):
+        """Сохранить полный отчет в JSON"""
+        data = {
+            handler: {
+                "updates": stats["updates"],
+                "queries": stats["queries"],
+                "max_queries": stats["max_queries"],
+                "fingerprints": dict(stats["fingerprints"].most_common()),
+                "n_plus_one": dict(stats["n_plus_one"].most_common()),
+            }
+            for handler, stats in self._handlers.items()
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return len(data)
+
+
+sql_profiler = SQLProfiler(SQL_PROFILE, SQL_N_PLUS_ONE_THRESHOLD)
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "блок"):
+    """Проверить, что блок выполнил не больше max_queries запросов.
+
+    with query_budget(3):
+        await AccountRepository.get_accounts_by_user(session, user_id)
+    """
+    with sql_profiler.profile(label) as profile:
+        yield profile
+    if profile.count > max_queries:
+        details = "\n".join(f"  {count} x {key}" for key, count in profile.fingerprints.most_common())
+        raise QueryBudgetExceeded(
+            f"{label}: выполнено {profile.count} запросов при бюджете {max_queries}\n{details}"
+        )
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from config import UPLOAD_DIR, BLOB_DIR
+from app.utils.bundles import open_section
+
+# Временные файлы лежат рядом с blob-ами, чтобы os.replace был атомарным
+BLOB_TMP_DIR = BLOB_DIR / "tmp"
+
+
+class StoredBlob(NamedTuple):
+    """Результат сохранения файла в хранилище"""
+    sha256: str
+    size: int
+    path: str  # Путь относительно UPLOAD_DIR
+    created: bool  # False, если такой файл уже был на диске
+    spare: Optional[Path] = None  # Копия загрузки, если файл уже был: хранится до сохранения в БД (settle_blob)
+
+
+class _HashingWriter:
+    """Файловая обертка, считающая SHA-256 и размер во время записи"""
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> int:
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        return self._file.write(chunk)
+
+    def flush(self):
+        # aiogram вызывает flush после каждого чанка; сбрасываем буфер только при закрытии
+        pass
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def blob_relative_path(sha256: str) -> str:
+    """Получить путь blob-а относительно UPLOAD_DIR (шардирование по первым байтам хэша).
+
+    Путь зависит только от содержимого: один и тот же файл под разными именами хранится один раз.
+    """
+    return f"{BLOB_DIR.name}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def finalize_blob(tmp_path: Path, sha256: str, size: int) -> StoredBlob:
+    """Переместить временный файл в хранилище или оставить его запасной копией, если такой blob уже есть"""
+    relative_path = blob_relative_path(sha256)
+    target = UPLOAD_DIR / relative_path
+
+    if target.exists():
+        # Существующий файл может удалить параллельное удаление аккаунта до сохранения этой загрузки
+        return StoredBlob(sha256, size, relative_path, False, tmp_path)
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target)
+    return StoredBlob(sha256, size, relative_path, True)
+
+
+async def download_to_blob(bot, document) -> StoredBlob:
+    """Скачать документ Telegram в хранилище, посчитав SHA-256 в процессе загрузки"""
+    BLOB_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = BLOB_TMP_DIR / f"{uuid.uuid4().hex}.part"
+
+    try:
+        with open(tmp_path, "wb") as f:
+            writer = _HashingWriter(f)
+            await bot.download(document, destination=writer, seek=False)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    return finalize_blob(tmp_path, writer.hexdigest(), writer.size)
+
+
+def settle_blob(blob: StoredBlob, keep: bool):
+    """После сохранения загрузки в БД: вернуть файл из запасной копии, если его успели удалить.
+
+    keep - запись blob-а ссылается на этот путь в горячем хранилище; иначе копия просто удаляется.
+    """
+    if blob.spare is None:
+        return
+    target = UPLOAD_DIR / blob.path
+    if keep and not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(blob.spare, target)
+    else:
+        blob.spare.unlink(missing_ok=True)
+
+
+def remove_blob_file(relative_path: str):
+    """Удалить файл blob-а с диска"""
+    (UPLOAD_DIR / relative_path).unlink(missing_ok=True)
+
+
+def detach_blob_file(relative_path: str) -> Optional[Path]:
+    """Убрать файл из хранилища во временную директорию (до фиксации удаления в БД).
+
+    Возвращает новый путь или None, если файла нет.
+    """
+    BLOB_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    detached = BLOB_TMP_DIR / f"{uuid.uuid4().hex}.deleted"
+    try:
+        os.replace(UPLOAD_DIR / relative_path, detached)
+    except FileNotFoundError:
+        return None
+    return detached
+
+
+def restore_blob_file(detached: Path, relative_path: str):
+    """Вернуть на место файл, убранный detach_blob_file"""
+    os.replace(detached, UPLOAD_DIR / relative_path)
+
+
+def get_account_relative_path(account) -> str:
+    """Получить путь к файлу аккаунта относительно UPLOAD_DIR"""
+    if account.sha256:
+        return account.file_path
+    # Старые записи хранят только имя файла в папке пользователя
+    return f"{account.user_id}/{account.file_path}"
+
+
+def resolve_account_path(account) -> Path:
+    """Получить путь к файлу аккаунта в горячем хранилище"""
+    return UPLOAD_DIR / get_account_relative_path(account)
+
+
+class FileLocation(NamedTuple):
+    """Где лежит содержимое файла аккаунта"""
+    path: Path
+    offset: Optional[int] = None  # Смещение внутри пакета холодного хранилища
+    size: Optional[int] = None
+
+    @property
+    def is_cold(self) -> bool:
+        return self.offset is not None
+
+    def open(self):
+        """Открыть файл на чтение независимо от уровня хранилища"""
+        if self.is_cold:
+            return open_section(self.path, self.offset, self.size)
+        return open(self.path, "rb")
+
+
+def locate_account_file(account, blob=None) -> FileLocation:
+    """Определить расположение файла аккаунта (горячее или холодное хранилище).
+
+    blob - запись Blob аккаунта; если она упакована, файл читается из пакета по смещению.
+    """
+    if blob is not None and blob.bundle:
+        return FileLocation(UPLOAD_DIR / blob.bundle, blob.bundle_offset, blob.size)
+    return FileLocation(resolve_account_path(account))
+
+
+def get_account_filename(account) -> str:
+    """Получить исходное имя файла аккаунта"""
+    return account.file_name or Path(account.file_path).name
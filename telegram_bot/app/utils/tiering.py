@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from config import UPLOAD_DIR, BLOB_DIR, COLD_DIR, TIERING_INTERVAL
+from app.models import AsyncSessionLocal
+from app.utils.bundles import write_bundle
+from app.utils.db_utils import AccountRepository, BlobRepository, FileIndexRepository
+from app.utils.helpers import get_current_month
+from app.utils.storage import blob_relative_path, get_account_relative_path
+
+logger = logging.getLogger(__name__)
+
+
+class TieringReport(NamedTuple):
+    """Итог упаковки архивов в холодное хранилище"""
+    months: list
+    packed: int  # Файлов перенесено из горячего хранилища
+    removed_files: int
+
+
+def bundle_prefix(month: str) -> str:
+    """Префикс пути пакетов месяца относительно UPLOAD_DIR"""
+    return f"{COLD_DIR.name}/{month}-"
+
+
+def _remove_hot_files(relative_paths) -> int:
+    """Удалить упакованные файлы и опустевшие директории шардов и пользователей"""
+    removed = 0
+    for relative_path in relative_paths:
+        path = UPLOAD_DIR / relative_path
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            continue
+        parent = path.parent
+        while parent not in (UPLOAD_DIR, BLOB_DIR, COLD_DIR):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+    return removed
+
+
+class ColdStorageTiering:
+    """Упаковка архивов закрытых месяцев в один пакет на месяц.
+
+    Пакет неизменяем: при повторной упаковке месяца создается новый пакет с живыми
+    файлами старого и новыми файлами, после коммита старый пакет удаляется.
+    Содержимое blob-а с заполненным bundle всегда читается из пакета.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.last_report: Optional[TieringReport] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        """Запустить периодическую упаковку"""
+        self._task = asyncio.create_task(self._loop(), name="cold-storage-tiering")
+
+    async def stop(self):
+        """Остановить периодическую упаковку"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"[ERROR] Ошибка упаковки архивов: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> TieringReport:
+        """Упаковать все закрытые месяцы, в которых есть файлы в горячем хранилище"""
+        async with self._lock:
+            current_month = get_current_month()
+            async with AsyncSessionLocal() as session:
+                blobs_by_month = defaultdict(list)
+                for blob, month in await BlobRepository.get_tiering_candidates(session, current_month):
+                    blobs_by_month[month].append(blob)
+                legacy_by_month = defaultdict(list)
+                for account in await AccountRepository.get_legacy_accounts_before(session, current_month):
+                    legacy_by_month[account.month].append(account)
+
+            months = sorted(set(blobs_by_month) | set(legacy_by_month))
+            packed = removed = 0
+            for month in months:
+                month_packed, month_removed = await self._pack_month(
+                    month, blobs_by_month[month], legacy_by_month[month]
+                )
+                packed += month_packed
+                removed += month_removed
+
+            report = TieringReport(months, packed, removed)
+            self.last_report = report
+            if months:
+                logger.info(
+                    f"Упаковка в холодное хранилище: месяцев={len(months)}, файлов={packed}, "
+                    f"удалено из горячего хранилища={removed}"
+                )
+            return report
+
+    async def _pack_month(self, month: str, blobs: list, legacy_accounts: list):
+        bundle = f"{bundle_prefix(month)}{uuid.uuid4().hex[:8]}.bundle"
+
+        async with AsyncSessionLocal() as session:
+            packed_blobs = await BlobRepository.get_by_bundle_prefix(session, bundle_prefix(month))
+            old_bundles = sorted({blob.bundle for blob in packed_blobs})
+
+            # Живые файлы старых пакетов, затем новые blob-ы и старые файлы аккаунтов
+            items = [("packed", blob, (UPLOAD_DIR / blob.bundle, blob.bundle_offset, blob.size))
+                     for blob in packed_blobs]
+            items += [("hot", blob, UPLOAD_DIR / blob.path) for blob in blobs]
+            items += [("legacy", account, UPLOAD_DIR / get_account_relative_path(account))
+                      for account in legacy_accounts]
+
+            # Отсутствующие файлы пропускаются, их покажет сверка диска с БД
+            items = await asyncio.to_thread(
+                lambda: [item for item in items if item[0] == "packed" or item[2].is_file()]
+            )
+            if all(kind == "packed" for kind, _, _ in items):
+                return 0, 0
+
+            placed = await asyncio.to_thread(write_bundle, UPLOAD_DIR / bundle, [src for _, _, src in items])
+            bundle_size = (UPLOAD_DIR / bundle).stat().st_size
+
+            hot_paths = []
+            try:
+                for (kind, item, _), (offset, size, sha256) in zip(items, placed):
+                    if kind == "legacy":
+                        account = await AccountRepository.get_account_by_id(session, item.id)
+                        if not account or account.sha256:
+                            continue
+                        hot_paths.append(get_account_relative_path(account))
+                        blob = await AccountRepository.attach_blob(
+                            session, account, sha256, blob_relative_path(sha256), size
+                        )
+                        # Такое содержимое могло уже лежать в горячем хранилище
+                        hot_paths.append(blob.path)
+                    elif sha256 != item.sha256:
+                        if kind == "packed":
+                            raise ValueError(f"Пакет {item.bundle} поврежден: {item.sha256}")
+                        # Поврежденный файл остается на месте, копия в пакете не используется
+                        logger.warning(f"Содержимое blob-а {item.sha256} не совпадает с его хэшем, пропускаю")
+                        continue
+                    elif kind == "hot":
+                        hot_paths.append(item.path)
+                    await BlobRepository.move_to_bundle(session, sha256, bundle, offset)
+                await FileIndexRepository.remove_paths(session, hot_paths + old_bundles)
+                await FileIndexRepository.add_file(session, bundle, bundle_size)
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                (UPLOAD_DIR / bundle).unlink(missing_ok=True)
+                raise
+
+        removed = await asyncio.to_thread(_remove_hot_files, hot_paths + old_bundles)
+        logger.info(f"Месяц {month} упакован в {bundle}: файлов={len(items)}")
+        return sum(kind != "packed" for kind, _, _ in items), removed
+
+
+cold_storage = ColdStorageTiering(TIERING_INTERVAL)
@@ -0,0 +1,198 @@
+"""
+Замер времени обработки обновлений.
+
+Middleware обработчиков и запросов к Bot API и события движка SQLAlchemy пишут метрики
+и накапливают время текущего обновления: сколько ушло на БД и на Telegram.
+Медленные обновления логируются, скользящие перцентили по обработчикам доступны администратору.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from aiogram.types import CallbackQuery
+from sqlalchemy import event
+
+from config import SLOW_UPDATE_MS, TIMING_WINDOW
+from app.utils.callbacks import callback_table
+from app.utils.sql_profiler import sql_profiler
+from app.utils.metrics import (
+    HANDLER_LATENCY, HANDLER_ERRORS, API_LATENCY, API_ERRORS, DB_QUERIES, DB_QUERY_DURATION
+)
+
+logger = logging.getLogger(__name__)
+
+RATE_WINDOW = 60  # Секунд для расчета обновлений в секунду
+
+
+@dataclass
+class UpdateStats:
+    """Время, потраченное на одно обновление"""
+    handler: str
+    update_id: Optional[int] = None
+    db_time: float = 0.0
+    db_queries: int = 0
+    api_time: float = 0.0
+    api_calls: int = 0
+    finished: bool = False
+
+
+_current_update: ContextVar[Optional[UpdateStats]] = ContextVar("current_update", default=None)
+
+
+def current_update() -> Optional[UpdateStats]:
+    """Замер обрабатываемого обновления (None вне обработчика и в фоновых задачах после ответа)"""
+    stats = _current_update.get()
+    return stats if stats is not None and not stats.finished else None
+
+
+def handler_name(handler, event) -> str:
+    """Имя обработчика; для таблицы callback-запросов - имя найденного в ней обработчика"""
+    callback = handler.callback if handler is not None else None
+    if callback == callback_table.dispatch:
+        return callback_table.handler_name(getattr(event, "data", None))
+    return getattr(callback, "__name__", "unknown")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Перцентиль q (0..100) отсортированного списка"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class UpdateTimer:
+    """Middleware замера обработчиков сообщений и callback-запросов.
+
+    Хранит последние window замеров (общее время, БД, API) на обработчик и пишет
+    в лог обновления дольше slow_threshold_ms.
+    """
+
+    def __init__(self, window: int, slow_threshold_ms: int):
+        self.window = window
+        self.slow_threshold = slow_threshold_ms / 1000
+        self._samples: dict[str, deque] = {}
+        self.active: dict[asyncio.Task, UpdateStats] = {}  # обрабатываемые сейчас обновления
+        self._per_second: deque = deque(maxlen=RATE_WINDOW + 1)  # [секунда, обновлений]
+        self.updates = 0
+        self.slow = 0
+
+    async def __call__(self, handler, event, data):
+        update = data.get("event_update")
+        stats = UpdateStats(handler_name(data.get("handler"), event), update.update_id if update else None)
+        token = _current_update.set(stats)
+        task = asyncio.current_task()
+        self.active[task] = stats
+        started = time.perf_counter()
+        try:
+            with sql_profiler.profile_update(stats.handler):
+                return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=stats.handler)
+            raise
+        finally:
+            wall = time.perf_counter() - started
+            stats.finished = True
+            _current_update.reset(token)
+            self.active.pop(task, None)
+            HANDLER_LATENCY.observe(wall, handler=stats.handler)
+            self._record(stats, wall, event)
+
+    def _record(self, stats: UpdateStats, wall: float, event):
+        self.updates += 1
+        second = int(time.monotonic())
+        if self._per_second and self._per_second[-1][0] == second:
+            self._per_second[-1][1] += 1
+        else:
+            self._per_second.append([second, 1])
+        samples = self._samples.get(stats.handler)
+        if samples is None:
+            samples = self._samples[stats.handler] = deque(maxlen=self.window)
+        samples.append((wall, stats.db_time, stats.api_time))
+
+        if wall < self.slow_threshold:
+            return
+        self.slow += 1
+        prefix = ""
+        if isinstance(event, CallbackQuery) and event.data:
+            prefix = f", кнопка {event.data.partition(':')[0][:32]}"
+        logger.warning(
+            f"Медленное обновление {'?' if stats.update_id is None else stats.update_id}: {stats.handler}{prefix}, "
+            f"{wall * 1000:.0f} мс (БД {stats.db_time * 1000:.0f} мс, запросов {stats.db_queries}; "
+            f"API {stats.api_time * 1000:.0f} мс, вызовов {stats.api_calls})"
+        )
+
+    def summary(self) -> list:
+        """[(обработчик, замеров, p50, p95, p99, среднее БД, среднее API)] в секундах, медленные первыми"""
+        rows = []
+        for name, samples in list(self._samples.items()):
+            walls = sorted(sample[0] for sample in samples)
+            count = len(samples)
+            rows.append((
+                name, count,
+                percentile(walls, 50), percentile(walls, 95), percentile(walls, 99),
+                sum(sample[1] for sample in samples) / count,
+                sum(sample[2] for sample in samples) / count,
+            ))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def rate(self, seconds: int = RATE_WINDOW) -> float:
+        """Обновлений в секунду за последние seconds секунд"""
+        since = int(time.monotonic()) - seconds
+        return sum(count for second, count in list(self._per_second) if second >= since) / seconds
+
+    def all_walls(self) -> list:
+        """Все хранящиеся замеры общего времени, отсортированные"""
+        return sorted(sample[0] for samples in list(self._samples.values()) for sample in samples)
+
+
+update_timer = UpdateTimer(TIMING_WINDOW, SLOW_UPDATE_MS)
+
+
+async def api_timing_middleware(make_request, bot, method):
+    """Длительность и ошибки запросов к Telegram Bot API"""
+    name = type(method).__name__
+    started = time.perf_counter()
+    try:
+        return await make_request(bot, method)
+    except Exception as e:
+        API_ERRORS.inc(method=name, error=type(e).__name__)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        API_LATENCY.observe(duration, method=name)
+        stats = current_update()
+        if stats is not None:
+            stats.api_time += duration
+            stats.api_calls += 1
+
+
+def instrument_engine(engine):
+    """Считать SQL-запросы и их длительность"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("timing_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["timing_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERIES.inc(operation=operation)
+        DB_QUERY_DURATION.observe(duration, operation=operation)
+        stats = current_update()
+        if stats is not None:
+            stats.db_time += duration
+            stats.db_queries += 1
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("timing_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
@@ -0,0 +1,110 @@
+"""
+Сторож цикла событий.
+
+Задача в цикле событий отмечается каждые interval секунд и записывает задержку цикла.
+Отдельный поток проверяет отметки: если цикл не отвечает дольше порога, значит синхронный
+код (архивация, работа с диском) блокирует всех пользователей - поток снимает стек
+потока цикла событий, пока блокировка еще идет, и пишет его в лог вместе с задачей
+и обновлением, в котором она случилась.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from config import LOOP_LAG_INTERVAL, LOOP_STALL_THRESHOLD_MS
+from app.utils.metrics import LOOP_LAG, LOOP_LAG_MAX, LOOP_STALLS, LOOP_STALL_DURATION
+from app.utils.timing import update_timer
+
+logger = logging.getLogger(__name__)
+
+STACK_DEPTH = 25
+
+
+class LoopWatchdog:
+    """Замер задержки цикла событий и поиск блокирующих вызовов"""
+
+    def __init__(self, interval: float, threshold_ms: int):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.stalls = 0
+        self.max_stall = 0.0
+        self.last_stall: Optional[str] = None  # стек последней блокировки
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._next_beat = 0.0
+        self._reported_beat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Запустить отметки в цикле событий и поток-сторож"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._next_beat = time.monotonic() + self.interval
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._next_beat = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._next_beat)
+            LOOP_LAG.set(lag)
+            if lag > LOOP_LAG_MAX.get():
+                LOOP_LAG_MAX.set(lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                self.max_stall = max(self.max_stall, lag)
+                LOOP_STALLS.inc()
+                LOOP_STALL_DURATION.observe(lag)
+                logger.warning(f"Цикл событий был заблокирован {lag * 1000:.0f} мс")
+
+    def _watch(self):
+        check_every = min(self.interval, self.threshold) / 2
+        while not self._stopping.wait(check_every):
+            beat = self._next_beat
+            overdue = time.monotonic() - beat
+            if overdue >= self.threshold and beat != self._reported_beat:
+                self._reported_beat = beat
+                self._report(overdue)
+
+    def _report(self, overdue: float):
+        """Снять стек потока цикла событий во время блокировки"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame, limit=STACK_DEPTH))
+        del frame
+
+        task = asyncio.current_task(self._loop)
+        where = "вне задачи"
+        if task is not None:
+            where = f"задача {task.get_name()} ({task.get_coro().__qualname__})"
+            stats = update_timer.active.get(task)
+            if stats is not None:
+                where += f", обновление {stats.update_id}: {stats.handler}"
+
+        self.last_stall = f"{where}\n{stack}"
+        logger.warning(
+            f"Цикл событий заблокирован дольше {overdue * 1000:.0f} мс, {where}. Стек:\n{stack}"
+        )
+
+
+loop_watchdog = LoopWatchdog(LOOP_LAG_INTERVAL, LOOP_STALL_THRESHOLD_MS)
@@ -0,0 +1,162 @@
+"""
+Прием обновлений через вебхук.
+
+Встроенный aiohttp-сервер проверяет секрет из заголовка X-Telegram-Bot-Api-Secret-Token,
+сразу отвечает Telegram и обрабатывает обновление в фоновой задаче. Одновременно
+обрабатывается не больше concurrency обновлений; если принятых, но не обработанных
+больше max_pending, сервер отвечает 503 и Telegram повторит доставку позже.
+
+/healthz - процесс жив и цикл событий отвечает, /readyz - вебхук установлен
+и сервер принимает обновления (для балансировщика).
+"""
+import asyncio
+import logging
+import secrets
+import time
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiohttp import web
+
+from config import (
+    UPDATE_CONCURRENCY, WEBHOOK_DRAIN_TIMEOUT, WEBHOOK_HOST, WEBHOOK_MAX_PENDING, WEBHOOK_PATH,
+    WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL,
+)
+from app.utils.metrics import LOOP_LAG, WEBHOOK_PENDING, WEBHOOK_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """HTTP-сервер вебхука с проверками состояния"""
+
+    def __init__(self, host: str, port: int, path: str, url: str, secret: str,
+                 concurrency: int, max_pending: int, drain_timeout: float):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.url = url
+        # Секрет генерируется при запуске, если не задан: вебхук все равно переустанавливается
+        self.secret = secret or secrets.token_urlsafe(32)
+        self.max_pending = max_pending
+        self.drain_timeout = drain_timeout
+        self.accepted = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set = set()
+        self._runner: Optional[web.AppRunner] = None
+        self._bot: Optional[Bot] = None
+        self._dp: Optional[Dispatcher] = None
+        self._ready = False
+        self._started = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    # ============ ОБРАБОТКА ============
+
+    async def _process(self, update: dict):
+        async with self._semaphore:
+            try:
+                result = await self._dp.feed_raw_update(self._bot, update)
+                # Обработчик может вернуть метод Bot API вместо вызова (ответ в вебхук не используется)
+                if isinstance(result, TelegramMethod):
+                    await self._dp.silent_call_request(self._bot, result)
+            except Exception as e:
+                # Ошибки обработчиков диспетчер уже записал в лог со стеком
+                logger.error(f"Ошибка обработки обновления {update.get('update_id')} из вебхука: {e}")
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        WEBHOOK_PENDING.set(len(self._tasks))
+
+    async def _handle_update(self, request: web.Request):
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            WEBHOOK_REQUESTS.inc(result="unauthorized")
+            return web.Response(status=401, text="Unauthorized")
+        if not self._ready or len(self._tasks) >= self.max_pending:
+            self.rejected += 1
+            WEBHOOK_REQUESTS.inc(result="overloaded")
+            return web.Response(status=503, text="Overloaded", headers={"Retry-After": "1"})
+        try:
+            update = await request.json(loads=self._bot.session.json_loads)
+        except ValueError:
+            update = None
+        if not isinstance(update, dict) or "update_id" not in update:
+            WEBHOOK_REQUESTS.inc(result="bad_request")
+            return web.Response(status=400, text="Bad Request")
+
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        WEBHOOK_PENDING.set(len(self._tasks))
+        self.accepted += 1
+        WEBHOOK_REQUESTS.inc(result="accepted")
+        return web.json_response({})
+
+    # ============ ПРОВЕРКИ СОСТОЯНИЯ ============
+
+    async def _handle_health(self, request: web.Request):
+        return web.json_response({
+            "status": "ok", "uptime": round(time.monotonic() - self._started, 1),
+            "loop_lag": round(LOOP_LAG.get(), 4),
+        })
+
+    async def _handle_ready(self, request: web.Request):
+        ready = self._ready and len(self._tasks) < self.max_pending
+        return web.json_response(
+            {"ready": ready, "pending": len(self._tasks), "max_pending": self.max_pending},
+            status=200 if ready else 503,
+        )
+
+    # ============ ЗАПУСК ============
+
+    async def start(self, bot: Bot, dp: Dispatcher, allowed_updates: list = None):
+        """Запустить сервер и установить вебхук в Telegram (allowed_updates - по умолчанию из роутеров dp)"""
+        if not self.url:
+            raise ValueError("WEBHOOK_URL не установлен в файле .env")
+        self._bot = bot
+        self._dp = dp
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/healthz", self._handle_health)
+        app.router.add_get("/readyz", self._handle_ready)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+        await bot.set_webhook(
+            url=self.url + self.path, secret_token=self.secret,
+            allowed_updates=allowed_updates if allowed_updates is not None else dp.resolve_used_update_types(),
+            max_connections=max(1, min(UPDATE_CONCURRENCY, 100)),
+        )
+        self._ready = True
+        logger.info(f"Вебхук {self.url}{self.path} слушается на {self.host}:{self.port}")
+
+    async def stop(self):
+        """Перестать принимать обновления и дождаться обработки уже принятых.
+
+        Вебхук в Telegram не удаляется: пока бот перезапускается, обновления копятся на стороне Telegram.
+        """
+        self._ready = False
+        if self._tasks:
+            logger.info(f"Ожидание обработки {len(self._tasks)} обновлений из вебхука...")
+            done, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Не дождались обработки {len(pending)} обновлений из вебхука")
+                await asyncio.gather(*pending, return_exceptions=True)
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+webhook_server = WebhookServer(
+    WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET,
+    UPDATE_CONCURRENCY, WEBHOOK_MAX_PENDING, WEBHOOK_DRAIN_TIMEOUT,
+)
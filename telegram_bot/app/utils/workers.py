@@ -0,0 +1,274 @@
+"""
+Несколько процессов-обработчиков с распределением обновлений по пользователям.
+
+Супервизор получает обновления (long polling или вебхук) и пересылает каждое
+в процесс с номером from_user.id % workers по локальному TCP-соединению, по одной
+JSON-строке на обновление. Обновления одного пользователя всегда попадают в один
+процесс, поэтому состояния FSM и другие кэши в памяти процесса остаются согласованными.
+Каждый процесс запускает роутеры со своим движком БД. Упавший процесс перезапускается,
+его обновления ждут в очереди супервизора; при переполнении очереди супервизор
+перестает принимать обновления, пока процесс не разберет очередь.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from config import (
+    LOG_FILE, METRICS_PORT, UPDATE_CONCURRENCY, WORKER_INDEX, WORKER_QUEUE_SIZE, WORKER_SECRET,
+    WORKER_STOP_TIMEOUT, WORKER_SUPERVISOR, WORKERS,
+)
+from app.utils.metrics import WORKER_QUEUED, WORKER_RESTARTS, WORKER_UPDATES, registry
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина строки с обновлением
+LINE_LIMIT = 16 * 1024 * 1024
+
+
+class WorkerLink:
+    """Процесс-обработчик на стороне супервизора: очередь обновлений, соединение и процесс"""
+
+    def __init__(self, index: int, queue_size: int):
+        self.index = index
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.connected = asyncio.Event()
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+
+class WorkerPool:
+    """Супервизор: запускает процессы-обработчики и распределяет между ними обновления.
+
+    Регистрируется как outer middleware обновлений диспетчера супервизора: обновление
+    пересылается в процесс пользователя, а обработчики супервизора не вызываются.
+    """
+
+    def __init__(self, count: int, queue_size: int, stop_timeout: float):
+        self.count = count
+        self.queue_size = queue_size
+        self.stop_timeout = stop_timeout
+        self._secret = secrets.token_urlsafe(32)
+        self._links: list[WorkerLink] = []
+        self._tasks: list[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._address = ""
+        self._stopping = False
+
+    @property
+    def links(self) -> list:
+        return list(self._links)
+
+    # ============ РАСПРЕДЕЛЕНИЕ ============
+
+    def shard(self, update: Update, data: dict) -> int:
+        """Номер процесса для обновления: по пользователю, иначе по чату"""
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        key = user.id if user else chat.id if chat else update.update_id
+        return key % self.count
+
+    async def __call__(self, handler, event: Update, data: dict):
+        link = self._links[self.shard(event, data)]
+        line = event.model_dump_json(exclude_unset=True, by_alias=True).encode() + b"\n"
+        # Полная очередь задерживает прием обновлений, пока процесс не освободится
+        await link.queue.put(line)
+        WORKER_UPDATES.inc(worker=link.index)
+
+    async def _send(self, link: WorkerLink):
+        while True:
+            line = await link.queue.get()
+            while True:
+                await link.connected.wait()
+                writer = link.writer
+                try:
+                    writer.write(line)
+                    await writer.drain()
+                    break
+                except ConnectionError:
+                    self._disconnected(link, writer)
+            link.queue.task_done()
+
+    # ============ СОЕДИНЕНИЯ ============
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), 10))
+            link = self._links[int(hello["worker"])]
+            if not secrets.compare_digest(str(hello.get("secret", "")), self._secret):
+                raise ValueError("неверный секрет")
+        except (asyncio.TimeoutError, ValueError, KeyError, IndexError, TypeError) as e:
+            logger.warning(f"Отклонено подключение к супервизору: {e}")
+            writer.close()
+            return
+
+        if link.writer is not None:
+            link.writer.close()
+        link.writer = writer
+        link.connected.set()
+        logger.info(f"Процесс-обработчик {link.index} подключен")
+        try:
+            # Обработчик ничего не отправляет после приветствия: чтение ждет закрытия соединения
+            await reader.read()
+        except ConnectionError:
+            pass
+        self._disconnected(link, writer)
+
+    def _disconnected(self, link: WorkerLink, writer: asyncio.StreamWriter):
+        if link.writer is writer:
+            link.writer = None
+            link.connected.clear()
+        writer.close()
+
+    # ============ ПРОЦЕССЫ ============
+
+    def _environment(self, index: int) -> dict:
+        """Окружение процесса-обработчика: свой лог и порт метрик"""
+        log_file = Path(LOG_FILE)
+        return dict(
+            os.environ,
+            WORKER_INDEX=str(index),
+            WORKER_SUPERVISOR=self._address,
+            WORKER_SECRET=self._secret,
+            LOG_FILE=str(log_file.with_name(f"{log_file.stem}-worker{index}{log_file.suffix}")),
+            METRICS_PORT=str(METRICS_PORT + 1 + index) if METRICS_PORT else "0",
+        )
+
+    async def _supervise(self, link: WorkerLink, script: Path):
+        """Запустить процесс и перезапускать его после падения"""
+        # Ctrl+C в терминале получает только супервизор, процессы останавливает он сам
+        options = {"start_new_session": True} if os.name == "posix" else {}
+        failures = 0
+        while not self._stopping:
+            started = time.monotonic()
+            link.process = await asyncio.create_subprocess_exec(
+                sys.executable, str(script), env=self._environment(link.index), **options
+            )
+            logger.info(f"Процесс-обработчик {link.index} запущен: pid={link.process.pid}")
+            code = await link.process.wait()
+            if self._stopping:
+                break
+            failures = failures + 1 if time.monotonic() - started < 60 else 1
+            delay = min(2 ** (failures - 1), 30)
+            link.restarts += 1
+            WORKER_RESTARTS.inc(worker=link.index)
+            logger.error(f"Процесс-обработчик {link.index} завершился с кодом {code}, перезапуск через {delay} с")
+            await asyncio.sleep(delay)
+
+    async def start(self, script: Path):
+        """Запустить count процессов-обработчиков (script - точка входа бота)"""
+        self._server = await asyncio.start_server(self._handle_connection, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self._address = f"{host}:{port}"
+        self._links = [WorkerLink(index, self.queue_size) for index in range(self.count)]
+        for link in self._links:
+            self._tasks.append(asyncio.create_task(self._send(link), name=f"worker-{link.index}-send"))
+            self._tasks.append(asyncio.create_task(self._supervise(link, script), name=f"worker-{link.index}"))
+        logger.info(f"Супервизор запущен: процессов-обработчиков={self.count}, адрес={self._address}")
+
+    async def stop(self):
+        """Переслать принятые обновления, закрыть соединения и дождаться завершения процессов"""
+        self._stopping = True
+        if not self._links:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(link.queue.join() for link in self._links)), self.stop_timeout
+            )
+        except asyncio.TimeoutError:
+            lost = sum(link.queue.qsize() for link in self._links)
+            logger.warning(f"Не переслано процессам-обработчикам обновлений: {lost}")
+
+        # Закрытое соединение - сигнал обработчику доделать начатое и завершиться
+        for link in self._links:
+            if link.writer is not None:
+                link.writer.close()
+        for link in self._links:
+            process = link.process
+            if process is None or process.returncode is not None:
+                continue
+            try:
+                await asyncio.wait_for(process.wait(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Процесс-обработчик {link.index} не завершился, остановка принудительно")
+                process.kill()
+                await process.wait()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._server.close()
+        self._links = []
+
+
+class WorkerClient:
+    """Процесс-обработчик: получает обновления от супервизора и передает их диспетчеру"""
+
+    def __init__(self, address: str, index: int, secret: str, concurrency: int):
+        self.address = address
+        self.index = index
+        self.secret = secret
+        self.processed = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set = set()
+
+    async def _process(self, bot: Bot, dp: Dispatcher, line: bytes):
+        try:
+            update = json.loads(line)
+            result = await dp.feed_raw_update(bot, update)
+            if isinstance(result, TelegramMethod):
+                await dp.silent_call_request(bot, result)
+        except Exception as e:
+            # Ошибки обработчиков диспетчер уже записал в лог со стеком
+            logger.error(f"Ошибка обработки обновления от супервизора: {e}")
+        finally:
+            self.processed += 1
+            self._semaphore.release()
+
+    async def run(self, bot: Bot, dp: Dispatcher):
+        """Обрабатывать обновления, пока супервизор не закроет соединение"""
+        host, port = self.address.rsplit(":", 1)
+        reader, writer = await asyncio.open_connection(host, int(port), limit=LINE_LIMIT)
+        writer.write(json.dumps({"worker": self.index, "secret": self.secret}).encode() + b"\n")
+        await writer.drain()
+        logger.info(f"Процесс-обработчик {self.index} подключен к супервизору {self.address}")
+        try:
+            while True:
+                # Пока заняты все места, обновления не читаются и копятся в очереди супервизора
+                await self._semaphore.acquire()
+                try:
+                    line = await reader.readline()
+                except ConnectionError:
+                    line = b""
+                if not line:
+                    self._semaphore.release()
+                    break
+                task = asyncio.create_task(self._process(bot, dp, line))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            writer.close()
+            if self._tasks:
+                logger.info(f"Ожидание обработки {len(self._tasks)} обновлений...")
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Супервизор закрыл соединение, обработано обновлений: {self.processed}")
+
+
+@registry.collector
+async def _collect_worker_queues():
+    WORKER_QUEUED.replace({link.index: link.queue.qsize() for link in worker_pool.links})
+
+
+worker_pool = WorkerPool(WORKERS, WORKER_QUEUE_SIZE, WORKER_STOP_TIMEOUT)
+worker_client = WorkerClient(WORKER_SUPERVISOR, WORKER_INDEX, WORKER_SECRET, UPDATE_CONCURRENCY)
@@ -0,0 +1,151 @@
+"""
+Генератор синтетической базы данных для бенчмарков.
+
+Создает схему бота в отдельном файле SQLite и массово загружает пользователей,
+аккаунты (по месяцам, статусам, с blob-ами и старыми файлами вне хранилища) и журнал действий.
+Данные детерминированы: одинаковые параметры и seed дают одинаковую базу.
+
+Запуск из каталога telegram_bot:
+    python -m benchmarks.dataset --path /tmp/bench.db --users 10000 --accounts 200000 --logs 500000
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BATCH_SIZE = 5000
+
+LOG_ACTIONS = (
+    "user_start", "account_uploaded", "user_access_denied_attempt", "account_sent", "account_locked",
+    "account_unlocked", "notification_sent_salary", "notification_sent_call", "user_allowed",
+)
+
+
+def configure_environment(db_path: Path):
+    """Направить бота на базу db_path: config.py читает окружение при импорте"""
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["ADMIN_IDS"] = ""
+    os.environ.setdefault("BOT_TOKEN", "1:bench")
+
+
+def recent_months(count: int, until: datetime = None) -> list:
+    """Месяцы YYYY-MM, от старых к новым, заканчивая текущим"""
+    until = until or datetime.utcnow()
+    year, month = until.year, until.month
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months[::-1]
+
+
+def _random_moment(rng: random.Random, month: str) -> datetime:
+    start = datetime.strptime(month, "%Y-%m")
+    return start + timedelta(seconds=rng.randrange(28 * 24 * 3600))
+
+
+async def _insert(conn, table, rows: list):
+    for start in range(0, len(rows), BATCH_SIZE):
+        await conn.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+async def generate(users: int, accounts: int, logs: int, months: int = 12, seed: int = 0) -> dict:
+    """Заполнить базу из DATABASE_URL; возвращает параметры набора данных"""
+    from app.models import Account, Blob, Log, User, engine, init_db
+
+    await init_db()
+    rng = random.Random(seed)
+    month_list = recent_months(months)
+    started = time.perf_counter()
+
+    user_rows = []
+    for i in range(users):
+        user_rows.append({
+            "id": i + 1, "tg_id": 100_000 + i, "username": f"user{i}" if rng.random() < 0.8 else None,
+            "access": rng.random() < 0.9, "is_admin": i < 3, "storage_bytes": 0, "storage_files": 0,
+            "created_at": _random_moment(rng, month_list[0]),
+        })
+
+    account_rows = []
+    blob_rows = {}
+    for i in range(accounts):
+        user = user_rows[rng.randrange(users)]
+        # Нагрузка растет к текущему месяцу
+        month = month_list[min(int(rng.triangular(0, months, months)), months - 1)]
+        size = rng.randint(50_000, 20_000_000)
+        roll = rng.random()
+        sha256 = None
+        file_path = f"{user['id']}/{month}/account_{i}.zip"
+        if roll < 0.9:
+            # 5% загрузок повторяют уже загруженный файл
+            content_id = rng.randrange(i) if i and rng.random() < 0.05 else i
+            sha256 = hashlib.sha256(str(content_id).encode()).hexdigest()
+            file_path = f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+            blob = blob_rows.get(sha256)
+            if blob is None:
+                blob = blob_rows[sha256] = {"sha256": sha256, "path": file_path, "size": size, "ref_count": 0}
+            blob["ref_count"] += 1
+            size = blob["size"]
+        user["storage_bytes"] += size
+        user["storage_files"] += 1
+        account_rows.append({
+            "id": i + 1, "user_id": user["id"], "month": month, "file_path": file_path,
+            "file_name": f"account_{i}.zip", "sha256": sha256,
+            "sent": rng.random() < 0.7, "locked": rng.random() < 0.05,
+            "date_created": _random_moment(rng, month),
+        })
+
+    log_rows = []
+    for i in range(logs):
+        log_rows.append({
+            "action_type": rng.choice(LOG_ACTIONS), "user_id": rng.randint(1, users) if users else None,
+            "admin_id": rng.randint(1, min(3, users)) if users and rng.random() < 0.3 else None,
+            "description": f"Synthetic event {i}",
+            "timestamp": _random_moment(rng, rng.choice(month_list)),
+        })
+
+    async with engine.begin() as conn:
+        await _insert(conn, User.__table__, user_rows)
+        await _insert(conn, Blob.__table__, list(blob_rows.values()))
+        await _insert(conn, Account.__table__, account_rows)
+        await _insert(conn, Log.__table__, log_rows)
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+    return {
+        "users": users, "accounts": accounts, "blobs": len(blob_rows), "logs": logs,
+        "months": months, "seed": seed, "load_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетическая база данных бота")
+    parser.add_argument("--path", type=Path, required=True, help="файл SQLite (будет перезаписан)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--accounts", type=int, default=200_000)
+    parser.add_argument("--logs", type=int, default=500_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    args.path.unlink(missing_ok=True)
+    configure_environment(args.path)
+
+    async def run():
+        from app.models import engine
+        try:
+            return await generate(args.users, args.accounts, args.logs, args.months, args.seed)
+        finally:
+            await engine.dispose()
+
+    info = asyncio.run(run())
+    print(f"{args.path}: пользователей {info['users']}, аккаунтов {info['accounts']} "
+          f"(blob-ов {info['blobs']}), записей журнала {info['logs']} за {info['load_seconds']} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов без сети.
+
+HTTP-сервер отвечает на методы, которые использует бот (getMe, getUpdates, sendMessage,
+editMessageText, answerCallbackQuery, sendDocument, getFile и скачивание файла), и по запросу
+вносит задержку, ответы 429 с retry_after и ошибки сервера. Обновления для getUpdates
+ставятся в очередь через управляющий API или встроенным генератором нагрузки.
+
+Запуск из каталога telegram_bot:
+    python -m benchmarks.fake_telegram --port 8081 --latency 30 --rate-limit 0.05 --load-users 100 --load-rate 20
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=1:stub ADMIN_IDS=1000 python main.py
+
+Управляющий API:
+    GET  /control/stats     вызовы по методам, выданные 429 и ошибки
+    POST /control/faults    {"latency_ms": 50, "rate_limit": 0.1, "retry_after": 2, "failure": 0.01}
+    POST /control/updates   [{"message": {...}}, ...] - update_id назначается сервером
+"""
+import argparse
+import asyncio
+import io
+import random
+import time
+import zipfile
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"}
+
+
+class Faults:
+    """Параметры внесения задержки и ошибок (меняются на лету)"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, rate_limit: float = 0,
+                 retry_after: int = 1, failure: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit  # доля запросов, получающих 429
+        self.retry_after = retry_after
+        self.failure = failure  # доля запросов, получающих 500
+
+    def update(self, values: dict):
+        for key in ("latency_ms", "jitter_ms", "rate_limit", "retry_after", "failure"):
+            if key in values:
+                setattr(self, key, type(getattr(self, key))(values[key]))
+
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in ("latency_ms", "jitter_ms", "rate_limit", "retry_after", "failure")}
+
+
+class FakeTelegram:
+    """Состояние поддельного Bot API: очередь обновлений, файлы, счетчики"""
+
+    def __init__(self, faults: Faults, file_size: int):
+        self.faults = faults
+        self.file_size = file_size
+        self.calls: Counter = Counter()
+        self.rate_limited = 0
+        self.failed = 0
+        self.downloads = 0
+        self._updates: list = []
+        self._next_update_id = 1
+        self._new_updates = asyncio.Event()
+        self._next_message_id = 1
+        self._files: dict[str, bytes] = {}
+
+    # ============ ОБНОВЛЕНИЯ ============
+
+    def push_update(self, update: dict) -> int:
+        update = dict(update, update_id=self._next_update_id)
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._new_updates.set()
+        return update["update_id"]
+
+    async def _get_updates(self, params: dict):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # Подтвержденные обновления (меньше offset) больше не выдаются
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    # ============ ФАЙЛЫ ============
+
+    def document(self, file_id: str, file_name: str) -> dict:
+        """Документ для входящего сообщения; содержимое - ZIP-архив размером около file_size"""
+        if file_id not in self._files:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+                archive.writestr("cookies.txt", random.randbytes(self.file_size))
+            self._files[file_id] = buffer.getvalue()
+        return {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name,
+                "mime_type": "application/zip", "file_size": len(self._files[file_id])}
+
+    # ============ МЕТОДЫ ============
+
+    def _message(self, chat_id, **fields) -> dict:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return {"message_id": message_id, "date": int(time.time()), "from": BOT_USER,
+                "chat": {"id": int(chat_id), "type": "private"}, **fields}
+
+    async def call(self, method: str, params: dict):
+        """Результат метода; на неизвестные методы отвечает true"""
+        if method == "getme":
+            return BOT_USER
+        if method == "getupdates":
+            return await self._get_updates(params)
+        if method == "sendmessage":
+            return self._message(params["chat_id"], text=params.get("text", ""))
+        if method == "editmessagetext":
+            if params.get("inline_message_id"):
+                return True
+            message = self._message(params["chat_id"], text=params.get("text", ""))
+            message["message_id"] = int(params["message_id"])
+            return message
+        if method == "senddocument":
+            file_id = f"sent-{self._next_message_id}"
+            return self._message(params["chat_id"], document={"file_id": file_id, "file_unique_id": file_id})
+        if method == "getfile":
+            file_id = params["file_id"]
+            size = len(self._files.get(file_id, b""))
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": size, "file_path": f"documents/{file_id}"}
+        if method == "getwebhookinfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": len(self._updates)}
+        return True
+
+    def file_content(self, file_id: str) -> Optional[bytes]:
+        return self._files.get(file_id)
+
+
+# ============ HTTP ============
+
+def _error(status: int, description: str, parameters: dict = None) -> web.Response:
+    body = {"ok": False, "error_code": status, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=status)
+
+
+def create_app(telegram: FakeTelegram) -> web.Application:
+    faults = telegram.faults
+
+    async def handle_method(request: web.Request):
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        params.update(request.query)
+        telegram.calls[method] += 1
+
+        if method != "getupdates":
+            if faults.latency_ms or faults.jitter_ms:
+                await asyncio.sleep((faults.latency_ms + random.uniform(0, faults.jitter_ms)) / 1000)
+            if faults.rate_limit and random.random() < faults.rate_limit:
+                telegram.rate_limited += 1
+                return _error(429, f"Too Many Requests: retry after {faults.retry_after}",
+                              {"retry_after": faults.retry_after})
+            if faults.failure and random.random() < faults.failure:
+                telegram.failed += 1
+                return _error(500, "Internal Server Error")
+
+        try:
+            result = await telegram.call(method, params)
+        except (KeyError, ValueError) as e:
+            return _error(400, f"Bad Request: {e}")
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_file(request: web.Request):
+        file_id = request.match_info["path"].rsplit("/", 1)[-1]
+        content = telegram.file_content(file_id)
+        if content is None:
+            return _error(404, "Not Found: file not found")
+        telegram.downloads += 1
+        return web.Response(body=content, content_type="application/octet-stream")
+
+    async def handle_stats(request: web.Request):
+        return web.json_response({
+            "calls": dict(telegram.calls.most_common()), "rate_limited": telegram.rate_limited,
+            "failed": telegram.failed, "downloads": telegram.downloads, "faults": faults.as_dict(),
+        })
+
+    async def handle_faults(request: web.Request):
+        faults.update(await request.json())
+        return web.json_response(faults.as_dict())
+
+    async def handle_updates(request: web.Request):
+        updates = await request.json()
+        ids = [telegram.push_update(update) for update in (updates if isinstance(updates, list) else [updates])]
+        return web.json_response({"update_ids": ids})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_route("*", "/bot{token}/{method}", handle_method)
+    app.router.add_get("/file/bot{token}/{path:.+}", handle_file)
+    app.router.add_get("/control/stats", handle_stats)
+    app.router.add_post("/control/faults", handle_faults)
+    app.router.add_post("/control/updates", handle_updates)
+    return app
+
+
+# ============ ГЕНЕРАТОР НАГРУЗКИ ============
+
+async def generate_load(telegram: FakeTelegram, users: int, rate: float, upload_share: float, base_id: int):
+    """Пользователи по кругу отправляют /start, часть - архив (кнопка отправки и документ)"""
+    interval = 1 / rate
+    number = 0
+    while True:
+        user_id = base_id + number % users
+        user = {"id": user_id, "is_bot": False, "first_name": "load", "username": f"load{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        now = int(time.time())
+        if random.random() < upload_share:
+            telegram.push_update({"callback_query": {
+                "id": str(number), "from": user, "chat_instance": str(user_id), "data": "user_send_account",
+                "message": {"message_id": number + 1, "date": now, "chat": chat, "from": BOT_USER, "text": "Меню"},
+            }})
+            document = telegram.document(f"load-{number}", f"account_{number}.zip")
+            telegram.push_update({"message": {
+                "message_id": number + 1, "date": now, "chat": chat, "from": user, "document": document,
+            }})
+        else:
+            telegram.push_update({"message": {
+                "message_id": number + 1, "date": now, "chat": chat, "from": user, "text": "/start",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            }})
+        number += 1
+        await asyncio.sleep(interval)
+
+
+async def serve(args):
+    faults = Faults(args.latency, args.jitter, args.rate_limit, args.retry_after, args.failure)
+    telegram = FakeTelegram(faults, args.file_size * 1024)
+    runner = web.AppRunner(create_app(telegram), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Поддельный Bot API: http://{args.host}:{args.port} (TELEGRAM_API_URL), "
+          f"статистика: http://{args.host}:{args.port}/control/stats")
+
+    load = None
+    if args.load_users:
+        load = asyncio.create_task(
+            generate_load(telegram, args.load_users, args.load_rate, args.upload_share, args.load_base_id)
+        )
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"вызовов {sum(telegram.calls.values())}, 429: {telegram.rate_limited}, "
+                  f"ошибок {telegram.failed}, в очереди обновлений {len(telegram._updates)}")
+    finally:
+        if load:
+            load.cancel()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0, help="задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0, help="случайная добавка к задержке, мс")
+    parser.add_argument("--rate-limit", type=float, default=0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after в ответах 429, с")
+    parser.add_argument("--failure", type=float, default=0, help="доля ответов 500")
+    parser.add_argument("--file-size", type=int, default=256, help="размер архивов для скачивания, КБ")
+    parser.add_argument("--load-users", type=int, default=0, help="пользователей генератора нагрузки (0 - выключен)")
+    parser.add_argument("--load-rate", type=float, default=10, help="обновлений в секунду")
+    parser.add_argument("--upload-share", type=float, default=0.2, help="доля пользователей, отправляющих архив")
+    parser.add_argument("--load-base-id", type=int, default=10_000, help="Telegram ID первого пользователя")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Микробенчмарк клавиатур: построение на каждый клик против реестра.
+
+Запуск из каталога telegram_bot:
+    BOT_TOKEN=1:x python -m benchmarks.keyboards
+"""
+import timeit
+import tracemalloc
+
+from app.utils import keyboards
+
+CASES = [
+    ("get_user_main_keyboard", (True,)),
+    ("get_admin_main_keyboard", ()),
+    ("get_notification_menu_keyboard", ()),
+    ("get_account_edit_keyboard", (42, True, False, "accounts_user_7")),
+    ("get_request_response_keyboard", ("proxy", 7)),
+]
+
+NUMBER = 20000
+
+
+def allocated_per_call(func, args, calls: int = 1000) -> float:
+    """Средний объем памяти (байт), выделяемой за один вызов"""
+    func(*args)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [func(*args) for _ in range(calls)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del results
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename")) / calls
+
+
+def main():
+    keyboards.build_static_keyboards()
+    print(f"{'клавиатура':34} {'без кэша, мкс':>14} {'реестр, мкс':>12} {'байт/вызов':>18}")
+    for name, args in CASES:
+        cached = getattr(keyboards, name)
+        uncached = cached.__wrapped__
+        raw_time = timeit.timeit(lambda: uncached(*args), number=NUMBER) / NUMBER * 1e6
+        cached_time = timeit.timeit(lambda: cached(*args), number=NUMBER) / NUMBER * 1e6
+        raw_alloc = allocated_per_call(uncached, args)
+        cached_alloc = allocated_per_call(cached, args)
+        print(f"{name:34} {raw_time:14.2f} {cached_time:12.3f} {raw_alloc:8.0f} -> {cached_alloc:5.0f}")
+    print()
+    for name, (hits, misses, size) in keyboards.keyboard_cache_stats().items():
+        print(f"{name}: попаданий={hits}, промахов={misses}, размер={size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Проверка бюджетов SQL-запросов экранов администратора.
+
+Обновления проходят через настоящий Dispatcher (как в benchmarks.replay) внутри
+query_budget: экран, число запросов которого растет вместе с числом пользователей
+или аккаунтов (N+1), превышает бюджет. Бюджет включает запросы middleware.
+Код выхода 1, если хотя бы один экран превысил бюджет.
+
+Запуск из каталога telegram_bot:
+    python -m benchmarks.query_budgets --users 50
+"""
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.replay import ADMIN_BASE_ID, UpdateFactory, configure_environment, make_fake_session, seed_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Проверка бюджетов SQL-запросов обработчиков")
+    parser.add_argument("--users", type=int, default=50, help="пользователей с неотправленными аккаунтами")
+    parser.add_argument("--accounts", type=int, default=3, help="аккаунтов на пользователя")
+    return parser.parse_args()
+
+
+def build_cases(factory: UpdateFactory, account_ids: dict, user_ids: dict) -> list:
+    """[(экран, бюджет запросов, обновление)]; бюджет не зависит от размера базы"""
+    from app.utils.callbacks import AccountEdit, UnsentAccount, UnsentUser, UserAccounts
+
+    tg_id, accounts = next(iter(account_ids.items()))
+    return [
+        ("accounts_unsent", 3, factory.callback(ADMIN_BASE_ID, "accounts_unsent")),
+        ("unsent_user", 3, factory.callback(ADMIN_BASE_ID, UnsentUser(user_id=user_ids[tg_id]).pack())),
+        ("unsent_account", 5, factory.callback(ADMIN_BASE_ID, UnsentAccount(account_id=accounts[0]).pack())),
+        ("accounts_user", 2, factory.callback(ADMIN_BASE_ID, UserAccounts(user_id=user_ids[tg_id]).pack())),
+        ("account_edit", 4, factory.callback(ADMIN_BASE_ID, AccountEdit(account_id=accounts[0]).pack())),
+    ]
+
+
+async def check(args) -> bool:
+    import main as bot_main
+    from sqlalchemy import select, update
+    from app.models import Account, AsyncSessionLocal, User, engine
+    from app.utils.fsm_storage import fsm_storage
+    from app.utils.sql_profiler import QueryBudgetExceeded, query_budget
+
+    args.admins = 1
+    account_ids = await seed_database(args)
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(Account).values(sent=False))
+        await session.commit()
+        result = await session.execute(select(User.tg_id, User.id))
+        user_ids = dict(result.all())
+
+    bot = bot_main.create_bot(session=make_fake_session(0))
+    dp = bot_main.create_dispatcher()
+    passed = True
+    try:
+        for name, budget, update_ in build_cases(UpdateFactory(), account_ids, user_ids):
+            try:
+                with query_budget(budget, name) as profile:
+                    await dp.feed_update(bot, update_)
+            except QueryBudgetExceeded as e:
+                passed = False
+                print(f"❌ {e}")
+            else:
+                print(f"✅ {name:16} {profile.count:3} из {budget}")
+    finally:
+        await fsm_storage.close()
+        await engine.dispose()
+    return passed
+
+
+def main():
+    args = parse_args()
+    work_dir = Path(tempfile.mkdtemp(prefix="bot-budgets-"))
+    configure_environment(work_dir, admins=1)
+    try:
+        passed = asyncio.run(check(args))
+    finally:
+        from app.utils.log_pipeline import stop_logging
+        stop_logging()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
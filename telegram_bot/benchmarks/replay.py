@@ -0,0 +1,305 @@
+"""
+Бенчмарк обработки обновлений без Telegram.
+
+Настоящий Dispatcher из main.py (middleware, роутеры, хранилище FSM) получает
+синтетические обновления, а запросы к Bot API уходят в поддельную сессию, которая
+отвечает с заданной задержкой и считает вызовы. База данных создается во временной
+директории и удаляется после запуска.
+
+Сценарии:
+    start       /start от новых пользователей (отказ и уведомление администраторов) и от одобренных
+    uploads     кнопка «Отправить аккаунт» и документ (скачивание архивов не выполняется)
+    status      карточка аккаунта и смена статуса администраторами
+    broadcast   рассылка уведомления всем пользователям, по одной на администратора
+
+Запуск из каталога telegram_bot:
+    python -m benchmarks.replay --users 200 --latency 20 --concurrency 20
+    python -m benchmarks.replay --scenario status --latency 0
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+SCENARIOS = ("start", "uploads", "status", "broadcast")
+
+BOT_ID = 1
+ADMIN_BASE_ID = 1000
+USER_BASE_ID = 10_000
+NEW_USER_BASE_ID = 500_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Воспроизведение обновлений через диспетчер бота")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--users", type=int, default=200, help="одобренных пользователей")
+    parser.add_argument("--admins", type=int, default=3, help="администраторов (и одновременных рассылок)")
+    parser.add_argument("--accounts", type=int, default=5, help="аккаунтов на пользователя")
+    parser.add_argument("--latency", type=float, default=20, help="задержка ответа Bot API, мс")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="пользователей, обрабатываемых одновременно (по умолчанию UPDATE_CONCURRENCY)")
+    return parser.parse_args()
+
+
+def configure_environment(work_dir: Path, admins: int):
+    """Переменные окружения читаются config.py при импорте, поэтому задаются до импорта бота"""
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{work_dir / 'replay.db'}"
+    os.environ["ADMIN_IDS"] = ",".join(str(ADMIN_BASE_ID + i) for i in range(admins))
+    os.environ["LOG_FILE"] = str(work_dir / "bot.log")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("BOT_TOKEN", f"{BOT_ID}:replay")
+
+
+# ============ ПОДДЕЛЬНЫЙ TELEGRAM ============
+
+def make_fake_session(latency: float):
+    """Сессия Bot API, которая отвечает через latency секунд и считает вызовы по методам"""
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import GetFile, SendDocument, SendMessage
+    from aiogram.types import Chat, File, Message
+
+    class FakeSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.calls: Counter = Counter()
+            self._message_id = 0
+
+        async def make_request(self, bot, method, timeout=None):
+            self.calls[type(method).__name__] += 1
+            if latency:
+                await asyncio.sleep(latency)
+            if isinstance(method, (SendMessage, SendDocument)):
+                self._message_id += 1
+                return Message(
+                    message_id=self._message_id, date=datetime.now(),
+                    chat=Chat(id=method.chat_id, type="private"), text=getattr(method, "text", None)
+                )
+            if isinstance(method, GetFile):
+                return File(file_id=method.file_id, file_unique_id=method.file_id, file_path=f"documents/{method.file_id}")
+            return True
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return FakeSession()
+
+
+# ============ ОБНОВЛЕНИЯ ============
+
+class UpdateFactory:
+    """Синтетические обновления с последовательными ID"""
+
+    def __init__(self):
+        self._update_id = 0
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    def message(self, user_id: int, text: str = None, document=None):
+        from aiogram.types import Chat, Message, Update, User
+        update_id = self._next_id()
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=User(id=user_id, is_bot=False, first_name="replay", username=f"user{user_id}"),
+            text=text, document=document,
+        ))
+
+    def callback(self, user_id: int, data: str, text: str = "Выберите действие:"):
+        from aiogram.types import CallbackQuery, Chat, Message, Update, User
+        update_id = self._next_id()
+        user = User(id=user_id, is_bot=False, first_name="replay", username=f"user{user_id}")
+        return Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id), from_user=user, chat_instance=str(user_id), data=data,
+            message=Message(
+                message_id=update_id, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+                from_user=User(id=BOT_ID, is_bot=True, first_name="bot"), text=text,
+            ),
+        ))
+
+    def document(self, user_id: int, number: int):
+        from aiogram.types import Document
+        file_id = f"doc-{user_id}-{number}"
+        document = Document(file_id=file_id, file_unique_id=file_id, file_name=f"account_{number}.zip",
+                            file_size=512 * 1024)
+        return self.message(user_id, document=document)
+
+
+def build_scenario(name: str, factory: UpdateFactory, args, account_ids: dict) -> list:
+    """Последовательности обновлений по пользователям: внутри последовательности порядок сохраняется"""
+    from app.utils.callbacks import AccountEdit, AccountLock, AccountStatus, AccountUnlock, Notify
+
+    users = [USER_BASE_ID + i for i in range(args.users)]
+    admins = [ADMIN_BASE_ID + i for i in range(args.admins)]
+
+    if name == "start":
+        new_users = [NEW_USER_BASE_ID + i for i in range(args.users)]
+        return [[factory.message(user_id, "/start")] for pair in zip(users, new_users) for user_id in pair]
+
+    if name == "uploads":
+        return [
+            [factory.callback(user_id, "user_send_account"), factory.document(user_id, 1)]
+            for user_id in users
+        ]
+
+    if name == "status":
+        sequences = [[] for _ in admins]
+        for index, account_id in enumerate(account_id for ids in account_ids.values() for account_id in ids):
+            admin_id = admins[index % len(admins)]
+            sequences[index % len(admins)].extend([
+                factory.callback(admin_id, AccountEdit(account_id=account_id).pack()),
+                factory.callback(admin_id, AccountStatus(account_id=account_id, status="unverified").pack()),
+                factory.callback(admin_id, AccountLock(account_id=account_id).pack()),
+                factory.callback(admin_id, AccountUnlock(account_id=account_id).pack()),
+            ])
+        return sequences
+
+    if name == "broadcast":
+        return [
+            [
+                factory.callback(admin_id, Notify(kind="salary").pack()),
+                factory.callback(admin_id, Notify(kind="all").pack()),
+                factory.callback(admin_id, "confirm_yes"),
+            ]
+            for admin_id in admins
+        ]
+
+    raise ValueError(name)
+
+
+# ============ ЗАПУСК ============
+
+async def seed_database(args) -> dict:
+    """Одобренные пользователи с аккаунтами: tg_id -> [ID аккаунтов]"""
+    from app.models import AsyncSessionLocal, init_db
+    from app.utils.admins import admin_roles
+    from app.utils.db_utils import AccountRepository, UserRepository
+
+    await init_db()
+    await admin_roles.load()
+    account_ids = {}
+    async with AsyncSessionLocal() as session:
+        for i in range(args.users):
+            tg_id = USER_BASE_ID + i
+            user = await UserRepository.get_or_create_user(session, tg_id, f"user{tg_id}")
+            await UserRepository.update_user_access(session, user.id, True)
+            files = [
+                (f"blobs/replay/{tg_id}_{n}.zip", f"account_{n}.zip", f"{tg_id:032x}{n:032x}", 1024)
+                for n in range(args.accounts)
+            ]
+            accounts = await AccountRepository.create_accounts(session, user.id, "2025-01", files)
+            account_ids[tg_id] = [account.id for account in accounts]
+    return account_ids
+
+
+async def replay_scenario(dp, bot, fake, sequences: list, concurrency: int) -> dict:
+    """Прогнать последовательности обновлений и дождаться фоновых задач"""
+    from app.utils.admin_tasks import admin_tasks
+    from app.utils.metrics import DB_QUERIES
+    from app.utils.timing import percentile
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    calls_before = sum(fake.calls.values())
+    queries_before = DB_QUERIES.total()
+
+    async def run_sequence(updates):
+        async with semaphore:
+            for update in updates:
+                started = time.perf_counter()
+                await dp.feed_update(bot, update)
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_sequence(updates) for updates in sequences))
+    # Рассылки и выгрузки администраторов продолжаются в фоне после ответа на callback
+    while admin_tasks.running():
+        await asyncio.sleep(0.01)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    updates = len(latencies)
+    return {
+        "updates": updates,
+        "wall": wall,
+        "rate": updates / wall if wall else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+        "api_calls": (sum(fake.calls.values()) - calls_before) / max(updates, 1),
+        "db_queries": (DB_QUERIES.total() - queries_before) / max(updates, 1),
+    }
+
+
+async def discard_upload(bot, job):
+    """Скачивание не выполняется: замеряется прием архива обработчиком, а не запись на диск"""
+    from app.utils.quotas import upload_quota
+    for document in job.documents:
+        upload_quota.release(job.user_id, document.file_size or 0)
+
+
+async def replay(args):
+    import main as bot_main
+    from app.models import engine
+    from app.utils.downloads import download_queue
+    from app.utils.fsm_storage import fsm_storage
+    from app.utils.timing import instrument_engine
+    from config import UPDATE_CONCURRENCY
+
+    if args.concurrency is None:
+        args.concurrency = UPDATE_CONCURRENCY
+    instrument_engine(engine)
+    account_ids = await seed_database(args)
+
+    fake = make_fake_session(args.latency / 1000)
+    bot = bot_main.create_bot(session=fake)
+    dp = bot_main.create_dispatcher()
+    download_queue.start(bot, discard_upload)
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    factory = UpdateFactory()
+    print(f"Пользователей {args.users}, администраторов {args.admins}, задержка API {args.latency:g} мс, "
+          f"одновременно {args.concurrency}\n")
+    print(f"{'сценарий':10} {'обновл.':>8} {'обн/с':>8} {'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8} "
+          f"{'max, мс':>8} {'API/обн':>8} {'SQL/обн':>8}")
+    try:
+        for name in scenarios:
+            sequences = build_scenario(name, factory, args, account_ids)
+            result = await replay_scenario(dp, bot, fake, sequences, args.concurrency)
+            print(f"{name:10} {result['updates']:8} {result['rate']:8.1f} {result['p50'] * 1000:8.1f} "
+                  f"{result['p95'] * 1000:8.1f} {result['p99'] * 1000:8.1f} {result['max'] * 1000:8.1f} "
+                  f"{result['api_calls']:8.2f} {result['db_queries']:8.2f}")
+    finally:
+        await download_queue.stop()
+        await fsm_storage.close()
+        await engine.dispose()
+
+    print("\nВызовы Bot API:")
+    for method, count in fake.calls.most_common():
+        print(f"  {method}: {count}")
+
+
+def main():
+    args = parse_args()
+    work_dir = Path(tempfile.mkdtemp(prefix="bot-replay-"))
+    configure_environment(work_dir, args.admins)
+    try:
+        asyncio.run(replay(args))
+    finally:
+        from app.utils.log_pipeline import stop_logging
+        stop_logging()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
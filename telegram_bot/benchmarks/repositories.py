@@ -0,0 +1,289 @@
+"""
+Микробенчмарк репозиториев на синтетической базе.
+
+Каждый метод UserRepository, AccountRepository и LogRepository вызывается repeat раз
+в отдельной сессии; замеряется время вызова, число SQL-запросов и план каждого запроса
+(EXPLAIN QUERY PLAN). Полный просмотр таблицы или индекса (SCAN) отмечается отдельно.
+Результаты сохраняются в JSON, предыдущий запуск можно передать в --compare.
+
+База создается генератором benchmarks.dataset во временной директории
+или берется готовая (--db, будет изменена методами записи).
+
+Запуск из каталога telegram_bot:
+    python -m benchmarks.repositories --users 10000 --accounts 200000 --logs 500000
+    python -m benchmarks.repositories --compare data/benchmarks/repositories-20250101-120000.json
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.dataset import configure_environment, generate, recent_months
+
+REPOSITORIES = ("UserRepository", "AccountRepository", "LogRepository")
+OUTPUT_DIR = Path(__file__).resolve().parent.parent / "data" / "benchmarks"
+
+
+def build_cases(info: dict) -> dict:
+    """Аргументы вызова по имени метода: async (session, i) -> кортеж аргументов после session.
+
+    i - номер повтора; методы, удаляющие строки, получают каждый раз новую строку.
+    """
+    from sqlalchemy import select
+    from app.models import Account
+
+    users, accounts = info["users"], info["accounts"]
+    months = recent_months(info["months"])
+
+    def user_id(i):
+        return i % users + 1
+
+    def account_id(i):
+        return i % accounts + 1
+
+    async def legacy_account(session, i):
+        account = await session.scalar(select(Account).where(Account.sha256.is_(None)).offset(i).limit(1))
+        return (account, f"{i:064x}", f"blobs/bench/{i}.zip", 1024)
+
+    async def account_hashes(session, i):
+        result = await session.execute(select(Account.sha256).where(Account.sha256.is_not(None)).offset(i * 50).limit(50))
+        return (set(result.scalars().all()),)
+
+    def const(*args):
+        async def factory(session, i):
+            return args
+        return factory
+
+    def by_index(make):
+        async def factory(session, i):
+            return make(i)
+        return factory
+
+    return {
+        "UserRepository.get_or_create_user": by_index(lambda i: (100_000 + i % users, None)),
+        "UserRepository.get_user_by_tg_id": by_index(lambda i: (100_000 + i % users,)),
+        "UserRepository.get_user_by_id": by_index(lambda i: (user_id(i),)),
+        "UserRepository.update_user_access": by_index(lambda i: (user_id(i), True)),
+        "UserRepository.update_user_wallet": by_index(lambda i: (100_000 + i % users, f"T{i:033d}")),
+        "UserRepository.get_all_users": const(),
+        "UserRepository.get_admin_tg_ids": const(),
+        "UserRepository.set_admin": const(1, True),
+        "UserRepository.count_users_by_access": const(),
+        "UserRepository.get_allowed_tg_ids": const(),
+        # Удаляются пользователи с конца, чтобы не трогать используемых другими методами
+        "UserRepository.delete_user": by_index(lambda i: (users - i,)),
+        "UserRepository.add_storage_usage": by_index(lambda i: (user_id(i), 1024, 1)),
+        "UserRepository.get_top_storage_users": const(10),
+        "UserRepository.get_storage_totals": const(),
+        "UserRepository.recalculate_storage_usage": const(),
+        "AccountRepository.create_account": by_index(
+            lambda i: (user_id(i), f"blobs/bench/new_{i}.zip", months[-1], f"new_{i}.zip", f"{i + 1:064x}", 1024)
+        ),
+        "AccountRepository.create_accounts": by_index(lambda i: (user_id(i), months[-1], [
+            (f"blobs/bench/batch_{i}_{n}.zip", f"batch_{n}.zip", f"{i:032x}{n:032x}", 1024) for n in range(10)
+        ])),
+        "AccountRepository.get_accounts_by_sha256": account_hashes,
+        "AccountRepository.delete_account": by_index(lambda i: (accounts - i,)),
+        "AccountRepository.get_account_by_id": by_index(lambda i: (account_id(i),)),
+        "AccountRepository.get_accounts_by_user": by_index(lambda i: (user_id(i),)),
+        "AccountRepository.get_accounts_by_month": by_index(lambda i: (months[-1 - i % len(months)],)),
+        "AccountRepository.get_all_accounts": const(),
+        "AccountRepository.update_account_sent_status": by_index(lambda i: (account_id(i), True)),
+        "AccountRepository.update_account_lock_status": by_index(lambda i: (account_id(i), False)),
+        "AccountRepository.get_unsent_accounts": const(),
+        "AccountRepository.get_users_with_unsent_accounts": const(),
+        "AccountRepository.get_legacy_accounts_before": const(months[len(months) // 2]),
+        "AccountRepository.attach_blob": legacy_account,
+        "LogRepository.create_log": by_index(lambda i: ("bench", user_id(i), None, f"Benchmark {i}")),
+        "LogRepository.get_logs": const(100),
+    }
+
+
+class StatementRecorder:
+    """Запоминает SQL-запросы, выполненные движком, пока включен"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.enabled = False
+        self.statements: list = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            if executemany and parameters:
+                parameters = parameters[0]
+            self.statements.append((statement, parameters))
+
+
+async def query_plans(engine, statements: list) -> list:
+    """EXPLAIN QUERY PLAN для каждого различного запроса"""
+    plans = []
+    seen = set()
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement in seen or statement.lstrip().upper().startswith(("BEGIN", "COMMIT", "ROLLBACK")):
+                continue
+            seen.add(statement)
+            try:
+                result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                plan = [row[-1] for row in result.all()]
+            except Exception as e:
+                plan = [f"не удалось получить план: {e}"]
+            plans.append({"sql": " ".join(statement.split()), "plan": plan})
+        await conn.rollback()
+    return plans
+
+
+def full_scans(plans: list) -> list:
+    """Шаги плана с полным просмотром таблицы или индекса (SEARCH - поиск по индексу - не считается)"""
+    return [
+        step for entry in plans for step in entry["plan"]
+        if step.startswith("SCAN ") and "CONSTANT ROW" not in step
+    ]
+
+
+async def measure(info: dict, repeat: int, only: str = None) -> dict:
+    from app import models
+    from app.utils import db_utils
+    from app.utils.timing import percentile
+
+    cases = build_cases(info)
+    methods = {
+        f"{name}.{method}": getattr(getattr(db_utils, name), method)
+        for name in REPOSITORIES
+        for method, _ in inspect.getmembers(getattr(db_utils, name), inspect.isfunction)
+        if not method.startswith("_")
+    }
+    missing = sorted(set(methods) - set(cases))
+    if missing:
+        print(f"⚠️ Нет сценария для методов: {', '.join(missing)}")
+
+    recorder = StatementRecorder(models.engine)
+    results = {}
+    for name, method in methods.items():
+        if name not in cases or (only and only not in name):
+            continue
+        timings = []
+        recorder.statements = []
+        for i in range(repeat):
+            async with models.AsyncSessionLocal() as session:
+                args = await cases[name](session, i)
+                recorder.enabled = True
+                started = time.perf_counter()
+                await method(session, *args)
+                timings.append(time.perf_counter() - started)
+                recorder.enabled = False
+        queries = len(recorder.statements)
+        plans = await query_plans(models.engine, recorder.statements)
+        timings.sort()
+        results[name] = {
+            "calls": repeat,
+            "queries": round(queries / repeat, 2),
+            "min_ms": round(timings[0] * 1000, 3),
+            "median_ms": round(statistics.median(timings) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+            "plans": plans,
+            "full_scans": full_scans(plans),
+        }
+        print(f"{name:48} {results[name]['median_ms']:9.2f} {results[name]['p95_ms']:9.2f} "
+              f"{results[name]['queries']:7.1f}  {'; '.join(results[name]['full_scans'])[:60]}")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def print_comparison(current: dict, previous_path: Path):
+    previous = json.loads(previous_path.read_text(encoding="utf-8"))
+    print(f"\nСравнение с {previous_path.name} (коммит {previous.get('commit') or '?'}), медиана, мс:")
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if before is None:
+            continue
+        change = (result["median_ms"] / before["median_ms"] - 1) * 100 if before["median_ms"] else 0.0
+        marker = "  ⚠️" if change > 20 else ""
+        print(f"{name:48} {before['median_ms']:9.2f} -> {result['median_ms']:9.2f} ({change:+.0f}%){marker}")
+
+
+async def _describe(engine, months: int) -> dict:
+    """Размеры готовой базы"""
+    async with engine.connect() as conn:
+        counts = {}
+        for table in ("users", "accounts", "blobs", "logs"):
+            counts[table] = (await conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}")).scalar()
+    return {**counts, "months": months, "seed": None, "load_seconds": 0}
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарк репозиториев")
+    parser.add_argument("--db", type=Path, help="готовая база из benchmarks.dataset (по умолчанию создается новая)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--accounts", type=int, default=200_000)
+    parser.add_argument("--logs", type=int, default=500_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", help="только методы, содержащие подстроку")
+    parser.add_argument("--output", type=Path, help="файл результатов JSON")
+    parser.add_argument("--compare", type=Path, help="результаты предыдущего запуска")
+    args = parser.parse_args()
+
+    work_dir = None
+    db_path = args.db
+    if db_path is None:
+        work_dir = Path(tempfile.mkdtemp(prefix="bot-repositories-"))
+        db_path = work_dir / "bench.db"
+    configure_environment(db_path)
+
+    async def run():
+        from app.models import engine
+        try:
+            if args.db is None:
+                info = await generate(args.users, args.accounts, args.logs, args.months)
+                print(f"База создана за {info['load_seconds']} с\n")
+            else:
+                info = await _describe(engine, args.months)
+            print(f"{'метод':48} {'медиана':>9} {'p95, мс':>9} {'запросов':>7}  полный просмотр")
+            return info, await measure(info, args.repeat, args.only)
+        finally:
+            await engine.dispose()
+
+    try:
+        info, results = asyncio.run(run())
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "dataset": info,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    output = args.output or OUTPUT_DIR / f"repositories-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nРезультаты сохранены в {output}")
+    if args.compare:
+        print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
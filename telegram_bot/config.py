@@ -9,10 +9,14 @@ load_dotenv()
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 UPLOAD_DIR = DATA_DIR / "uploads"
+BLOB_DIR = UPLOAD_DIR / "blobs"
+COLD_DIR = UPLOAD_DIR / "cold"  # Пакеты архивов закрытых месяцев
 DB_PATH = DATA_DIR / "bot.db"
 
 # Создать папки если их нет
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
+COLD_DIR.mkdir(parents=True, exist_ok=True)
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 # Конфигурация бота
@@ -20,9 +24,43 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не установлен в файле .env")
 
+# Адрес сервера Bot API (пусто - api.telegram.org): собственный telegram-bot-api
+# или локальная замена для нагрузочных тестов (benchmarks/fake_telegram.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
+
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
 
+# Одновременно обрабатываемых обновлений. Обработчик держит соединение с БД и открывает второе
+# для состояний FSM, поэтому пул соединений рассчитывается от этого числа
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "20"))
+
+# Способ получения обновлений: polling (long polling) или webhook (встроенный HTTP-сервер).
+# WEBHOOK_URL - публичный HTTPS-адрес, на который Telegram отправляет обновления (прокси или балансировщик
+# перед сервером), WEBHOOK_SECRET - секрет из заголовка X-Telegram-Bot-Api-Secret-Token.
+# Больше WEBHOOK_MAX_PENDING принятых, но не обработанных обновлений - ответ 503, Telegram повторит позже
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError("BOT_MODE должен быть polling или webhook")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "1000"))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "10"))
+
+# Несколько процессов-обработчиков (1 - один процесс). Супервизор получает обновления и распределяет
+# их по from_user.id, у процесса i лог в файле с суффиксом -worker{i} и метрики на METRICS_PORT + 1 + i.
+# WORKER_QUEUE_SIZE - очередь обновлений к одному процессу, WORKER_STOP_TIMEOUT - ожидание при остановке (в секундах)
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "30"))
+# Задаются супервизором при запуске процесса-обработчика
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "-1"))
+WORKER_SUPERVISOR = os.getenv("WORKER_SUPERVISOR", "")
+WORKER_SECRET = os.getenv("WORKER_SECRET", "")
+
 # Admin IDs (разделены запятыми в .env)
 ADMIN_IDS_STR = os.getenv("ADMIN_IDS", "")
 ADMIN_IDS = [int(aid.strip()) for aid in ADMIN_IDS_STR.split(",") if aid.strip()]
@@ -32,3 +70,70 @@ UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "data/uploads")
 
 # Время хранения архивов (в днях)
 ARCHIVE_RETENTION_DAYS = 30
+
+# Фоновая загрузка архивов: число воркеров и максимальный размер очереди
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "3"))
+DOWNLOAD_QUEUE_SIZE = int(os.getenv("DOWNLOAD_QUEUE_SIZE", "100"))
+
+# Число процессов для проверки целостности архивов
+ARCHIVE_CHECK_WORKERS = int(os.getenv("ARCHIVE_CHECK_WORKERS", "2"))
+
+# Сколько секунд ждать остальные документы альбома (media group) после последнего полученного
+ALBUM_COLLECT_DELAY = float(os.getenv("ALBUM_COLLECT_DELAY", "1.0"))
+
+# Интервал сверки файлов на диске с базой данных (в секундах)
+RECONCILE_INTERVAL = int(os.getenv("RECONCILE_INTERVAL", "900"))
+
+# Квоты на загрузки одного пользователя (0 - без ограничений)
+USER_QUOTA_MB = int(os.getenv("USER_QUOTA_MB", "0"))
+USER_QUOTA_FILES = int(os.getenv("USER_QUOTA_FILES", "0"))
+
+# Интервал упаковки архивов закрытых месяцев в холодное хранилище (в секундах)
+TIERING_INTERVAL = int(os.getenv("TIERING_INTERVAL", "21600"))
+
+# Хранилище состояний FSM: время жизни незавершенного сценария (в секундах),
+# размер кэша в памяти и интервал очистки устаревших состояний
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "86400"))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_COMPACT_INTERVAL = int(os.getenv("FSM_COMPACT_INTERVAL", "3600"))
+
+# Сколько последних сообщений помнить, чтобы не редактировать их тем же содержимым
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "10000"))
+
+# Долгие действия администратора выполняются в фоне: сколько задач одновременно
+# может запустить один администратор и как часто обновлять сообщение с прогрессом (в секундах)
+ADMIN_TASK_LIMIT = int(os.getenv("ADMIN_TASK_LIMIT", "1"))
+TASK_PROGRESS_INTERVAL = float(os.getenv("TASK_PROGRESS_INTERVAL", "3"))
+
+# Как часто перечитывать список администраторов из БД (в секундах): подхватывает изменения,
+# сделанные другими процессами или напрямую в БД
+ADMIN_RELOAD_INTERVAL = int(os.getenv("ADMIN_RELOAD_INTERVAL", "60"))
+
+# HTTP-эндпоинт метрик Prometheus (порт 0 - отключен)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Сторож цикла событий: период замера задержки (в секундах) и порог блокировки (в миллисекундах),
+# после которого в лог пишется стек заблокировавшего цикл кода
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_STALL_THRESHOLD_MS = int(os.getenv("LOOP_STALL_THRESHOLD_MS", "250"))
+
+# Замер времени обработки: порог медленного обновления (в миллисекундах)
+# и сколько последних замеров хранить на обработчик для перцентилей
+SLOW_UPDATE_MS = int(os.getenv("SLOW_UPDATE_MS", "1000"))
+TIMING_WINDOW = int(os.getenv("TIMING_WINDOW", "500"))
+
+# Профилирование SQL-запросов по обновлениям (1 - включено): запросы с одинаковым текстом,
+# выполненные в одном обновлении не меньше порога раз, отмечаются как вероятный N+1
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+SQL_PROFILE_REPORT = DATA_DIR / "sql_profile.json"
+
+# Логирование: файл (JSON-строки), ротация по размеру и времени со сжатием старых файлов,
+# размер очереди записей (при переполнении записи отбрасываются, цикл событий не ждет диск)
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_ROTATE_INTERVAL = int(os.getenv("LOG_ROTATE_INTERVAL", "86400"))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
@@ -4,7 +4,7 @@ Telegram Bot для управления аккаунтами и уведомл
 Структура проекта:
 - main.py: Точка входа приложения
 - config.py: Конфигурация и переменные окружения
-- app/models.py: Модели БД (User, Account, Log)
+- app/models.py: Модели БД (User, Account, Log, хранилище файлов, состояния FSM)
 - app/handlers/: Обработчики команд
   - user.py: Обработчики для пользователей
   - admin.py: Обработчики для администраторов
@@ -12,35 +12,65 @@ Telegram Bot для управления аккаунтами и уведомл
   - db_utils.py: Репозитории для работы с БД
   - keyboards.py: Клавиатуры и кнопки
   - helpers.py: Вспомогательные функции
+  - storage.py: Контентно-адресуемое хранилище архивов
+  - downloads.py: Фоновая очередь загрузки архивов и сборка альбомов
+  - archives.py, archive_checks.py: Проверка целостности и манифест архивов
+  - reconcile.py: Сверка файлов на диске с базой данных
+  - fsm_storage.py: Хранилище состояний FSM в БД
+  - render.py: Пропуск редактирования сообщений без изменений
+  - callbacks.py: Данные inline-кнопок и таблица обработчиков callback-запросов
+  - admin_tasks.py: Фоновое выполнение долгих действий администратора
+  - admins.py: Роли администраторов из БД с кэшем в памяти
+  - metrics.py: Метрики Prometheus и HTTP-эндпоинт /metrics
+  - webhook.py: Прием обновлений через вебхук, /healthz и /readyz
+  - workers.py: Несколько процессов-обработчиков с распределением обновлений по пользователям
+  - watchdog.py: Задержка цикла событий и поиск блокирующих вызовов
+  - timing.py: Замер времени обработчиков, запросов к БД и Bot API
+  - sql_profiler.py: Профилирование SQL-запросов и поиск N+1
+  - log_pipeline.py: Неблокирующее логирование в JSON с ротацией
+  - bundles.py, tiering.py: Холодное хранилище (пакеты архивов закрытых месяцев)
 - data/: Директория для данных
-  - uploads/: Загруженные архивы
+  - uploads/: Загруженные архивы (blobs/ - хранилище по SHA-256, cold/ - пакеты по месяцам)
   - bot.db: База данных SQLite
 """
 
 import asyncio
 import logging
-import sys
+import signal
 from pathlib import Path
 
 from aiogram import Bot, Dispatcher, F
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import CommandStart
 from aiogram.types import Message, Update
 
-from config import BOT_TOKEN, ADMIN_IDS
-from app.models import init_db, AsyncSessionLocal
-from app.handlers.user import user_router
+from config import (
+    BOT_MODE, BOT_TOKEN, SQL_PROFILE_REPORT, TELEGRAM_API_URL, UPDATE_CONCURRENCY, WORKER_INDEX, WORKERS,
+)
+from app.models import init_db, enable_wal, AsyncSessionLocal, engine
+from app.handlers.user import user_router, process_account_upload
 from app.handlers.admin import admin_router
+from app.utils.downloads import download_queue, album_collector
+from app.utils.archive_checks import archive_checker
+from app.utils.reconcile import file_reconciler
+from app.utils.tiering import cold_storage
+from app.utils.fsm_storage import fsm_storage
+from app.utils.keyboards import build_static_keyboards
+from app.utils.render import render_tracker, render_seed_middleware
+from app.utils.callbacks import callback_table
+from app.utils.admin_tasks import admin_tasks
+from app.utils.admins import admin_roles
+from app.utils.metrics import metrics_server
+from app.utils.webhook import webhook_server
+from app.utils.workers import worker_pool, worker_client
+from app.utils.watchdog import loop_watchdog
+from app.utils.timing import update_timer, instrument_engine, api_timing_middleware
+from app.utils.sql_profiler import sql_profiler
+from app.utils.log_pipeline import setup_logging
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Настройка логирования: записи уходят в очередь, файл и stdout пишет фоновый поток
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -57,10 +87,76 @@ class DatabaseMiddleware:
             return await handler(event, data)
 
 
+def create_bot(session=None) -> Bot:
+    """Бот с middleware запросов к Bot API (session - своя сессия, например, для бенчмарков)"""
+    if session is None and TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    bot = Bot(token=BOT_TOKEN, session=session)
+    # Повторное редактирование сообщения тем же содержимым не отправляется в Telegram
+    bot.session.middleware(render_tracker)
+    # Пропущенные правки не считаются запросами к API
+    bot.session.middleware(api_timing_middleware)
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер с middleware и роутерами бота"""
+    dp = Dispatcher(storage=fsm_storage)
+
+    # Регистрация middleware для БД
+    @dp.message.middleware()
+    @dp.callback_query.middleware()
+    async def database_middleware(handler, event, data):
+        async with AsyncSessionLocal() as session:
+            data['session'] = session
+            return await handler(event, data)
+
+    # Время обработки: общее, БД и Bot API; медленные обновления пишутся в лог
+    dp.message.middleware(update_timer)
+    dp.callback_query.middleware(update_timer)
+
+    # Статические клавиатуры строятся один раз при запуске
+    build_static_keyboards()
+
+    # Содержимое сообщения из callback позволяет пропускать повторные правки и после перезапуска
+    dp.callback_query.outer_middleware(render_seed_middleware)
+
+    # Регистрация роутеров
+    dp.include_router(user_router)
+    dp.include_router(admin_router)
+    # Все callback-запросы обрабатываются одним обработчиком с поиском по таблице
+    dp.include_router(callback_table.router)
+
+    return dp
+
+
+async def wait_for_stop_signal():
+    """Дождаться SIGINT или SIGTERM (в режиме polling сигналы обрабатывает aiogram)"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по Ctrl+C через KeyboardInterrupt
+            pass
+    await stop.wait()
+    logger.info("Получен сигнал остановки")
+
+
 async def main():
     """Главная функция запуска бота"""
+    # Процесс-обработчик запускается супервизором (WORKERS > 1) и получает обновления от него
+    is_worker = WORKER_INDEX >= 0
+    is_supervisor = WORKERS > 1 and not is_worker
+    # Фоновые задачи, которые должны работать в одном процессе (сверка файлов, холодное хранилище)
+    is_primary = WORKER_INDEX <= 0 and not is_supervisor
+
     logger.info("=" * 70)
-    logger.info("Запуск Telegram бота...")
+    if is_worker:
+        logger.info(f"Запуск процесса-обработчика {WORKER_INDEX}...")
+    else:
+        logger.info("Запуск Telegram бота...")
     logger.info("=" * 70)
 
     # Проверка конфигурации
@@ -68,52 +164,108 @@ async def main():
         logger.error("BOT_TOKEN не установлен в файле .env")
         return
     
-    if not ADMIN_IDS:
-        logger.warning("ADMIN_IDS не установлены в файле .env")
+    # Счетчики и время SQL-запросов
+    instrument_engine(engine)
 
-    # Инициализация БД
-    logger.info("Инициализация базы данных...")
-    try:
-        await init_db()
-        logger.info("[OK] База данных инициализирована")
-    except Exception as e:
-        logger.error(f"[ERROR] Ошибка при инициализации БД: {e}")
-        return
+    # Инициализация БД (процессы-обработчики используют базу, подготовленную супервизором)
+    if not is_worker:
+        logger.info("Инициализация базы данных...")
+        try:
+            await init_db()
+            if is_supervisor:
+                await enable_wal()
+                logger.warning("SQLite допускает одну запись в момент времени: при нагрузке на запись "
+                               "процессы-обработчики упираются в блокировку базы (database is locked)")
+            logger.info("[OK] База данных инициализирована")
+        except Exception as e:
+            logger.error(f"[ERROR] Ошибка при инициализации БД: {e}")
+            return
+
+    # Администраторы: из ADMIN_IDS (добавлены в init_db) и назначенные через бота
+    await admin_roles.load()
+    if not admin_roles:
+        logger.warning("Администраторы не назначены: укажите ADMIN_IDS в файле .env")
 
     # Инициализация бота и диспетчера
-    bot = Bot(token=BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    bot = create_bot()
+    if is_supervisor:
+        # Супервизор не обрабатывает обновления, а пересылает их процессам-обработчикам
+        allowed_updates = create_dispatcher().resolve_used_update_types()
+        dp = Dispatcher()
+        dp.update.outer_middleware(worker_pool)
+        await worker_pool.start(Path(__file__).resolve())
+    else:
+        # Состояния FSM хранятся в БД и переживают перезапуск
+        fsm_storage.start()
+        dp = create_dispatcher()
+        allowed_updates = dp.resolve_used_update_types()
 
-    # Регистрация middleware для БД
-    @dp.message.middleware()
-    @dp.callback_query.middleware()
-    async def database_middleware(handler, event, data):
-        async with AsyncSessionLocal() as session:
-            data['session'] = session
-            return await handler(event, data)
+        # Запуск воркеров фоновой загрузки архивов
+        download_queue.start(bot, process_account_upload)
 
-    # Регистрация роутеров
-    dp.include_router(user_router)
-    dp.include_router(admin_router)
+        # Запуск проверки целостности архивов
+        archive_checker.start()
+        if is_primary:
+            await archive_checker.backfill()
+
+        # Периодическая перезагрузка администраторов из БД
+        admin_roles.start()
+
+    # Метрики для Prometheus
+    await metrics_server.start()
+
+    # Задержка цикла событий; стек кода, блокирующего цикл дольше порога, пишется в лог
+    loop_watchdog.start()
+
+    if is_primary:
+        # Периодическая сверка файлов на диске с БД
+        file_reconciler.start()
+
+        # Периодическая упаковка архивов закрытых месяцев в холодное хранилище
+        cold_storage.start()
 
     logger.info("[OK] Бот инициализирован")
-    logger.info(f"Администраторы: {ADMIN_IDS}")
+    logger.info(f"Администраторы: {list(admin_roles)}")
     logger.info("=" * 70)
     logger.info("[START] Бот запущен и готов к работе")
     logger.info("=" * 70)
 
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if is_worker:
+            # Процесс завершается, когда супервизор закрывает соединение
+            await worker_client.run(bot, dp)
+        elif BOT_MODE == "webhook":
+            await webhook_server.start(bot, dp, allowed_updates)
+            await wait_for_stop_signal()
+        else:
+            # Установленный ранее вебхук не дает получать обновления через getUpdates
+            await bot.delete_webhook()
+            await dp.start_polling(
+                bot, allowed_updates=allowed_updates, tasks_concurrency_limit=UPDATE_CONCURRENCY
+            )
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e:
         logger.error(f"[ERROR] Критическая ошибка: {e}", exc_info=True)
     finally:
+        await webhook_server.stop()
+        await worker_pool.stop()
+        await loop_watchdog.stop()
+        await metrics_server.stop()
+        await admin_tasks.shutdown()
+        await admin_roles.stop()
+        await album_collector.stop()
+        await download_queue.stop()
+        await archive_checker.shutdown()
+        await file_reconciler.stop()
+        await cold_storage.stop()
+        await fsm_storage.close()
+        if sql_profiler.enabled:
+            sql_profiler.dump(SQL_PROFILE_REPORT)
+            logger.info(f"Отчет профилировщика SQL сохранен в {SQL_PROFILE_REPORT}")
         await bot.session.close()
         logger.info("Подключение к боту закрыто")
 
-
 if __name__ == "__main__":
     try:
         asyncio.run(main())